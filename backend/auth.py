@@ -1,12 +1,20 @@
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timedelta
 from typing import Optional
 from fastapi import Depends, HTTPException, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.security import OAuth2PasswordBearer
 from jose import JWTError, jwt
-from sqlalchemy.orm import Session
+from sqlalchemy import event, inspect
+from sqlalchemy.orm import Session, object_session
 from passlib.context import CryptContext
 import database
 import models
+import schemas
 import os
 from dotenv import load_dotenv
 
@@ -15,6 +23,10 @@ load_dotenv()
 SECRET_KEY = os.getenv("SECRET_KEY", "fallback_unsafe_key")
 ALGORITHM = os.getenv("ALGORITHM", "HS256")
 ACCESS_TOKEN_EXPIRE_MINUTES = int(os.getenv("ACCESS_TOKEN_EXPIRE_MINUTES", 30))
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", 1024))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", 60))
+# bcrypt runs on its own small pool so login storms cannot occupy the event loop or the request threadpool
+BCRYPT_THREADS = int(os.getenv("BCRYPT_THREADS", 2))
 
 # passwd hash
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
@@ -22,6 +34,70 @@ pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="token")
 
 
+bcrypt_executor = ThreadPoolExecutor(max_workers=BCRYPT_THREADS, thread_name_prefix="bcrypt")
+
+
+class PrincipalCache:
+    """
+    Bounded LRU cache of verified principals keyed by access token.
+    Entries expire after the TTL or when the token expires, whichever comes first.
+    """
+
+    def __init__(self, max_size: int, ttl: int):
+        self.max_size = max_size
+        self.ttl = ttl
+        # token -> (principal, expires_at)
+        self._entries: OrderedDict[str, tuple[schemas.User, float]] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, token: str) -> Optional[schemas.User]:
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if entry[1] < time.time():
+                del self._entries[token]
+                return None
+            self._entries.move_to_end(token)
+            return entry[0]
+
+    def set(self, token: str, principal: schemas.User, token_expires_at: float):
+        with self._lock:
+            self._entries[token] = (principal, min(time.time() + self.ttl, token_expires_at))
+            self._entries.move_to_end(token)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate_user(self, email: str):
+        """Drop every cached token of a user (done on commit of any ORM change to the user)."""
+        with self._lock:
+            for token in [token for token, (principal, _) in self._entries.items() if principal.email == email]:
+                del self._entries[token]
+
+
+principal_cache = PrincipalCache(AUTH_CACHE_SIZE, AUTH_CACHE_TTL_SECONDS)
+
+
+@event.listens_for(models.User, "after_insert")
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _mark_user_changed(mapper, connection, target):
+    # any ORM write of a user (role, password, is_active, email) drops its cached principals on commit
+    emails = {target.email, *inspect(target).attrs.email.history.deleted}
+    object_session(target).info.setdefault("changed_user_emails", set()).update(emails)
+
+
+@event.listens_for(Session, "after_commit")
+def _invalidate_changed_users(session):
+    for email in session.info.pop("changed_user_emails", ()):
+        principal_cache.invalidate_user(email)
+
+
+@event.listens_for(Session, "after_rollback")
+def _discard_changed_users(session):
+    session.info.pop("changed_user_emails", None)
+
+
 def verify_password(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
 
@@ -30,6 +106,17 @@ def get_password_hash(password):
     return pwd_context.hash(password)
 
 
+async def verify_password_async(plain_password, hashed_password) -> bool:
+    """Run bcrypt verification on the dedicated thread pool."""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_executor, verify_password, plain_password, hashed_password)
+
+
+async def get_password_hash_async(password) -> str:
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(bcrypt_executor, get_password_hash, password)
+
+
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     to_encode = data.copy()
     if expires_delta:
@@ -56,9 +143,17 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     except JWTError:
         raise credentials_exception
 
-    user = db.query(models.User).filter(models.User.email == email).first()
+    principal = principal_cache.get(token)
+    if principal is not None:
+        return principal
+
+    user = await run_in_threadpool(
+        lambda: db.query(models.User).filter(models.User.email == email).first()
+    )
 
     if user is None:
         raise credentials_exception
 
-    return user
+    principal = schemas.User.model_validate(user)
+    principal_cache.set(token, principal, float(payload.get("exp", time.time())))
+    return principal
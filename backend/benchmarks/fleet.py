@@ -0,0 +1,317 @@
+"""
+Synthetic large-fleet generator for query benchmarks.
+
+Every row is produced inside Postgres by generate_series from a compact description of the
+fleet (device count, probe interval, flap period, share of down time), so 500M scan rows
+never pass through Python. Device i is down during flap segment k when a hash of (i, k)
+falls under --down-percent, which gives every device its own reproducible up/down timeline.
+
+    cd backend
+    python -m benchmarks.fleet --reset --devices 100000 --locations 500 --scan-rows 500000000
+
+--storage transition writes the same timeline in the compressed form of the monitor's
+transition storage mode: one transition/heartbeat row per flap segment instead of one row per probe.
+
+The availability rollups (minute, hour, day) are filled from the same per-probe timeline
+with INSERT ... SELECT, whatever the storage mode, as the monitor would have accumulated them.
+
+Run it against a dedicated database: --reset truncates every inventory and history table.
+"""
+import argparse
+import logging
+import time
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+
+import models
+import partitions
+from rollups import RTT_BUCKET_BOUNDS, HISTOGRAM_SIZE, ROLLUP_MODELS
+from database import engine
+from migrations import upgrade_schema
+
+logger = logging.getLogger(__name__)
+
+RESET_TABLES = (
+    "scan_results", "device_status", "availability_minute", "availability_hour", "availability_day",
+    "devices", "locations", "device_types", "discovery_events", "discovered_hosts", "discovery_networks",
+)
+
+# Device i, flap segment k -> down when the hash lands under the down threshold (per mille)
+DOWN_EXPRESSION = "((({device} + :hash_seed) * 2654435761 + ({segment}) * 40503) % 1000) < :down_permille"
+
+
+def _down(device: str, segment: str) -> str:
+    return DOWN_EXPRESSION.format(device=device, segment=segment)
+
+
+def reset(connection):
+    connection.execute(text(f"TRUNCATE {', '.join(RESET_TABLES)} RESTART IDENTITY CASCADE"))
+
+
+def insert_dictionaries(connection, locations: int, device_types: int) -> tuple[list[int], list[int]]:
+    location_ids = connection.execute(
+        text(
+            "INSERT INTO locations (name) SELECT 'bench-location-' || n FROM generate_series(1, :count) AS n "
+            "RETURNING id"
+        ),
+        {"count": locations},
+    ).scalars().all()
+    device_type_ids = connection.execute(
+        text(
+            "INSERT INTO device_types (name, icon_name) "
+            "SELECT 'bench-type-' || n, 'server' FROM generate_series(1, :count) AS n RETURNING id"
+        ),
+        {"count": device_types},
+    ).scalars().all()
+    return location_ids, device_type_ids
+
+
+def insert_devices(connection, count: int, location_ids: list[int], device_type_ids: list[int]) -> list[int]:
+    """
+    Devices bench-device-N on 10.0.0.0/8, spread round-robin over locations and types.
+    """
+    return connection.execute(
+        text(
+            "INSERT INTO devices (name, ip_address, location_id, device_type_id) "
+            "SELECT 'bench-device-' || n, '10.0.0.0'::inet + n, "
+            "(CAST(:location_ids AS integer[]))[1 + n % cardinality(CAST(:location_ids AS integer[]))], "
+            "(CAST(:device_type_ids AS integer[]))[1 + n % cardinality(CAST(:device_type_ids AS integer[]))] "
+            "FROM generate_series(1, :count) AS n RETURNING id"
+        ),
+        {"count": count, "location_ids": location_ids, "device_type_ids": device_type_ids},
+    ).scalars().all()
+
+
+def insert_timeline_chunk(connection, args, device_ids: list[int], start: datetime, first: int, last: int) -> int:
+    """
+    Scan rows of probes first..last (inclusive) of every device. Returns the rows inserted.
+    """
+    params = {
+        "device_ids": device_ids,
+        "start": start,
+        "interval": args.probe_interval,
+        "flap": args.flap_samples,
+        "first": first,
+        "last": last,
+        "hash_seed": args.seed,
+        "down_permille": int(args.down_percent * 10),
+    }
+    if args.storage == "sample":
+        down = _down("d.n", "s / :flap")
+        statement = (
+            "INSERT INTO scan_results (device_id, timestamp, status, response_time_ms, record_type) "
+            f"SELECT d.id, CAST(:start AS timestamptz) + s * make_interval(secs => :interval), NOT ({down}), "
+            f"CASE WHEN {down} THEN NULL ELSE 1 + (d.n * 31 + s * 17) % 80 END, 'sample' "
+            "FROM unnest(CAST(:device_ids AS integer[])) WITH ORDINALITY AS d(id, n) "
+            "CROSS JOIN generate_series(:first, :last) AS s"
+        )
+    else:
+        # one row per flap segment, a transition when the state differs from the previous segment
+        down = _down("d.n", "k")
+        previous_down = _down("d.n", "k - 1")
+        statement = (
+            "INSERT INTO scan_results "
+            "(device_id, timestamp, status, response_time_ms, record_type, state_duration_seconds) "
+            f"SELECT d.id, CAST(:start AS timestamptz) + k * :flap * make_interval(secs => :interval), NOT ({down}), "
+            f"CASE WHEN {down} THEN NULL ELSE 1 + (d.n * 31 + k * 17) % 80 END, "
+            f"CASE WHEN k > 0 AND ({down}) = ({previous_down}) THEN 'heartbeat' ELSE 'transition' END, "
+            f"CASE WHEN k > 0 AND ({down}) <> ({previous_down}) THEN :flap * :interval END "
+            "FROM unnest(CAST(:device_ids AS integer[])) WITH ORDINALITY AS d(id, n) "
+            "CROSS JOIN generate_series(:first, :last) AS k"
+        )
+    return connection.execute(text(statement), params).rowcount
+
+
+def insert_rollup_chunk(
+    connection, args, device_ids: list[int], start: datetime, first: int, last: int, granularity: str
+) -> int:
+    """
+    Merge probes first..last of every device into one rollup table, buckets split by a
+    chunk boundary are added up like the monitor's flushes. Returns the rows upserted.
+    """
+    table = ROLLUP_MODELS[granularity].__tablename__
+    down = _down("d.n", "s / :flap")
+    # histogram index = number of bucket bounds below the RTT (rollups.histogram_index)
+    histogram = ", ".join(
+        f"count(*) FILTER (WHERE width_bucket(rtt - 1, CAST(:bounds AS integer[])) = {index})"
+        for index in range(HISTOGRAM_SIZE)
+    )
+    statement = (
+        "WITH probes AS ("
+        f"SELECT d.id AS device_id, CAST(:start AS timestamptz) + s * make_interval(secs => :interval) AS ts, "
+        f"CASE WHEN {down} THEN NULL ELSE 1 + (d.n * 31 + s * 17) % 80 END AS rtt "
+        "FROM unnest(CAST(:device_ids AS integer[])) WITH ORDINALITY AS d(id, n) "
+        "CROSS JOIN generate_series(:first, :last) AS s) "
+        f"INSERT INTO {table} "
+        "(device_id, bucket_start, samples, up_count, rtt_count, rtt_sum, rtt_min, rtt_max, rtt_histogram) "
+        f"SELECT device_id, date_trunc('{granularity}', ts, 'UTC'), count(*), count(rtt), count(rtt), "
+        f"coalesce(sum(rtt), 0), min(rtt), max(rtt), CAST(ARRAY[{histogram}] AS integer[]) "
+        "FROM probes GROUP BY 1, 2 "
+        "ON CONFLICT (device_id, bucket_start) DO UPDATE SET "
+        f"samples = {table}.samples + excluded.samples, "
+        f"up_count = {table}.up_count + excluded.up_count, "
+        f"rtt_count = {table}.rtt_count + excluded.rtt_count, "
+        f"rtt_sum = {table}.rtt_sum + excluded.rtt_sum, "
+        f"rtt_min = least({table}.rtt_min, excluded.rtt_min), "
+        f"rtt_max = greatest({table}.rtt_max, excluded.rtt_max), "
+        f"rtt_histogram = ARRAY(SELECT a + b FROM unnest({table}.rtt_histogram, excluded.rtt_histogram) AS h(a, b))"
+    )
+    params = {
+        "device_ids": device_ids,
+        "start": start,
+        "interval": args.probe_interval,
+        "flap": args.flap_samples,
+        "first": first,
+        "last": last,
+        "hash_seed": args.seed,
+        "down_permille": int(args.down_percent * 10),
+        "bounds": RTT_BUCKET_BOUNDS,
+    }
+    return connection.execute(text(statement), params).rowcount
+
+
+def insert_device_statuses(connection, args, device_ids: list[int], start: datetime, samples: int):
+    last_segment = (samples - 1) // args.flap_samples
+    last_checked = start + timedelta(seconds=(samples - 1) * args.probe_interval)
+    down = _down("d.n", ":segment")
+    connection.execute(
+        text(
+            "INSERT INTO device_status "
+            "(device_id, is_online, last_change_at, last_checked_at, last_response_time_ms, consecutive_failures) "
+            f"SELECT d.id, NOT ({down}), CAST(:last_change AS timestamptz), CAST(:last_checked AS timestamptz), "
+            f"CASE WHEN {down} THEN NULL ELSE 1 + d.n % 80 END, "
+            f"CASE WHEN {down} THEN 3 ELSE 0 END "
+            "FROM unnest(CAST(:device_ids AS integer[])) WITH ORDINALITY AS d(id, n) "
+            "ON CONFLICT (device_id) DO NOTHING"
+        ),
+        {
+            "device_ids": device_ids,
+            "segment": last_segment,
+            "last_change": start + timedelta(seconds=last_segment * args.flap_samples * args.probe_interval),
+            "last_checked": last_checked,
+            "hash_seed": args.seed,
+            "down_permille": int(args.down_percent * 10),
+        },
+    )
+
+
+def insert_discovery(connection, args, start: datetime, end: datetime):
+    """
+    Discovery networks 172.16.0.0/16, 172.17.0.0/16, ... with pending hosts and disappearance
+    events spread over the timeline.
+    """
+    network_ids = connection.execute(
+        text(
+            "INSERT INTO discovery_networks (name, cidr, last_discovery) "
+            "SELECT 'bench-network-' || n, host(('172.16.0.0'::inet + (n - 1) * 65536)) || '/16', :end "
+            "FROM generate_series(1, :count) AS n RETURNING id"
+        ),
+        {"count": args.networks, "end": end},
+    ).scalars().all()
+    if not network_ids:
+        return
+    span = {"start": start, "seconds": max((end - start).total_seconds(), 1)}
+    networks = "cardinality(CAST(:network_ids AS integer[]))"
+    connection.execute(
+        text(
+            "INSERT INTO discovered_hosts (network_id, ip_address, status, discovered_at, last_seen) "
+            f"SELECT (CAST(:network_ids AS integer[]))[1 + h % {networks}], "
+            f"'172.16.0.0'::inet + (h % {networks}) * 65536 + 1 + h / {networks}, 'pending', "
+            "CAST(:start AS timestamptz) + (h * :seconds / :count) * interval '1 second', "
+            "CAST(:start AS timestamptz) + (h * :seconds / :count) * interval '1 second' "
+            "FROM generate_series(0, :count - 1) AS h"
+        ),
+        {**span, "count": args.discovered_hosts, "network_ids": network_ids},
+    )
+    # disappeared hosts live in the upper half of each /16
+    connection.execute(
+        text(
+            "INSERT INTO discovery_events (network_id, ip_address, event_type, occurred_at, last_seen) "
+            f"SELECT (CAST(:network_ids AS integer[]))[1 + e % {networks}], "
+            f"'172.16.0.0'::inet + (e % {networks}) * 65536 + 32768 + e / {networks}, 'disappeared', "
+            "CAST(:start AS timestamptz) + (e * :seconds / :count) * interval '1 second', "
+            "CAST(:start AS timestamptz) + (e * :seconds / :count) * interval '1 second' - interval '90 seconds' "
+            "FROM generate_series(0, :count - 1) AS e"
+        ),
+        {**span, "count": args.disappearances, "network_ids": network_ids},
+    )
+
+
+def generate(args):
+    models.Base.metadata.create_all(bind=engine)
+    upgrade_schema(engine)
+
+    samples = max(args.scan_rows // max(args.devices, 1), 1)
+    end = datetime.now(timezone.utc).replace(microsecond=0)
+    start = end - timedelta(seconds=samples * args.probe_interval)
+
+    with engine.begin() as connection:
+        if args.reset:
+            reset(connection)
+            logger.info("Fleet tables truncated.")
+        location_ids, device_type_ids = insert_dictionaries(connection, args.locations, args.device_types)
+        device_ids = insert_devices(connection, args.devices, location_ids, device_type_ids)
+        insert_device_statuses(connection, args, device_ids, start, samples)
+        insert_discovery(connection, args, start, end)
+        if partitions.is_partitioned(connection):
+            partitions.ensure_partitions(connection, start.date(), end.date() + timedelta(days=1))
+    logger.info(
+        f"{len(device_ids)} devices, {len(location_ids)} locations, {len(device_type_ids)} device types, "
+        f"{args.networks} networks, {args.discovered_hosts} discovered hosts, {args.disappearances} disappearances."
+    )
+
+    # History in time chunks, one transaction each
+    if args.storage == "sample":
+        positions, step = samples, max(args.chunk_seconds // args.probe_interval, 1)
+    else:
+        positions, step = (samples + args.flap_samples - 1) // args.flap_samples, max(
+            args.chunk_seconds // (args.probe_interval * args.flap_samples), 1
+        )
+    written = 0
+    started = time.perf_counter()
+    for first in range(0, positions, step):
+        last = min(first + step, positions) - 1
+        with engine.begin() as connection:
+            written += insert_timeline_chunk(connection, args, device_ids, start, first, last)
+        elapsed = time.perf_counter() - started
+        logger.info(f"scan_results: {written} rows ({last + 1}/{positions}), {written / elapsed:.0f} rows/s")
+
+    if not args.skip_rollups:
+        step = max(args.chunk_seconds // args.probe_interval, 1)
+        for granularity in ROLLUP_MODELS:
+            rollup_rows = 0
+            for first in range(0, samples, step):
+                with engine.begin() as connection:
+                    rollup_rows += insert_rollup_chunk(
+                        connection, args, device_ids, start, first, min(first + step, samples) - 1, granularity
+                    )
+            logger.info(f"{ROLLUP_MODELS[granularity].__tablename__}: {rollup_rows} rows upserted")
+
+    with engine.connect() as connection:
+        connection.execution_options(isolation_level="AUTOCOMMIT").execute(text("ANALYZE"))
+    logger.info(f"Fleet ready: {written} scan rows from {start:%Y-%m-%d %H:%M} to {end:%Y-%m-%d %H:%M} UTC.")
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--devices", type=int, default=100_000)
+    parser.add_argument("--locations", type=int, default=500)
+    parser.add_argument("--device-types", type=int, default=20)
+    parser.add_argument("--scan-rows", type=int, default=10_000_000, help="probe samples over the whole fleet")
+    parser.add_argument("--storage", choices=("sample", "transition"), default="sample")
+    parser.add_argument("--probe-interval", type=int, default=30, help="seconds between two probes of a device")
+    parser.add_argument("--flap-samples", type=int, default=120, help="probes per up/down segment")
+    parser.add_argument("--down-percent", type=float, default=3.0, help="share of segments a device is down")
+    parser.add_argument("--networks", type=int, default=50)
+    parser.add_argument("--discovered-hosts", type=int, default=50_000)
+    parser.add_argument("--disappearances", type=int, default=20_000)
+    parser.add_argument("--chunk-seconds", type=int, default=3600, help="timeline span written per transaction")
+    parser.add_argument("--seed", type=int, default=0, help="changes every device's timeline")
+    parser.add_argument("--skip-rollups", action="store_true", help="leave the availability rollups empty")
+    parser.add_argument("--reset", action="store_true", help="truncate the fleet tables first")
+    generate(parser.parse_args())
+
+
+if __name__ == "__main__":
+    main()
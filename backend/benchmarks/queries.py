@@ -0,0 +1,324 @@
+"""
+Query benchmark suite. Times crud functions (and optionally the API list endpoints) against
+the database configured in .env, captures the EXPLAIN ANALYZE plan of every statement and
+compares both with a stored baseline.
+
+    cd backend
+    python -m benchmarks.fleet --reset --devices 100000 --scan-rows 500000000
+    python -m benchmarks.queries --save-baseline benchmarks/baseline.json
+    # ...change an index or a query...
+    python -m benchmarks.queries --baseline benchmarks/baseline.json --api-url http://localhost:8000
+
+The run fails (exit status 1) when a case got slower than the baseline by more than
+--tolerance and --min-regression-ms, or when a plan scans a table sequentially that the
+baseline plan reached through an index.
+"""
+import argparse
+import asyncio
+import ipaddress
+import json
+import logging
+import re
+import statistics
+import sys
+import time
+import urllib.request
+from datetime import timedelta
+from sqlalchemy import event, func, select
+
+import crud
+import models
+from database import AsyncSessionLocal, SessionLocal, async_engine, engine
+
+logger = logging.getLogger(__name__)
+
+# Daily scan_results partitions are reported under the parent table name
+PARTITION_SUFFIX = re.compile(r"_p\d{8}$")
+SCAN_NODES = ("Seq Scan", "Index Scan", "Index Only Scan", "Bitmap Heap Scan", "Bitmap Index Scan")
+
+
+class StatementRecorder:
+    """
+    Collects the SELECT statements an engine executes while recording is switched on.
+    """
+
+    def __init__(self, sync_engine):
+        self.recording = False
+        self.statements: list[tuple[str, object]] = []
+        event.listen(sync_engine, "before_cursor_execute", self._record)
+
+    def _record(self, conn, cursor, statement, parameters, context, executemany):
+        if self.recording and statement.lstrip().lower().startswith(("select", "with")):
+            self.statements.append((statement, parameters))
+
+    def start(self):
+        self.statements = []
+        self.recording = True
+
+    def stop(self) -> list[tuple[str, object]]:
+        self.recording = False
+        return self.statements
+
+
+def summarize_plan(plan: dict) -> list[str]:
+    """
+    Scan nodes of a JSON plan as sorted "Node Type relation [index]" strings.
+    A Bitmap Index Scan has no relation of its own, it gets the one of its Bitmap Heap Scan.
+    """
+    nodes = set()
+    stack = [(plan["Plan"], "")]
+    while stack:
+        node, parent_relation = stack.pop()
+        relation = PARTITION_SUFFIX.sub("", node.get("Relation Name", "")) or parent_relation
+        stack.extend((child, relation) for child in node.get("Plans", []))
+        if node["Node Type"] not in SCAN_NODES:
+            continue
+        index = PARTITION_SUFFIX.sub("", node.get("Index Name", ""))
+        nodes.add(" ".join(part for part in (node["Node Type"], relation, f"[{index}]" if index else "") if part))
+    return sorted(nodes)
+
+
+def _plan_entry(statement: str, rows) -> dict:
+    plan = rows[0][0]
+    plan = (json.loads(plan) if isinstance(plan, str) else plan)[0]
+    return {
+        "statement": " ".join(statement.split())[:500],
+        "execution_ms": plan.get("Execution Time"),
+        "scans": summarize_plan(plan),
+    }
+
+
+async def explain_async(statements) -> list[dict]:
+    plans = []
+    async with async_engine.connect() as connection:
+        for statement, parameters in statements:
+            result = await connection.exec_driver_sql(
+                "EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters
+            )
+            plans.append(_plan_entry(statement, result.all()))
+    return plans
+
+
+def explain_sync(statements) -> list[dict]:
+    plans = []
+    with engine.connect() as connection:
+        for statement, parameters in statements:
+            result = connection.exec_driver_sql("EXPLAIN (ANALYZE, BUFFERS, FORMAT JSON) " + statement, parameters)
+            plans.append(_plan_entry(statement, result.all()))
+    return plans
+
+
+async def load_context() -> dict:
+    """
+    Parameters picked from the generated fleet: a device, location and network in the middle
+    of their ranges, and a timestamp in the middle of the scan history for deep cursor pages.
+    """
+    async with AsyncSessionLocal() as db:
+        device_count = (await db.execute(select(func.count(models.Device.id)))).scalar()
+        device_id, device_ip = (await db.execute(
+            select(models.Device.id, models.Device.ip_address)
+            .order_by(models.Device.id).offset(device_count // 2).limit(1)
+        )).one()
+        location_id = (await db.execute(select(func.max(models.Location.id)))).scalar()
+        network_id = (await db.execute(select(func.min(models.DiscoveryNetwork.id)))).scalar()
+        oldest, newest = (await db.execute(
+            select(func.min(models.ScanResult.timestamp), func.max(models.ScanResult.timestamp))
+        )).one()
+    middle = oldest + (newest - oldest) / 2 if oldest else None
+    return {
+        "device_id": device_id,
+        "cidr": str(ipaddress.ip_network(f"{device_ip}/22", strict=False)),
+        "name_prefix": f"bench-device-{device_id // 10}",
+        "location_id": location_id,
+        "network_id": network_id,
+        "deep_cursor": (middle, crud.SCAN_RANK, 2**31 - 1) if middle else None,
+        "newest": newest,
+    }
+
+
+def async_cases(context: dict) -> list[tuple[str, object]]:
+    cursor = context["deep_cursor"]
+    return [
+        ("get_devices first page", lambda db: crud.get_devices(db, limit=100)),
+        ("get_devices 5k page", lambda db: crud.get_devices(db, limit=5000)),
+        ("get_devices deep offset", lambda db: crud.get_devices(db, skip=90_000, limit=100)),
+        ("search_devices cidr", lambda db: crud.search_devices(db, cidr=context["cidr"])),
+        ("search_devices name prefix", lambda db: crud.search_devices(db, name_prefix=context["name_prefix"])),
+        ("search_devices offline", lambda db: crud.search_devices(db, is_online=False, limit=1000)),
+        ("search_devices location", lambda db: crud.search_devices(db, location_id=context["location_id"])),
+        ("get_scan_results first page", lambda db: crud.get_scan_results(db, limit=50)),
+        ("get_scan_results 5k page", lambda db: crud.get_scan_results(db, limit=5000)),
+        ("get_scan_results deep cursor", lambda db: crud.get_scan_results(db, limit=50, cursor=cursor)),
+        ("get_logs first page", lambda db: crud.get_logs(db, limit=50)),
+        ("get_logs 5k page", lambda db: crud.get_logs(db, limit=5000)),
+        ("get_logs deep cursor", lambda db: crud.get_logs(db, limit=50, cursor=cursor)),
+        ("get_logs discovery", lambda db: crud.get_logs(db, limit=50, event_type="discovery")),
+        ("get_discovery_networks", lambda db: crud.get_discovery_networks(db)),
+        ("get_device_ips", lambda db: crud.get_device_ips(db)),
+        ("get_monitored_devices", lambda db: crud.get_monitored_devices(db, default_interval=60)),
+        ("get_latest_scan_states", lambda db: crud.get_latest_scan_states(db)),
+    ]
+
+
+def sync_cases(context: dict) -> list[tuple[str, object]]:
+    newest = context["newest"]
+    return [
+        ("get_device", lambda db: crud.get_device(db, context["device_id"])),
+        ("get_locations_with_device_counts", lambda db: crud.get_locations_with_device_counts(db)),
+        ("count_pending_discovered_hosts", lambda db: crud.count_pending_discovered_hosts(db, context["network_id"])),
+        ("get_discovery_networks_with_pending_counts", lambda db: crud.get_discovery_networks_with_pending_counts(db)),
+        ("get_pending_discovered_hosts", lambda db: crud.get_pending_discovered_hosts(db)),
+        ("get_availability_rollups hour", lambda db: crud.get_availability_rollups(
+            db, models.AvailabilityHour, context["device_id"], newest - timedelta(days=7), newest,
+        ) if newest else []),
+    ]
+
+
+def api_cases(context: dict) -> list[tuple[str, str]]:
+    return [
+        ("GET /devices/ 5k", "/devices/?limit=5000"),
+        ("GET /devices/search cidr", f"/devices/search?cidr={context['cidr']}"),
+        ("GET /scan-results/ 5k", "/scan-results/?limit=5000"),
+        ("GET /logs/ 5k", "/logs/?limit=5000"),
+        ("GET /discovery-networks/", "/discovery-networks/"),
+    ]
+
+
+def timing_summary(timings: list[float]) -> dict:
+    timings = sorted(timings)
+    return {
+        "median_ms": round(statistics.median(timings) * 1000, 3),
+        "p95_ms": round(timings[min(len(timings) - 1, int(len(timings) * 0.95))] * 1000, 3),
+    }
+
+
+async def run_async_case(function, repeat: int, recorder: StatementRecorder) -> dict:
+    async with AsyncSessionLocal() as db:
+        await function(db)  # warm-up
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            await function(db)
+            timings.append(time.perf_counter() - started)
+            db.expunge_all()
+        recorder.start()
+        await function(db)
+    return {**timing_summary(timings), "plans": await explain_async(recorder.stop())}
+
+
+def run_sync_case(function, repeat: int, recorder: StatementRecorder) -> dict:
+    with SessionLocal() as db:
+        function(db)
+        timings = []
+        for _ in range(repeat):
+            started = time.perf_counter()
+            function(db)
+            timings.append(time.perf_counter() - started)
+            db.expunge_all()
+        recorder.start()
+        function(db)
+    return {**timing_summary(timings), "plans": explain_sync(recorder.stop())}
+
+
+def run_api_case(url: str, repeat: int) -> dict:
+    urllib.request.urlopen(url).read()
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        urllib.request.urlopen(url).read()
+        timings.append(time.perf_counter() - started)
+    return timing_summary(timings)
+
+
+async def run_suite(args) -> dict:
+    context = await load_context()
+    async_recorder = StatementRecorder(async_engine.sync_engine)
+    sync_recorder = StatementRecorder(engine)
+    selected = re.compile(args.only) if args.only else None
+
+    results = {}
+    for name, function in async_cases(context):
+        if selected is None or selected.search(name):
+            results[name] = await run_async_case(function, args.repeat, async_recorder)
+            logger.info(f"{name}: {results[name]['median_ms']} ms")
+    for name, function in sync_cases(context):
+        if selected is None or selected.search(name):
+            results[name] = run_sync_case(function, args.repeat, sync_recorder)
+            logger.info(f"{name}: {results[name]['median_ms']} ms")
+    if args.api_url:
+        for name, path in api_cases(context):
+            if selected is None or selected.search(name):
+                results[name] = run_api_case(args.api_url.rstrip("/") + path, args.repeat)
+                logger.info(f"{name}: {results[name]['median_ms']} ms")
+    return results
+
+
+def _seq_scans(result: dict) -> set[str]:
+    return {
+        scan.split(" ", 2)[2] for plan in result.get("plans", []) for scan in plan["scans"] if scan.startswith("Seq Scan")
+    }
+
+
+def _indexed_relations(result: dict) -> set[str]:
+    relations = set()
+    for plan in result.get("plans", []):
+        for scan in plan["scans"]:
+            if scan.startswith("Bitmap Heap Scan ") or (not scan.startswith("Seq Scan") and "[" in scan):
+                relations.add(scan.split("[", 1)[0].split()[-1])
+    return relations
+
+
+def compare(results: dict, baseline: dict, tolerance: float, min_regression_ms: float) -> list[str]:
+    """
+    Regressions of results against the baseline, one message each.
+    """
+    regressions = []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        limit = max(previous["median_ms"] * (1 + tolerance), previous["median_ms"] + min_regression_ms)
+        if result["median_ms"] > limit:
+            regressions.append(f"{name}: median {result['median_ms']} ms, baseline {previous['median_ms']} ms")
+        new_seq_scans = (_seq_scans(result) - _seq_scans(previous)) & _indexed_relations(previous)
+        if new_seq_scans:
+            regressions.append(f"{name}: sequential scan of {', '.join(sorted(new_seq_scans))} (indexed in baseline)")
+    return regressions
+
+
+def main():
+    logging.basicConfig(level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s")
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=10, help="timed runs per case")
+    parser.add_argument("--only", help="regular expression selecting case names")
+    parser.add_argument("--api-url", help="also time the list endpoints of a running API")
+    parser.add_argument("--output", help="write timings and plans to this JSON file")
+    parser.add_argument("--baseline", help="baseline JSON to compare with")
+    parser.add_argument("--save-baseline", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed relative slowdown")
+    parser.add_argument("--min-regression-ms", type=float, default=2.0, help="slowdowns below this are noise")
+    args = parser.parse_args()
+
+    results = asyncio.run(run_suite(args))
+
+    print(f"{'case':<46} {'median ms':>10} {'p95 ms':>10}")
+    for name, result in results.items():
+        print(f"{name:<46} {result['median_ms']:>10.2f} {result['p95_ms']:>10.2f}")
+
+    for path in (args.output, args.save_baseline):
+        if path:
+            with open(path, "w") as output:
+                json.dump(results, output, indent=2, default=str)
+
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            regressions = compare(results, json.load(baseline_file), args.tolerance, args.min_regression_ms)
+        for message in regressions:
+            print(f"REGRESSION {message}")
+        if regressions:
+            sys.exit(1)
+        print("No regressions against the baseline.")
+
+
+if __name__ == "__main__":
+    main()
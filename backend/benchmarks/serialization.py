@@ -0,0 +1,173 @@
+"""
+Serialization cost of the large list endpoints: the previous path (ORM objects validated
+through the from_attributes schemas, then encoded by the standard json module) against the
+fast path (column rows shaped into dicts by crud and encoded by orjson). /logs/ entries were
+dicts already, there the previous path is the response_model validation of those dicts.
+
+Only the Python side is measured, no database is needed:
+
+    cd backend
+    python -m benchmarks.serialization --rows 5000
+"""
+import argparse
+import json
+import statistics
+import time
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from typing import List
+
+import orjson
+from pydantic import TypeAdapter
+
+import crud
+import models
+import schemas
+
+DeviceRow = namedtuple("DeviceRow", [
+    "id", "name", "ip_address", "mac_address", "location_id", "device_type_id", "probe_interval_seconds",
+    "location_name", "device_type_name", "icon_name", "device_type_probe_interval_seconds",
+    "is_online", "last_change_at", "last_checked_at", "last_response_time_ms", "consecutive_failures",
+])
+ScanRow = namedtuple("ScanRow", [
+    "id", "timestamp", "device_id", "status", "response_time_ms", "log_message",
+    "record_type", "state_duration_seconds", "device_name", "ip_address",
+])
+# Columns crud.get_logs selects from discovered_hosts and discovery_events
+HostRow = namedtuple("HostRow", ["id", "ip_address", "discovered_at"])
+EventRow = namedtuple("EventRow", ["id", "ip_address", "occurred_at", "last_seen"])
+
+
+def make_device_rows(count: int) -> list[DeviceRow]:
+    now = datetime.now(timezone.utc)
+    return [
+        DeviceRow(
+            i, f"device-{i}", f"10.{i >> 16 & 255}.{i >> 8 & 255}.{i & 255}", None, i % 10, i % 5, None,
+            f"Location {i % 10}", f"Type {i % 5}", "server", 60,
+            i % 7 != 0, now - timedelta(hours=i % 48), now, 3 + i % 40, 0,
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_scan_rows(count: int) -> list[ScanRow]:
+    now = datetime.now(timezone.utc)
+    return [
+        ScanRow(
+            i, now - timedelta(seconds=i), i % 1000, i % 7 != 0, 3 + i % 40, "Online", "sample", None,
+            f"device-{i % 1000}", f"10.0.{i % 1000 >> 8}.{i % 256}",
+        )
+        for i in range(1, count + 1)
+    ]
+
+
+def make_log_rows(count: int) -> list[tuple[int, tuple]]:
+    """
+    (rank, row) pairs as crud.get_logs merges them: mostly scans, some new and disappeared hosts.
+    """
+    now = datetime.now(timezone.utc)
+    scans = iter(make_scan_rows(count))
+    rows = []
+    for i in range(1, count + 1):
+        ip_address = f"172.16.{i >> 8 & 255}.{i & 255}"
+        if i % 10 == 0:
+            rows.append((crud.DISCOVERY_RANK, HostRow(i, ip_address, now - timedelta(seconds=i))))
+        elif i % 25 == 1:
+            rows.append((crud.DISAPPEARANCE_RANK, EventRow(
+                i, ip_address, now - timedelta(seconds=i), now - timedelta(seconds=i + 90),
+            )))
+        else:
+            rows.append((crud.SCAN_RANK, next(scans)))
+    return rows
+
+
+def log_entry(item: tuple[int, tuple]) -> dict:
+    rank, row = item
+    return crud.LOG_ENTRY_BUILDERS[rank](row)
+
+
+def device_orm_objects(rows: list[DeviceRow]) -> list[models.Device]:
+    """Transient ORM objects with the same content, as the joinedload query used to return them."""
+    return [
+        models.Device(
+            id=row.id, name=row.name, ip_address=row.ip_address, mac_address=row.mac_address,
+            location_id=row.location_id, device_type_id=row.device_type_id,
+            probe_interval_seconds=row.probe_interval_seconds,
+            location=models.Location(id=row.location_id, name=row.location_name),
+            device_type=models.DeviceType(
+                id=row.device_type_id, name=row.device_type_name, icon_name=row.icon_name,
+                probe_interval_seconds=row.device_type_probe_interval_seconds,
+            ),
+            status=models.DeviceStatus(
+                device_id=row.id, is_online=row.is_online, last_change_at=row.last_change_at,
+                last_checked_at=row.last_checked_at, last_response_time_ms=row.last_response_time_ms,
+                consecutive_failures=row.consecutive_failures,
+            ),
+        )
+        for row in rows
+    ]
+
+
+def scan_orm_objects(rows: list[ScanRow]) -> list[models.ScanResult]:
+    return [
+        models.ScanResult(
+            id=row.id, timestamp=row.timestamp, device_id=row.device_id, status=row.status,
+            response_time_ms=row.response_time_ms, log_message=row.log_message, record_type=row.record_type,
+            state_duration_seconds=row.state_duration_seconds,
+            device=models.Device(id=row.device_id, name=row.device_name, ip_address=row.ip_address),
+        )
+        for row in rows
+    ]
+
+
+def previous_path(adapter: TypeAdapter, objects, entry_builder=None) -> bytes:
+    # what FastAPI does for a response_model: validate, dump in JSON mode, json.dumps
+    if entry_builder is not None:
+        objects = [entry_builder(item) for item in objects]
+    validated = adapter.validate_python(objects, from_attributes=True)
+    return json.dumps(adapter.dump_python(validated, mode="json")).encode()
+
+
+def fast_path(entry_builder, rows) -> bytes:
+    return orjson.dumps([entry_builder(row) for row in rows])
+
+
+def measure(function, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        function()
+        timings.append(time.perf_counter() - started)
+    return statistics.median(timings) * 1000
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=5000, help="rows per page")
+    parser.add_argument("--repeat", type=int, default=20, help="runs per measurement (median is reported)")
+    args = parser.parse_args()
+
+    device_rows = make_device_rows(args.rows)
+    scan_rows = make_scan_rows(args.rows)
+    log_rows = make_log_rows(args.rows)
+    devices_adapter = TypeAdapter(List[schemas.Device])
+    scans_adapter = TypeAdapter(List[schemas.ScanResultWithDevice])
+    logs_adapter = TypeAdapter(List[schemas.LogEntry])
+    device_objects = device_orm_objects(device_rows)
+    scan_objects = scan_orm_objects(scan_rows)
+    cases = [
+        ("/devices/", lambda: previous_path(devices_adapter, device_objects), crud.device_list_entry, device_rows),
+        ("/scan-results/", lambda: previous_path(scans_adapter, scan_objects), crud.scan_list_entry, scan_rows),
+        ("/logs/", lambda: previous_path(logs_adapter, log_rows, log_entry), log_entry, log_rows),
+    ]
+
+    print(f"{args.rows} rows per page, median of {args.repeat} runs")
+    print(f"{'endpoint':<16} {'previous ms':>12} {'fast ms':>10} {'speedup':>9}")
+    for endpoint, previous_case, entry_builder, rows in cases:
+        previous = measure(previous_case, args.repeat)
+        fast = measure(lambda: fast_path(entry_builder, rows), args.repeat)
+        print(f"{endpoint:<16} {previous:>12.2f} {fast:>10.2f} {previous / fast:>8.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+"""
+Throughput harness of the monitor and discovery loops against a simulated network.
+
+Probes go through probes.SimulatedNetwork instead of ICMP/ping/nmap, database writes are
+real, so run it against a benchmark database (see benchmarks.fleet):
+
+    cd backend
+    python -m benchmarks.fleet --reset --devices 50000 --scan-rows 0
+    python -m benchmarks.workers --network benchmarks/simulated_network.json --monitor-cycles 5 --discovery-cycles 2
+
+Reported per cycle: duration, probes/s (addresses/s for discovery), database rows/s (inserted and updated) and
+the peak resident memory of the process.
+"""
+import argparse
+import asyncio
+import logging
+import resource
+import sys
+import time
+from datetime import timedelta
+
+import crud
+import discovery_worker
+import probes
+import worker
+from database import AsyncSessionLocal
+from rollups import RollupAccumulator
+from scheduler import DeviceSchedule
+from transitions import TransitionTracker
+
+logger = logging.getLogger(__name__)
+
+
+def peak_memory_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+async def monitor_cycle(
+    entries: list[DeviceSchedule],
+    batch_size: int,
+    concurrency: int,
+    tracker: TransitionTracker | None,
+    rollup: RollupAccumulator,
+) -> dict:
+    """
+    Probe every device once, in batches of batch_size with up to `concurrency` batches in flight,
+    the way the worker's main loop dispatches due devices.
+    """
+    semaphore = asyncio.Semaphore(concurrency)
+    totals = {"probes": 0, "online": 0, "rows_written": 0, "write_seconds": 0.0}
+
+    async def run_batch(batch: list[DeviceSchedule]):
+        async with semaphore:
+            results, stats = await worker.run_scan_cycle(batch, tracker, rollup)
+        for entry, (_, is_online, _) in zip(batch, results):
+            entry.is_online = is_online
+        for key in totals:
+            totals[key] += stats[key]
+
+    started = time.perf_counter()
+    await asyncio.gather(*(
+        run_batch(entries[start : start + batch_size]) for start in range(0, len(entries), batch_size)
+    ))
+    if len(rollup):
+        async with AsyncSessionLocal() as db:
+            await rollup.flush(db)
+    return {**totals, "duration": time.perf_counter() - started}
+
+
+async def run_monitor(args):
+    async with AsyncSessionLocal() as db:
+        devices = await crud.get_monitored_devices(db, worker.SCAN_INTERVAL_SECONDS)
+    if not devices:
+        logger.warning("No devices in the database, generate a fleet with benchmarks.fleet first.")
+        return
+    entries = [DeviceSchedule(*device) for device in devices]
+    tracker = None
+    if args.storage == "transitions":
+        tracker = TransitionTracker(timedelta(seconds=worker.HEARTBEAT_INTERVAL_SECONDS))
+        async with AsyncSessionLocal() as db:
+            tracker.seed(await crud.get_latest_scan_states(db))
+    rollup = RollupAccumulator()
+
+    print(f"Monitor: {len(entries)} devices, batches of {args.batch_size}, {args.concurrency} in flight")
+    print(f"{'cycle':>5} {'seconds':>9} {'probes/s':>10} {'online':>8} {'rows':>9} {'rows/s':>9} {'peak MB':>8}")
+    for cycle in range(1, args.monitor_cycles + 1):
+        stats = await monitor_cycle(entries, args.batch_size, args.concurrency, tracker, rollup)
+        rows_per_second = stats["rows_written"] / stats["write_seconds"] if stats["write_seconds"] else 0
+        print(
+            f"{cycle:>5} {stats['duration']:>9.2f} {stats['probes'] / stats['duration']:>10.0f} "
+            f"{stats['online']:>8} {stats['rows_written']:>9} {rows_per_second:>9.0f} {peak_memory_mb():>8.0f}"
+        )
+
+
+async def run_discovery(args):
+    states: dict[int, discovery_worker.NetworkSweep] = {}
+    print(f"{'cycle':>5} {'seconds':>9} {'addresses/s':>12} {'reachable':>10} {'rows':>8} {'rows/s':>9} {'peak MB':>8}")
+    for cycle in range(1, args.discovery_cycles + 1):
+        started = time.perf_counter()
+        # inserted hosts and events plus last_seen updates
+        rows = await discovery_worker.run_discovery_cycle(states)
+        duration = time.perf_counter() - started
+        addresses = sum(len(sweep.host_range) for sweep in states.values())
+        reachable = sum(len(sweep.reachable) for sweep in states.values())
+        print(
+            f"{cycle:>5} {duration:>9.2f} {addresses / duration:>12.0f} {reachable:>10} "
+            f"{rows:>8} {rows / duration:>9.0f} {peak_memory_mb():>8.0f}"
+        )
+
+
+async def run(args):
+    if args.network:
+        network = probes.SimulatedNetwork.from_file(args.network)
+    else:
+        network = probes.SimulatedNetwork()
+    if args.time_scale is not None:
+        network.time_scale = args.time_scale
+    probes.install_backend(network)
+    print(f"Simulated network, time scale {network.time_scale}")
+
+    if args.monitor_cycles:
+        await run_monitor(args)
+    if args.discovery_cycles:
+        print("Discovery:")
+        await run_discovery(args)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--network", help="JSON description of the simulated network (probes.SimulatedNetwork)")
+    parser.add_argument("--time-scale", type=float, help="1 = real simulated delays, 0 = no waiting")
+    parser.add_argument("--monitor-cycles", type=int, default=3)
+    parser.add_argument("--discovery-cycles", type=int, default=1)
+    parser.add_argument("--batch-size", type=int, default=5000, help="devices per probe batch")
+    parser.add_argument("--concurrency", type=int, default=4, help="probe batches in flight")
+    parser.add_argument("--storage", choices=("full", "transitions"), default=worker.SCAN_STORAGE_MODE)
+    args = parser.parse_args()
+    # the workers configure logging on import, keep their per-network lines out of the tables
+    logging.getLogger().setLevel(logging.WARNING)
+    asyncio.run(run(args))
+
+
+if __name__ == "__main__":
+    main()
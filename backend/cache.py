@@ -0,0 +1,80 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from typing import Callable
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+
+DICTIONARY_CACHE_TTL_SECONDS = float(os.getenv("DICTIONARY_CACHE_TTL_SECONDS", "300"))
+
+
+class DictionaryCache:
+    """
+    In-process cache of serialized dictionary responses (locations, device types,
+    discovery networks). Entries are dropped by the write endpoints through
+    invalidate() and additionally expire after their TTL, which covers changes
+    made by other processes (e.g. the discovery worker).
+    """
+
+    def __init__(self):
+        # key -> (body, etag, expires_at)
+        self._entries: dict[str, tuple[bytes, str, float]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> tuple[bytes, str] | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[2] < time.monotonic():
+                del self._entries[key]
+                return None
+            return entry[0], entry[1]
+
+    def set(self, key: str, body: bytes, ttl: float) -> str:
+        etag = f'"{hashlib.sha1(body).hexdigest()}"'
+        with self._lock:
+            self._entries[key] = (body, etag, time.monotonic() + ttl)
+        return etag
+
+    def invalidate(self, *keys: str):
+        with self._lock:
+            for key in keys:
+                self._entries.pop(key, None)
+
+
+dictionary_cache = DictionaryCache()
+
+
+def _etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = {value.strip().removeprefix("W/") for value in if_none_match.split(",")}
+    return etag in candidates or "*" in candidates
+
+
+def cached_json_response(
+    request: Request,
+    key: str,
+    loader: Callable[[], object],
+    ttl: float = DICTIONARY_CACHE_TTL_SECONDS,
+) -> Response:
+    """
+    Serve a JSON list from the dictionary cache, loading it on a miss.
+    Answers 304 Not Modified when the client already holds the current ETag.
+    """
+    cached = dictionary_cache.get(key)
+    if cached is None:
+        body = json.dumps(jsonable_encoder(loader()), separators=(",", ":")).encode()
+        etag = dictionary_cache.set(key, body, ttl)
+    else:
+        body, etag = cached
+
+    # no-cache: browsers keep the body but revalidate it with If-None-Match on every request
+    headers = {"ETag": etag, "Cache-Control": "no-cache"}
+    if _etag_matches(request, etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=body, media_type="application/json", headers=headers)
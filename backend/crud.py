@@ -1,8 +1,14 @@
+from sqlalchemy import and_, case, delete, exists, func, insert, literal_column, select, update
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session, joinedload
 from datetime import datetime
+import heapq
+import ipaddress
+from itertools import islice
 import models
 import schemas
-import auth
+from pagination import encode_cursor, seek_before
 
 
 # User management
@@ -10,9 +16,7 @@ def get_user_by_email(db: Session, email: str):
     return db.query(models.User).filter(models.User.email == email).first()
 
 
-def create_user(db: Session, user: schemas.UserCreate):
-    hashed_password = auth.get_password_hash(user.password)
-
+def create_user(db: Session, user: schemas.UserCreate, hashed_password: str):
     db_user = models.User(
         email=user.email,
         hashed_password=hashed_password,
@@ -57,6 +61,19 @@ def update_location(db: Session, location_id: int, location_update: schemas.Loca
     return db_location
 
 
+def get_locations_with_device_counts(db: Session):
+    """
+    Return (location, devices_count) pairs computed in a single GROUP BY query.
+    """
+    return (
+        db.query(models.Location, func.count(models.Device.id))
+        .outerjoin(models.Device, models.Device.location_id == models.Location.id)
+        .group_by(models.Location.id)
+        .order_by(models.Location.id)
+        .all()
+    )
+
+
 def count_devices_for_location(db: Session, location_id: int) -> int:
     return (
         db.query(models.Device)
@@ -78,8 +95,18 @@ def get_device_types(db: Session):
     return db.query(models.DeviceType).all()
 
 
-def get_discovery_networks(db: Session):
-    return db.query(models.DiscoveryNetwork).order_by(models.DiscoveryNetwork.id.asc()).all()
+def get_device_type(db: Session, device_type_id: int):
+    return db.query(models.DeviceType).filter(models.DeviceType.id == device_type_id).first()
+
+
+def update_device_type(db: Session, device_type_id: int, device_type_update: schemas.DeviceTypeUpdate):
+    db_device_type = get_device_type(db, device_type_id)
+    if not db_device_type:
+        return None
+    db_device_type.probe_interval_seconds = device_type_update.probe_interval_seconds
+    db.commit()
+    db.refresh(db_device_type)
+    return db_device_type
 
 
 def get_discovery_network(db: Session, network_id: int):
@@ -130,48 +157,129 @@ def count_pending_discovered_hosts(db: Session, network_id: int) -> int:
     ).count()
 
 
+def get_discovery_networks_with_pending_counts(db: Session):
+    """
+    Return (network, pending hosts count) pairs computed in a single GROUP BY query.
+    """
+    return (
+        db.query(models.DiscoveryNetwork, func.count(models.DiscoveredHost.id))
+        .outerjoin(
+            models.DiscoveredHost,
+            and_(
+                models.DiscoveredHost.network_id == models.DiscoveryNetwork.id,
+                models.DiscoveredHost.status == "pending",
+            ),
+        )
+        .group_by(models.DiscoveryNetwork.id)
+        .order_by(models.DiscoveryNetwork.id.asc())
+        .all()
+    )
+
+
+def _disappeared_since_last_seen(hosts):
+    # a disappearance recorded after the sweep that last found the host alive
+    events = models.DiscoveryEvent.__table__
+    return exists().where(
+        events.c.network_id == hosts.c.network_id,
+        events.c.ip_address == hosts.c.ip_address,
+        events.c.event_type == "disappeared",
+        events.c.occurred_at >= hosts.c.last_seen,
+    )
+
+
 def get_pending_discovered_hosts(db: Session):
-    return db.query(models.DiscoveredHost).filter(
-        models.DiscoveredHost.status == "pending"
-    ).order_by(models.DiscoveredHost.discovered_at.asc()).all()
+    """
+    Pending hosts as Core rows. The stored last_seen only moves when a host appears or
+    disappears, so a host still alive reports the network's last successful sweep instead.
+    """
+    hosts = models.DiscoveredHost.__table__
+    networks = models.DiscoveryNetwork.__table__
+    last_seen = case(
+        (_disappeared_since_last_seen(hosts), hosts.c.last_seen),
+        else_=func.greatest(hosts.c.last_seen, networks.c.last_discovery),
+    )
+    stmt = (
+        select(
+            hosts.c.id, hosts.c.network_id, hosts.c.ip_address, hosts.c.status, hosts.c.proposed_name,
+            hosts.c.discovered_at, last_seen.label("last_seen"),
+        )
+        .join(networks, networks.c.id == hosts.c.network_id)
+        .where(hosts.c.status == "pending")
+        .order_by(hosts.c.discovered_at.asc())
+    )
+    return db.execute(stmt).all()
 
 
 def get_discovered_host(db: Session, host_id: int):
     return db.query(models.DiscoveredHost).filter(models.DiscoveredHost.id == host_id).first()
 
 
-def create_discovered_host_if_missing(db: Session, network_id: int, ip_address: str):
-    existing = db.query(models.DiscoveredHost).filter(
-        models.DiscoveredHost.ip_address == ip_address,
-        models.DiscoveredHost.status == "pending"
-    ).first()
-    if existing:
-        return None
-
-    db_host = models.DiscoveredHost(
-        network_id=network_id,
-        ip_address=ip_address,
-        status="pending",
-        discovered_at=datetime.now(),
+def get_discovered_hosts_for_update(
+    db: Session,
+    host_ids: list[int] | None = None,
+    network_id: int | None = None,
+    address_range: tuple[int, int] | None = None,
+):
+    """
+    Load and lock (SELECT ... FOR UPDATE) the selected discovered hosts for a bulk triage.
+    address_range is an inclusive (first, last) integer range, compared as inet in SQL.
+    """
+    query = db.query(models.DiscoveredHost)
+    if host_ids is not None:
+        query = query.filter(models.DiscoveredHost.id.in_(host_ids))
+    else:
+        query = query.filter(models.DiscoveredHost.status == "pending")
+    if network_id is not None:
+        query = query.filter(models.DiscoveredHost.network_id == network_id)
+    if address_range is not None:
+        first, last = address_range
+        query = query.filter(models.DiscoveredHost.ip_address.between(
+            str(ipaddress.IPv4Address(first)), str(ipaddress.IPv4Address(last))
+        ))
+    return query.order_by(models.DiscoveredHost.id).with_for_update().all()
+
+
+def get_device_ids_by_ip(db: Session, ip_addresses: list[str]) -> dict[str, int]:
+    rows = db.query(models.Device.ip_address, models.Device.id).filter(
+        models.Device.ip_address.in_(ip_addresses)
+    ).all()
+    return {ip_address: device_id for ip_address, device_id in rows}
+
+
+def bulk_insert_devices(db: Session, rows: list[dict]) -> dict[str, int]:
+    """
+    Insert devices with one statement, skipping rows that hit a unique IP/MAC (e.g. a concurrent insert).
+    Returns ip_address -> id of the inserted devices. The async import runs it through AsyncSession.run_sync.
+    """
+    if not rows:
+        return {}
+    table = models.Device.__table__
+    result = db.execute(
+        pg_insert(table).values(rows).on_conflict_do_nothing().returning(table.c.ip_address, table.c.id)
     )
-    db.add(db_host)
-    return db_host
+    return {ip_address: device_id for ip_address, device_id in result.all()}
 
 
-def mark_network_discovery_time(db: Session, network_id: int):
-    db_network = get_discovery_network(db, network_id)
-    if db_network:
-        db_network.last_discovery = datetime.now()
-        db.add(db_network)
+def bulk_update_discovered_hosts(db: Session, updates: list[dict]):
+    """
+    updates - dicts with id and the columns to change (status, proposed_name), one executemany.
+    """
+    if updates:
+        db.execute(update(models.DiscoveredHost), updates)
 
 
 # Devices(Core)
-def get_devices(db: Session, skip: int = 0, limit: int = 100):
-    return db.query(models.Device).offset(skip).limit(limit).all()
+def _device_load_options():
+    # location, type and current status are joined in the same query
+    return (
+        joinedload(models.Device.location),
+        joinedload(models.Device.device_type),
+        joinedload(models.Device.status),
+    )
 
 
 def get_device(db: Session, device_id: int):
-    return db.query(models.Device).filter(models.Device.id == device_id).first()
+    return db.query(models.Device).options(*_device_load_options()).filter(models.Device.id == device_id).first()
 
 
 def get_device_by_ip(db: Session, ip_address: str):
@@ -190,7 +298,8 @@ def create_device(db: Session, device: schemas.DeviceCreate):
         ip_address=str(device.ip_address),
         mac_address=device.mac_address if device.mac_address else None,
         location_id=device.location_id,
-        device_type_id=device.device_type_id
+        device_type_id=device.device_type_id,
+        probe_interval_seconds=device.probe_interval_seconds,
     )
 
     db.add(db_device)
@@ -210,6 +319,7 @@ def update_device(db: Session, device_id: int, device_update: schemas.DeviceCrea
     db_device.mac_address = device_update.mac_address if device_update.mac_address else None
     db_device.location_id = device_update.location_id
     db_device.device_type_id = device_update.device_type_id
+    db_device.probe_interval_seconds = device_update.probe_interval_seconds
 
     db.commit()
     db.refresh(db_device)
@@ -224,30 +334,433 @@ def delete_device(db: Session, device_id: int):
     return db_device
 
 
-def get_scan_results(db: Session, skip: int = 0, limit: int = 50):
-    return db.query(models.ScanResult)\
-        .options(joinedload(models.ScanResult.device))\
-        .order_by(models.ScanResult.timestamp.desc())\
-        .offset(skip)\
-        .limit(limit)\
+def get_availability_rollups(db: Session, model, device_id: int, start: datetime, end: datetime):
+    return (
+        db.query(model)
+        .filter(
+            model.device_id == device_id,
+            model.bucket_start >= start,
+            model.bucket_start < end,
+        )
+        .order_by(model.bucket_start.asc())
         .all()
+    )
+
+
+# Async data access (AsyncSession) - monitor/discovery workers and hot read endpoints
+def _device_list_select():
+    devices = models.Device.__table__
+    locations = models.Location.__table__
+    device_types = models.DeviceType.__table__
+    statuses = models.DeviceStatus.__table__
+    return select(
+        devices.c.id,
+        devices.c.name,
+        devices.c.ip_address,
+        devices.c.mac_address,
+        devices.c.location_id,
+        devices.c.device_type_id,
+        devices.c.probe_interval_seconds,
+        locations.c.name.label("location_name"),
+        device_types.c.name.label("device_type_name"),
+        device_types.c.icon_name,
+        device_types.c.probe_interval_seconds.label("device_type_probe_interval_seconds"),
+        statuses.c.is_online,
+        statuses.c.last_change_at,
+        statuses.c.last_checked_at,
+        statuses.c.last_response_time_ms,
+        statuses.c.consecutive_failures,
+    ).select_from(
+        devices
+        .outerjoin(locations, locations.c.id == devices.c.location_id)
+        .outerjoin(device_types, device_types.c.id == devices.c.device_type_id)
+        .outerjoin(statuses, statuses.c.device_id == devices.c.id)
+    )
+
+
+def device_list_entry(row) -> dict:
+    """
+    Shape a row of _device_list_select() like schemas.Device, without ORM objects or validation.
+    """
+    return {
+        "id": row.id,
+        "name": row.name,
+        "ip_address": row.ip_address,
+        "mac_address": row.mac_address,
+        "location_id": row.location_id,
+        "device_type_id": row.device_type_id,
+        "probe_interval_seconds": row.probe_interval_seconds,
+        "location": {"id": row.location_id, "name": row.location_name} if row.location_name is not None else None,
+        "device_type": {
+            "id": row.device_type_id,
+            "name": row.device_type_name,
+            "icon_name": row.icon_name,
+            "probe_interval_seconds": row.device_type_probe_interval_seconds,
+        } if row.device_type_name is not None else None,
+        "status": {
+            "is_online": row.is_online,
+            "last_change_at": row.last_change_at,
+            "last_checked_at": row.last_checked_at,
+            "last_response_time_ms": row.last_response_time_ms,
+            "consecutive_failures": row.consecutive_failures,
+        } if row.is_online is not None else None,
+    }
+
+
+async def get_devices(db: AsyncSession, skip: int = 0, limit: int = 100) -> list[dict]:
+    """
+    Page of devices with location, type and status, as plain dicts ready for JSON encoding.
+    """
+    result = await db.execute(
+        _device_list_select().order_by(models.Device.__table__.c.id).offset(skip).limit(limit)
+    )
+    return [device_list_entry(row) for row in result]
+
+
+async def search_devices(
+    db: AsyncSession,
+    cidr: str | None = None,
+    location_id: int | None = None,
+    device_type_id: int | None = None,
+    is_online: bool | None = None,
+    name_prefix: str | None = None,
+    skip: int = 0,
+    limit: int = 100,
+):
+    """
+    Filtered device listing. Every filter is backed by an index: the GiST inet index for
+    CIDR containment (ip_address <<= cidr), lower(name) text_pattern_ops for the name prefix.
+    """
+    query = select(models.Device).options(*_device_load_options())
+    if cidr is not None:
+        query = query.where(models.Device.ip_address.op("<<=")(cidr))
+    if location_id is not None:
+        query = query.where(models.Device.location_id == location_id)
+    if device_type_id is not None:
+        query = query.where(models.Device.device_type_id == device_type_id)
+    if is_online is not None:
+        query = query.join(models.DeviceStatus, models.DeviceStatus.device_id == models.Device.id).where(
+            models.DeviceStatus.is_online == is_online
+        )
+    if name_prefix:
+        pattern = name_prefix.lower().replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+        query = query.where(func.lower(models.Device.name).like(pattern + "%", escape="\\"))
+    result = await db.execute(query.order_by(models.Device.id).offset(skip).limit(limit))
+    return result.scalars().all()
+
+
+async def get_location_ids(db: AsyncSession) -> set[int]:
+    result = await db.execute(select(models.Location.id))
+    return set(result.scalars().all())
+
+
+async def get_device_type_ids(db: AsyncSession) -> set[int]:
+    result = await db.execute(select(models.DeviceType.id))
+    return set(result.scalars().all())
+
+
+async def get_taken_device_addresses(db: AsyncSession, ip_addresses: list[str], mac_addresses: list[str]):
+    """
+    Return (ip addresses, mac addresses) out of the given ones that already belong to a device.
+    """
+    result = await db.execute(
+        select(models.Device.ip_address, models.Device.mac_address).where(
+            (models.Device.ip_address.in_(ip_addresses)) | (models.Device.mac_address.in_(mac_addresses))
+        )
+    )
+    taken_ips, taken_macs = set(), set()
+    for ip_address, mac_address in result.all():
+        taken_ips.add(ip_address)
+        if mac_address:
+            taken_macs.add(mac_address)
+    return taken_ips, taken_macs
+
+
+DEVICE_EXPORT_COLUMNS = (
+    "id", "name", "ip_address", "mac_address", "location_id", "device_type_id", "probe_interval_seconds",
+)
+
+
+async def stream_devices(db: AsyncSession, batch_size: int = 1000):
+    """
+    Stream the inventory as Core rows through a server-side cursor.
+    """
+    table = models.Device.__table__
+    return await db.stream(
+        select(*(table.c[column] for column in DEVICE_EXPORT_COLUMNS))
+        .order_by(table.c.id)
+        .execution_options(yield_per=batch_size)
+    )
+
+
+async def get_device_ips(db: AsyncSession) -> set[str]:
+    result = await db.execute(select(models.Device.ip_address))
+    return set(result.scalars().all())
+
+
+async def get_monitored_devices(db: AsyncSession, default_interval: int, shard_index: int = 0, shard_count: int = 1):
+    """
+    Return (id, name, ip_address, effective probe interval) of every monitored device.
+    The interval is resolved device -> device type -> default_interval.
+    With shard_count > 1 only devices of the given shard (id modulo shard count) are returned.
+    """
+    interval = func.coalesce(
+        models.Device.probe_interval_seconds,
+        models.DeviceType.probe_interval_seconds,
+        default_interval,
+    )
+    stmt = (
+        select(models.Device.id, models.Device.name, models.Device.ip_address, interval)
+        .outerjoin(models.DeviceType, models.Device.device_type_id == models.DeviceType.id)
+    )
+    if shard_count > 1:
+        stmt = stmt.where(models.Device.id % shard_count == shard_index)
+    result = await db.execute(stmt)
+    return [tuple(row) for row in result.all()]
+
+
+async def upsert_device_statuses(db: AsyncSession, rows: list[dict], chunk_size: int = 1000) -> int:
+    """
+    Upsert the latest probe result of each device into device_status.
+    rows - dicts with device_id, is_online, checked_at, response_time_ms.
+    last_change_at only moves when the state flips, consecutive_failures counts offline probes.
+    """
+    table = models.DeviceStatus.__table__
+    for start in range(0, len(rows), chunk_size):
+        stmt = pg_insert(table).values([
+            {
+                "device_id": row["device_id"],
+                "is_online": row["is_online"],
+                "last_change_at": row["checked_at"],
+                "last_checked_at": row["checked_at"],
+                "last_response_time_ms": row["response_time_ms"],
+                "consecutive_failures": 0 if row["is_online"] else 1,
+            }
+            for row in rows[start : start + chunk_size]
+        ])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.device_id],
+            set_={
+                "is_online": excluded.is_online,
+                "last_checked_at": excluded.last_checked_at,
+                "last_response_time_ms": excluded.last_response_time_ms,
+                "last_change_at": case(
+                    (table.c.is_online.is_distinct_from(excluded.is_online), excluded.last_checked_at),
+                    else_=table.c.last_change_at,
+                ),
+                "consecutive_failures": case(
+                    (excluded.is_online, 0),
+                    else_=table.c.consecutive_failures + 1,
+                ),
+            },
+        )
+        await db.execute(stmt)
+    return len(rows)
+
+
+async def upsert_availability_rollups(db: AsyncSession, model, rows: list[dict], chunk_size: int = 1000) -> int:
+    """
+    Merge aggregate rows into a rollup table: counters and sums are added,
+    min/max are combined and RTT histograms are summed element-wise.
+    """
+    table = model.__table__
+    for start in range(0, len(rows), chunk_size):
+        stmt = pg_insert(table).values(rows[start : start + chunk_size])
+        excluded = stmt.excluded
+        stmt = stmt.on_conflict_do_update(
+            index_elements=[table.c.device_id, table.c.bucket_start],
+            set_={
+                "samples": table.c.samples + excluded.samples,
+                "up_count": table.c.up_count + excluded.up_count,
+                "rtt_count": table.c.rtt_count + excluded.rtt_count,
+                "rtt_sum": table.c.rtt_sum + excluded.rtt_sum,
+                "rtt_min": func.least(table.c.rtt_min, excluded.rtt_min),
+                "rtt_max": func.greatest(table.c.rtt_max, excluded.rtt_max),
+                "rtt_histogram": literal_column(
+                    f"ARRAY(SELECT a + b FROM unnest({table.name}.rtt_histogram, excluded.rtt_histogram) AS h(a, b))"
+                ),
+            },
+        )
+        await db.execute(stmt)
+    return len(rows)
+
+
+async def delete_availability_rollups_before(db: AsyncSession, model, cutoff: datetime):
+    await db.execute(delete(model).where(model.bucket_start < cutoff))
+
+
+async def get_latest_scan_states(db: AsyncSession, shard_index: int = 0, shard_count: int = 1):
+    """
+    Return (device_id, status, timestamp, record_type, state_duration_seconds)
+    of the most recent scan result of every device.
+    """
+    stmt = (
+        select(
+            models.ScanResult.device_id,
+            models.ScanResult.status,
+            models.ScanResult.timestamp,
+            models.ScanResult.record_type,
+            models.ScanResult.state_duration_seconds,
+        )
+        .distinct(models.ScanResult.device_id)
+        .order_by(models.ScanResult.device_id, models.ScanResult.timestamp.desc())
+    )
+    if shard_count > 1:
+        stmt = stmt.where(models.ScanResult.device_id % shard_count == shard_index)
+    result = await db.execute(stmt)
+    return [tuple(row) for row in result.all()]
+
+
+SCAN_RESULT_COLUMNS = (
+    "device_id", "status", "response_time_ms", "log_message", "timestamp", "record_type", "state_duration_seconds",
+)
+# asyncpg accepts at most 32767 bind parameters per statement, one per column of every row
+MAX_INSERT_CHUNK_SIZE = 32767 // len(SCAN_RESULT_COLUMNS)
+
+
+class ScanWriteError(Exception):
+    """
+    A chunk of bulk_insert_scan_results failed. The first `written` rows were committed before it.
+    """
+
+    def __init__(self, written: int, error: Exception):
+        super().__init__(f"{error} ({written} rows written before the failure)")
+        self.written = written
+
+
+async def _copy_scan_results(db: AsyncSession, rows: list[dict]):
+    # COPY runs on the asyncpg connection inside the session's transaction
+    connection = await db.connection()
+    raw_connection = await connection.get_raw_connection()
+    await raw_connection.driver_connection.copy_records_to_table(
+        models.ScanResult.__tablename__,
+        records=[tuple(row.get(column) for column in SCAN_RESULT_COLUMNS) for row in rows],
+        columns=SCAN_RESULT_COLUMNS,
+    )
+
+
+async def bulk_insert_scan_results(db: AsyncSession, rows: list[dict], chunk_size: int = 1000, method: str = "copy") -> int:
+    """
+    Write scan results in chunks, committing after each chunk.
+    method="copy" streams rows with PostgreSQL COPY, method="insert" uses a multi-row INSERT ... VALUES
+    (chunks capped at MAX_INSERT_CHUNK_SIZE rows).
+    Returns the number of rows written, raises ScanWriteError with the committed count when a chunk fails.
+    """
+    if method != "copy":
+        chunk_size = min(chunk_size, MAX_INSERT_CHUNK_SIZE)
+    written = 0
+    for start in range(0, len(rows), chunk_size):
+        chunk = rows[start : start + chunk_size]
+        try:
+            if method == "copy":
+                await _copy_scan_results(db, chunk)
+            else:
+                await db.execute(insert(models.ScanResult.__table__).values(chunk))
+            await db.commit()
+        except Exception as e:
+            raise ScanWriteError(written, e) from e
+        written += len(chunk)
+    return written
+
+
+# Tie-break rank of log sources sharing a timestamp, see get_logs
+SCAN_RANK = 1
+DISCOVERY_RANK = 0
+DISAPPEARANCE_RANK = 2
+
+
+def _scan_list_select():
+    scans = models.ScanResult.__table__
+    devices = models.Device.__table__
+    return select(
+        scans.c.id,
+        scans.c.timestamp,
+        scans.c.device_id,
+        scans.c.status,
+        scans.c.response_time_ms,
+        scans.c.log_message,
+        scans.c.record_type,
+        scans.c.state_duration_seconds,
+        devices.c.name.label("device_name"),
+        devices.c.ip_address,
+    ).select_from(scans.outerjoin(devices, devices.c.id == scans.c.device_id))
+
+
+def scan_list_entry(row) -> dict:
+    """
+    Shape a row of _scan_list_select() like schemas.ScanResultWithDevice.
+    """
+    return {
+        "id": row.id,
+        "timestamp": row.timestamp,
+        "device_id": row.device_id,
+        "status": row.status,
+        "response_time_ms": row.response_time_ms,
+        "log_message": row.log_message,
+        "record_type": row.record_type,
+        "state_duration_seconds": row.state_duration_seconds,
+        "device": {"name": row.device_name, "ip_address": row.ip_address} if row.device_name is not None else None,
+    }
+
+
+async def get_scan_results(db: AsyncSession, skip: int = 0, limit: int = 50, cursor: tuple | None = None):
+    """
+    Return a page of scan results (newest first, plain dicts) and the cursor of the next page.
+    With a cursor the page is found by an index seek, so deep pages cost the same as the first one.
+    """
+    scans = models.ScanResult.__table__
+    stmt = _scan_list_select()
+    if cursor is not None:
+        stmt = stmt.where(seek_before(scans.c.timestamp, scans.c.id, SCAN_RANK, cursor))
+    else:
+        stmt = stmt.offset(skip)
+    result = await db.execute(stmt.order_by(scans.c.timestamp.desc(), scans.c.id.desc()).limit(limit))
+    rows = result.all()
+
+    next_cursor = None
+    if len(rows) == limit:
+        next_cursor = encode_cursor(rows[-1].timestamp, SCAN_RANK, rows[-1].id)
+    return [scan_list_entry(row) for row in rows], next_cursor
+
+
+# Column order of _scan_list_select(), the header of the CSV scan export
+SCAN_EXPORT_COLUMNS = (
+    "id", "timestamp", "device_id", "status", "response_time_ms", "log_message",
+    "record_type", "state_duration_seconds", "device_name", "ip_address",
+)
+
+
+async def stream_scan_results(
+    db: AsyncSession, start: datetime, end: datetime, device_id: int | None = None, batch_size: int = 5000
+):
+    """
+    Stream scan history of [start, end) oldest first as Core rows through a server-side cursor.
+    The timestamp range prunes the daily partitions, device_id uses ix_scan_results_device_id_timestamp.
+    """
+    scans = models.ScanResult.__table__
+    stmt = _scan_list_select().where(scans.c.timestamp >= start, scans.c.timestamp < end)
+    if device_id is not None:
+        stmt = stmt.where(scans.c.device_id == device_id)
+    return await db.stream(
+        stmt.order_by(scans.c.timestamp, scans.c.id).execution_options(yield_per=batch_size)
+    )
 
 
-def _scan_to_log_entry(scan: models.ScanResult) -> dict:
-    device = scan.device
+def _scan_to_log_entry(scan) -> dict:
     return {
         "id": f"scan-{scan.id}",
         "event_type": "scan",
         "timestamp": scan.timestamp,
-        "device_name": device.name if device else "Unknown",
-        "ip_address": device.ip_address if device else None,
+        "device_name": scan.device_name if scan.device_name is not None else "Unknown",
+        "ip_address": scan.ip_address,
         "status": scan.status,
         "response_time_ms": scan.response_time_ms,
         "message": scan.log_message,
     }
 
 
-def _discovery_to_log_entry(host: models.DiscoveredHost) -> dict:
+def _discovery_to_log_entry(host) -> dict:
     return {
         "id": f"discovery-{host.id}",
         "event_type": "discovery",
@@ -260,38 +773,191 @@ def _discovery_to_log_entry(host: models.DiscoveredHost) -> dict:
     }
 
 
-def get_logs(
-    db: Session,
+def _disappearance_to_log_entry(event) -> dict:
+    last_seen = f", last seen {event.last_seen:%Y-%m-%d %H:%M:%S}" if event.last_seen else ""
+    return {
+        "id": f"disappearance-{event.id}",
+        "event_type": "discovery",
+        "timestamp": event.occurred_at,
+        "device_name": "unknown",
+        "ip_address": event.ip_address,
+        "status": False,
+        "response_time_ms": None,
+        "message": f"Host {event.ip_address} stopped responding{last_seen}",
+    }
+
+
+LOG_ENTRY_BUILDERS = {
+    SCAN_RANK: _scan_to_log_entry,
+    DISCOVERY_RANK: _discovery_to_log_entry,
+    DISAPPEARANCE_RANK: _disappearance_to_log_entry,
+}
+
+
+async def get_logs(
+    db: AsyncSession,
     skip: int = 0,
     limit: int = 50,
     event_type: str | None = None,
+    cursor: tuple | None = None,
 ):
     """
-    Return a unified, time-ordered stream of monitoring scans and host discovery events.
-    Both sources are over-fetched to (skip + limit) before merging so the resulting page
-    is correct after sorting by timestamp.
+    Return a unified, time-ordered stream of monitoring scans and host discovery events
+    (new hosts and disappeared hosts), and the cursor of the next page.
+
+    Every source is read newest first with a (timestamp, id) keyset seek past the cursor
+    and at most `limit` rows. The sorted streams are combined with a lazy heap merge that
+    stops after `limit` entries. Without a cursor, `skip` rows are skipped the old way
+    (every source over-fetched to skip + limit).
     """
-    fetch_size = skip + limit
-    entries: list[dict] = []
+    fetch_size = limit if cursor is not None else skip + limit
+    streams = []
 
+    # Core rows only - the log entries are built straight from the selected columns
     if event_type in (None, "scan"):
-        scans = (
-            db.query(models.ScanResult)
-            .options(joinedload(models.ScanResult.device))
-            .order_by(models.ScanResult.timestamp.desc())
-            .limit(fetch_size)
-            .all()
-        )
-        entries.extend(_scan_to_log_entry(scan) for scan in scans)
+        scans = models.ScanResult.__table__
+        stmt = _scan_list_select()
+        if cursor is not None:
+            stmt = stmt.where(seek_before(scans.c.timestamp, scans.c.id, SCAN_RANK, cursor))
+        result = await db.execute(stmt.order_by(scans.c.timestamp.desc(), scans.c.id.desc()).limit(fetch_size))
+        scan_rows = result.all()
+        streams.append(((scan.timestamp, SCAN_RANK, scan.id), scan) for scan in scan_rows)
 
     if event_type in (None, "discovery"):
-        hosts = (
-            db.query(models.DiscoveredHost)
-            .order_by(models.DiscoveredHost.discovered_at.desc())
-            .limit(fetch_size)
-            .all()
+        hosts_table = models.DiscoveredHost.__table__
+        stmt = select(hosts_table.c.id, hosts_table.c.ip_address, hosts_table.c.discovered_at)
+        if cursor is not None:
+            stmt = stmt.where(seek_before(hosts_table.c.discovered_at, hosts_table.c.id, DISCOVERY_RANK, cursor))
+        result = await db.execute(
+            stmt.order_by(hosts_table.c.discovered_at.desc(), hosts_table.c.id.desc()).limit(fetch_size)
         )
-        entries.extend(_discovery_to_log_entry(host) for host in hosts)
+        hosts = result.all()
+        streams.append(((host.discovered_at, DISCOVERY_RANK, host.id), host) for host in hosts)
+
+        events_table = models.DiscoveryEvent.__table__
+        stmt = select(events_table.c.id, events_table.c.ip_address, events_table.c.occurred_at, events_table.c.last_seen)
+        if cursor is not None:
+            stmt = stmt.where(seek_before(events_table.c.occurred_at, events_table.c.id, DISAPPEARANCE_RANK, cursor))
+        result = await db.execute(
+            stmt.order_by(events_table.c.occurred_at.desc(), events_table.c.id.desc()).limit(fetch_size)
+        )
+        disappearances = result.all()
+        streams.append(((event.occurred_at, DISAPPEARANCE_RANK, event.id), event) for event in disappearances)
+
+    merged = heapq.merge(*streams, key=lambda item: item[0], reverse=True)
+    page = list(islice(merged, 0 if cursor is not None else skip, fetch_size))
+
+    entries = [LOG_ENTRY_BUILDERS[rank](row) for (_, rank, _), row in page]
+    next_cursor = encode_cursor(*page[-1][0]) if len(page) == limit else None
+    return entries, next_cursor
 
-    entries.sort(key=lambda entry: entry["timestamp"], reverse=True)
-    return entries[skip : skip + limit]
+
+async def get_discovery_networks(db: AsyncSession):
+    result = await db.execute(select(models.DiscoveryNetwork).order_by(models.DiscoveryNetwork.id.asc()))
+    return result.scalars().all()
+
+
+async def insert_discovered_hosts(db: AsyncSession, network_id: int, ip_addresses: list[str], chunk_size: int = 1000):
+    """
+    Insert pending hosts in bulk. Addresses that already have a pending entry are
+    skipped by the partial unique index (ON CONFLICT DO NOTHING).
+    Returns (id, ip_address, discovered_at) of the rows actually inserted.
+    """
+    table = models.DiscoveredHost.__table__
+    discovered_at = datetime.now().astimezone()
+    inserted = []
+    for start in range(0, len(ip_addresses), chunk_size):
+        stmt = (
+            pg_insert(table)
+            .values([
+                {
+                    "network_id": network_id,
+                    "ip_address": ip_address,
+                    "status": "pending",
+                    "discovered_at": discovered_at,
+                    "last_seen": discovered_at,
+                }
+                for ip_address in ip_addresses[start : start + chunk_size]
+            ])
+            .on_conflict_do_nothing(index_elements=[table.c.ip_address], index_where=table.c.status == "pending")
+            .returning(table.c.id, table.c.ip_address, table.c.discovered_at)
+        )
+        result = await db.execute(stmt)
+        inserted.extend(result.all())
+    return inserted
+
+
+async def update_discovered_hosts_last_seen(
+    db: AsyncSession, network_id: int, ip_addresses: list[str], seen_at: datetime, chunk_size: int = 1000
+):
+    """
+    Move last_seen of the pending hosts at the given addresses. Accepted and ignored
+    entries keep the last_seen of their triage. Returns the number of updated rows.
+    """
+    table = models.DiscoveredHost.__table__
+    updated = 0
+    for start in range(0, len(ip_addresses), chunk_size):
+        result = await db.execute(
+            update(table)
+            .where(
+                table.c.network_id == network_id,
+                table.c.status == "pending",
+                table.c.ip_address.in_(ip_addresses[start : start + chunk_size]),
+            )
+            .values(last_seen=seen_at)
+        )
+        updated += result.rowcount
+    return updated
+
+
+async def record_host_disappearances(
+    db: AsyncSession, network_id: int, ip_addresses: list[str], last_seen: datetime | None, chunk_size: int = 1000
+):
+    """
+    Store a "disappeared" discovery event per address and move last_seen of the
+    matching discovered hosts to the last sweep that found them alive.
+    Returns (id, ip_address, occurred_at) of the created events and the number of updated hosts.
+    """
+    table = models.DiscoveryEvent.__table__
+    occurred_at = datetime.now().astimezone()
+    created = []
+    for start in range(0, len(ip_addresses), chunk_size):
+        result = await db.execute(
+            insert(table)
+            .values([
+                {
+                    "network_id": network_id,
+                    "ip_address": ip_address,
+                    "event_type": "disappeared",
+                    "occurred_at": occurred_at,
+                    "last_seen": last_seen,
+                }
+                for ip_address in ip_addresses[start : start + chunk_size]
+            ])
+            .returning(table.c.id, table.c.ip_address, table.c.occurred_at)
+        )
+        created.extend(result.all())
+    updated = 0
+    if last_seen is not None:
+        updated = await update_discovered_hosts_last_seen(db, network_id, ip_addresses, last_seen, chunk_size)
+    return created, updated
+
+
+async def get_live_discovered_hosts(db: AsyncSession) -> list[tuple[int, str]]:
+    """
+    (network_id, ip_address) of the pending hosts alive at their last sweep: no
+    disappearance was recorded since the sweep that last found them.
+    """
+    hosts = models.DiscoveredHost.__table__
+    result = await db.execute(
+        select(hosts.c.network_id, hosts.c.ip_address).where(
+            hosts.c.status == "pending", hosts.c.last_seen.is_not(None), ~_disappeared_since_last_seen(hosts)
+        )
+    )
+    return [tuple(row) for row in result.all()]
+
+
+async def mark_network_discovery_time(db: AsyncSession, network_id: int, swept_at: datetime | None = None):
+    db_network = await db.get(models.DiscoveryNetwork, network_id)
+    if db_network:
+        db_network.last_discovery = swept_at or datetime.now().astimezone()
@@ -1,5 +1,6 @@
 import os
 from sqlalchemy import create_engine
+from sqlalchemy.ext.asyncio import create_async_engine, async_sessionmaker
 from sqlalchemy.orm import sessionmaker, declarative_base
 from dotenv import load_dotenv
 
@@ -14,12 +15,29 @@ DB_HOST = os.getenv("DB_HOST")
 # connection string
 SQLALCHEMY_DATABASE_URL = f"postgresql://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
 
+# same database through the asyncpg driver, used by the workers and the hot read endpoints
+ASYNC_SQLALCHEMY_DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@{DB_HOST}:{POSTGRES_PORT}/{POSTGRES_DB}"
+
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+
 # engine - manages all connections to database
 engine = create_engine(SQLALCHEMY_DATABASE_URL)
 
+# async_engine - asyncpg connection pool, queries do not block the event loop
+async_engine = create_async_engine(
+    ASYNC_SQLALCHEMY_DATABASE_URL,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_pre_ping=True,
+)
+
 # SessionLocal is a "session factory". Each http request instantiate its own database session
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+# AsyncSessionLocal - the same for AsyncSession, objects stay readable after commit
+AsyncSessionLocal = async_sessionmaker(async_engine, autoflush=False, expire_on_commit=False)
+
 # Base is a parent class that all database models(tables) will inherit from
 Base = declarative_base()
 
@@ -31,3 +49,9 @@ def get_db():
         yield db
     finally:
         db.close()
+
+
+# async variant of get_db for endpoints running on the event loop
+async def get_async_db():
+    async with AsyncSessionLocal() as db:
+        yield db
@@ -1,12 +1,17 @@
+import os
 import asyncio
 import logging
-import subprocess
 import ipaddress
 import platform
+import time
+from datetime import datetime
 
-from database import SessionLocal
-import models
+from database import AsyncSessionLocal, async_engine
 import crud
+import metrics
+import events
+from hostmap import HostRange, LivenessBitmap
+from probes import get_backend
 
 logging.basicConfig(
     level=logging.INFO,
@@ -14,143 +19,350 @@ logging.basicConfig(
     handlers=[logging.StreamHandler()],
 )
 logger = logging.getLogger(__name__)
+# Confirmation pings in flight across all networks
 PING_CONCURRENCY = 64
+# nmap processes running at the same time
+NMAP_CONCURRENCY = int(os.getenv("NMAP_CONCURRENCY", "4"))
+# Networks larger than this prefix are swept as several nmap runs of this size
+DISCOVERY_CHUNK_PREFIX = int(os.getenv("DISCOVERY_CHUNK_PREFIX", "20"))
+DISCOVERY_INTERVAL_SECONDS = int(os.getenv("DISCOVERY_INTERVAL_SECONDS", "90"))
+# Prometheus metrics port of the discovery worker (0 = disabled)
+METRICS_PORT = int(os.getenv("DISCOVERY_METRICS_PORT", "9102"))
 
 
-def run_nmap_scan(cidr: str) -> list[str]:
+def parse_grepable_line(line: str) -> str | None:
     """
-    Run nmap ping scan and return discovered IPv4 addresses.
+    Return the address of a host reported as up in a line of nmap grepable output.
     """
-    try:
-        network = ipaddress.ip_network(cidr, strict=False)
-    except ValueError:
-        logger.error(f"Invalid CIDR configured for discovery: {cidr}")
-        return []
+    # Grepable format example:
+    # Host: 192.168.1.10 ()  Status: Up
+    if not line.startswith("Host: ") or "Status: Up" not in line:
+        return None
+    parts = line.split()
+    if len(parts) < 2:
+        return None
+    return parts[1]
 
-    valid_host_ips = {str(host) for host in network.hosts()}
 
-    try:
-        result = subprocess.run(
-            ["nmap", "-sn", "-n", "-oG", "-", cidr],
-            capture_output=True,
-            text=True,
-            check=False,
+class NetworkSweep:
+    """
+    Result of one network sweep: hosts reported by nmap and hosts confirmed by ping,
+    as bitmaps over the network's host range. The last successful sweep of every
+    network is kept in memory and the next one is diffed against it; after a restart
+    it is rebuilt from the stored pending hosts (see load_states).
+    """
+
+    __slots__ = ("host_range", "candidates", "reachable", "swept_at")
+
+    def __init__(self, host_range: HostRange):
+        self.host_range = host_range
+        self.candidates = LivenessBitmap(len(host_range))
+        self.reachable = LivenessBitmap(len(host_range))
+        self.swept_at: datetime | None = None
+
+    def addresses(self, bitmap: LivenessBitmap) -> list[str]:
+        return [self.host_range.address(index) for index in bitmap]
+
+    def diff(self, previous: "NetworkSweep | None") -> tuple[list[str], list[str]]:
+        """
+        Return (appeared, disappeared) addresses compared to the previous sweep.
+        Without a comparable previous sweep every reachable host counts as appeared.
+        """
+        if previous is None or previous.host_range.network != self.host_range.network:
+            return self.addresses(self.reachable), []
+        return (
+            self.addresses(self.reachable.difference(previous.reachable)),
+            self.addresses(previous.reachable.difference(self.reachable)),
         )
-    except FileNotFoundError:
-        logger.error("nmap executable not found. Install nmap and ensure it is in PATH.")
-        return []
-    except Exception as exc:
-        logger.error(f"nmap scan failed for {cidr}: {exc}")
-        return []
-
-    if result.returncode != 0:
-        logger.warning(f"nmap returned code {result.returncode} for {cidr}: {result.stderr.strip()}")
-        return []
-
-    found_ips = set()
-    for line in result.stdout.splitlines():
-        # Grepable format example:
-        # Host: 192.168.1.10 ()  Status: Up
-        if not line.startswith("Host: "):
-            continue
-        if "Status: Up" not in line:
-            continue
 
-        parts = line.split()
-        if len(parts) < 2:
-            continue
-        candidate_ip = parts[1]
 
+async def sweep_chunk(
+    chunk: ipaddress.IPv4Network,
+    sweep: NetworkSweep,
+    pending: set[asyncio.Task],
+    nmap_semaphore: asyncio.Semaphore,
+    ping_semaphore: asyncio.Semaphore,
+) -> bool:
+    """
+    Run an nmap ping scan of one chunk of a network. nmap output is parsed while
+    the scan runs and a confirmation ping is started for every host reported as up
+    (added to `pending`, it marks the host in sweep.reachable when it succeeds).
+    A ping starts only once it holds a ping_semaphore slot, so a dense network never
+    has more than PING_CONCURRENCY tasks and the nmap output waits in the pipe meanwhile.
+    Returns False when nmap could not scan the chunk.
+    """
+    async def add_candidate(candidate_ip: str | None):
         # Safety filter: only valid IPv4 hosts from network range
-        if candidate_ip in valid_host_ips:
-            found_ips.add(candidate_ip)
+        index = sweep.host_range.index(candidate_ip) if candidate_ip else None
+        if index is None or index in sweep.candidates:
+            return
+        sweep.candidates.add(index)
+
+        await ping_semaphore.acquire()
+        task = asyncio.create_task(is_host_reachable(candidate_ip))
+        task.add_done_callback(lambda _: ping_semaphore.release())
+        task.add_done_callback(
+            lambda done: sweep.reachable.add(index) if not done.cancelled() and done.result() else None
+        )
+        task.add_done_callback(pending.discard)
+        pending.add(task)
+
+    backend = get_backend()
+    async with nmap_semaphore:
+        if backend is not None:
+            async for candidate_ip in backend.sweep(chunk):
+                await add_candidate(candidate_ip)
+            return True
+
+        try:
+            proc = await asyncio.create_subprocess_exec(
+                "nmap", "-sn", "-n", "-oG", "-", str(chunk),
+                stdout=asyncio.subprocess.PIPE,
+                stderr=asyncio.subprocess.PIPE,
+            )
+        except FileNotFoundError:
+            logger.error("nmap executable not found. Install nmap and ensure it is in PATH.")
+            return False
+        except Exception as exc:
+            logger.error(f"nmap scan failed for {chunk}: {exc}")
+            return False
+
+        stderr_task = asyncio.create_task(proc.stderr.read())
+        try:
+            async for raw_line in proc.stdout:
+                await add_candidate(parse_grepable_line(raw_line.decode(errors="replace")))
+            return_code = await proc.wait()
+            stderr = await stderr_task
+        except BaseException:
+            if proc.returncode is None:
+                proc.kill()
+            stderr_task.cancel()
+            raise
+
+    if return_code != 0:
+        logger.warning(f"nmap returned code {return_code} for {chunk}: {stderr.decode(errors='replace').strip()}")
+        return False
+    return True
+
 
-    return sorted(found_ips)
+async def scan_network(
+    cidr: str,
+    nmap_semaphore: asyncio.Semaphore,
+    ping_semaphore: asyncio.Semaphore,
+) -> NetworkSweep | None:
+    """
+    Sweep one network in chunks of at most /DISCOVERY_CHUNK_PREFIX and confirm every
+    host nmap reports as up. Confirmation pings of a chunk overlap the next sweeps.
+    Returns None when the network could not be scanned.
+    """
+    try:
+        network = ipaddress.ip_network(cidr, strict=False)
+    except ValueError:
+        logger.error(f"Invalid CIDR configured for discovery: {cidr}")
+        return None
+    if network.version != 4:
+        logger.error(f"Only IPv4 networks can be discovered: {cidr}")
+        return None
+
+    sweep = NetworkSweep(HostRange(network))
+    pending: set[asyncio.Task] = set()
+    try:
+        for chunk in sweep.host_range.chunks(DISCOVERY_CHUNK_PREFIX):
+            if not await sweep_chunk(chunk, sweep, pending, nmap_semaphore, ping_semaphore):
+                for task in pending:
+                    task.cancel()
+                return None
+        if pending:
+            await asyncio.gather(*pending)
+    except BaseException:
+        for task in pending:
+            task.cancel()
+        raise
+    sweep.swept_at = datetime.now().astimezone()
+    return sweep
 
 
-async def is_host_reachable(ip_address: str, semaphore: asyncio.Semaphore) -> bool:
+async def is_host_reachable(ip_address: str) -> bool:
     """
     Confirm host reachability with a direct ICMP ping.
     This extra check protects against nmap false positives in containerized environments.
+    Concurrency is limited by the caller (sweep_chunk).
     """
     is_windows = platform.system().lower() == "windows"
     count_param = "-n" if is_windows else "-c"
     timeout_param = "-w" if is_windows else "-W"
     timeout_value = "1000" if is_windows else "1"
 
-    async with semaphore:
-        try:
-            proc = await asyncio.create_subprocess_exec(
-                "ping",
-                count_param,
-                "1",
-                timeout_param,
-                timeout_value,
-                ip_address,
-                stdout=asyncio.subprocess.DEVNULL,
-                stderr=asyncio.subprocess.DEVNULL,
-            )
-            return_code = await asyncio.wait_for(proc.wait(), timeout=3)
-            return return_code == 0
-        except Exception:
-            return False
+    backend = get_backend()
+    if backend is not None:
+        is_online, _ = await backend.ping(ip_address)
+        return is_online
+    try:
+        proc = await asyncio.create_subprocess_exec(
+            "ping",
+            count_param,
+            "1",
+            timeout_param,
+            timeout_value,
+            ip_address,
+            stdout=asyncio.subprocess.DEVNULL,
+            stderr=asyncio.subprocess.DEVNULL,
+        )
+        return_code = await asyncio.wait_for(proc.wait(), timeout=3)
+        return return_code == 0
+    except Exception:
+        return False
 
 
-async def get_reachable_hosts(discovered_ips: list[str]) -> list[str]:
-    if not discovered_ips:
-        return []
+async def load_states() -> dict[int, NetworkSweep]:
+    """
+    Rebuild the last sweep of every discovered network from the database, so the first
+    cycle after a restart reports hosts that vanished meanwhile instead of treating every
+    reachable host as new. Only pending hosts are stored with their liveness, accepted and
+    ignored addresses count as appeared again on that first cycle (a no-op write).
+    """
+    async with AsyncSessionLocal() as db:
+        networks = await crud.get_discovery_networks(db)
+        live_hosts = await crud.get_live_discovered_hosts(db)
 
-    semaphore = asyncio.Semaphore(PING_CONCURRENCY)
-    checks = [is_host_reachable(ip, semaphore) for ip in discovered_ips]
-    results = await asyncio.gather(*checks, return_exceptions=False)
-    return [ip for ip, is_up in zip(discovered_ips, results) if is_up]
+    states: dict[int, NetworkSweep] = {}
+    for network in networks:
+        if network.last_discovery is None:
+            continue
+        try:
+            ip_network = ipaddress.ip_network(network.cidr, strict=False)
+        except ValueError:
+            continue
+        if ip_network.version == 4:
+            sweep = NetworkSweep(HostRange(ip_network))
+            sweep.swept_at = network.last_discovery
+            states[network.id] = sweep
+    for network_id, ip_address in live_hosts:
+        sweep = states.get(network_id)
+        index = sweep.host_range.index(ip_address) if sweep is not None else None
+        if index is not None:
+            sweep.candidates.add(index)
+            sweep.reachable.add(index)
+    logger.info(f"Restored the last sweep of {len(states)} networks ({len(live_hosts)} live pending hosts).")
+    return states
 
 
-async def run_discovery_cycle():
+async def run_discovery_cycle(states: dict[int, NetworkSweep]) -> int:
+    """
+    Sweep every network and write only what changed since the previous sweep:
+    new pending hosts, last_seen of hosts that appeared or disappeared, and a
+    disappearance event per vanished host. `states` (network id -> last sweep)
+    is updated once the cycle has been committed.
+    Returns the number of inserted and updated host/event rows that were committed.
+    """
     logger.info("--- STARTING HOST DISCOVERY CYCLE ---")
-    with SessionLocal() as db:
-        networks = crud.get_discovery_networks(db)
+    async with AsyncSessionLocal() as db:
+        networks = await crud.get_discovery_networks(db)
+        for network_id in states.keys() - {network.id for network in networks}:
+            del states[network_id]
         if not networks:
             logger.info("No discovery networks configured.")
-            return
+            return 0
+
+        existing_device_ips = await crud.get_device_ips(db)
+
+        nmap_semaphore = asyncio.Semaphore(NMAP_CONCURRENCY)
+        ping_semaphore = asyncio.Semaphore(PING_CONCURRENCY)
 
-        existing_device_ips = {
-            row[0]
-            for row in db.query(models.Device.ip_address).all()
-        }
+        async def scan(network):
+            started = time.perf_counter()
+            sweep = await scan_network(network.cidr, nmap_semaphore, ping_semaphore)
+            return network, sweep, time.perf_counter() - started
 
+        scans = []
+        swept: dict[int, NetworkSweep] = {}
+        rows_written = 0
         try:
-            for network in networks:
-                discovered_ips = run_nmap_scan(network.cidr)
-                reachable_ips = await get_reachable_hosts(discovered_ips)
-                new_hosts = 0
-
-                for ip in reachable_ips:
-                    if ip in existing_device_ips:
-                        continue
-                    host = crud.create_discovered_host_if_missing(db, network.id, ip)
-                    if host and host.status == "pending":
-                        new_hosts += 1
-
-                crud.mark_network_discovery_time(db, network.id)
+            # Networks are scanned concurrently, results are saved one network at a time as they finish
+            scans = [asyncio.create_task(scan(network)) for network in networks]
+            for finished in asyncio.as_completed(scans):
+                network, sweep, duration = await finished
+                metrics.DISCOVERY_NETWORK_DURATION.labels(network.cidr).observe(duration)
+                if sweep is None:
+                    # failed sweep - the previous state and last_discovery stay the reference
+                    continue
+                await crud.mark_network_discovery_time(db, network.id, sweep.swept_at)
+
+                previous = states.get(network.id)
+                appeared, disappeared = sweep.diff(previous)
+                appeared = [ip for ip in appeared if ip not in existing_device_ips]
+                disappeared = [ip for ip in disappeared if ip not in existing_device_ips]
+
+                new_hosts = await crud.insert_discovered_hosts(db, network.id, appeared)
+                inserted_ips = {host.ip_address for host in new_hosts}
+                updated = await crud.update_discovered_hosts_last_seen(
+                    db, network.id, [ip for ip in appeared if ip not in inserted_ips], sweep.swept_at
+                )
+                vanished, updated_vanished = await crud.record_host_disappearances(
+                    db, network.id, disappeared, previous.swept_at if previous else None
+                )
+                rows_written += len(new_hosts) + updated + len(vanished) + updated_vanished
+
+                # NOTIFY is delivered with the commit
+                await events.notify(db, [
+                    {
+                        "type": "discovered_host",
+                        "id": host.id,
+                        "network_id": network.id,
+                        "ip_address": host.ip_address,
+                        "discovered_at": host.discovered_at,
+                    }
+                    for host in new_hosts
+                ] + [
+                    {
+                        "type": "host_disappeared",
+                        "id": event.id,
+                        "network_id": network.id,
+                        "ip_address": event.ip_address,
+                        "occurred_at": event.occurred_at,
+                    }
+                    for event in vanished
+                ])
+
+                swept[network.id] = sweep
+                metrics.DISCOVERED_HOSTS.labels(network.cidr).inc(len(new_hosts))
                 logger.info(
-                    f"Network {network.name} ({network.cidr}) scanned. "
-                    f"Candidates: {len(discovered_ips)}, reachable: {len(reachable_ips)}, new pending hosts: {new_hosts}"
+                    f"Network {network.name} ({network.cidr}) scanned in {duration:.1f}s. "
+                    f"Candidates: {len(sweep.candidates)}, reachable: {len(sweep.reachable)}, "
+                    f"new pending hosts: {len(new_hosts)}, appeared: {len(appeared)}, disappeared: {len(disappeared)}"
                 )
 
-            db.commit()
+            await db.commit()
+            states.update(swept)
             logger.info("--- HOST DISCOVERY CYCLE COMPLETED ---")
+            return rows_written
         except Exception as exc:
-            db.rollback()
+            for task in scans:
+                task.cancel()
+            await db.rollback()
             logger.error(f"Discovery cycle failed: {exc}")
+            return 0
 
 
 async def main():
-    logger.info("Discovery worker started. Running discovery every 90 seconds.")
+    logger.info(f"Discovery worker started. Running discovery every {DISCOVERY_INTERVAL_SECONDS} seconds.")
     logger.info("Press CTRL+C to stop the worker.")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    metrics.start_metrics_server(METRICS_PORT)
+    try:
+        states = await load_states()
+    except Exception as exc:
+        logger.error(f"Could not restore the previous sweeps, starting without them: {exc}")
+        states = {}
     while True:
-        await run_discovery_cycle()
-        await asyncio.sleep(90)
+        started = time.perf_counter()
+        await run_discovery_cycle(states)
+        duration = time.perf_counter() - started
+        metrics.DISCOVERY_CYCLE_DURATION.set(duration)
+        if duration > DISCOVERY_INTERVAL_SECONDS:
+            metrics.DISCOVERY_OVERRUNS.inc()
+            logger.warning(f"Discovery cycle took {duration:.0f}s, longer than the {DISCOVERY_INTERVAL_SECONDS}s interval.")
+        await asyncio.sleep(DISCOVERY_INTERVAL_SECONDS)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,136 @@
+import os
+import json
+import asyncio
+import logging
+from datetime import datetime
+import asyncpg
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncSession
+from database import SQLALCHEMY_DATABASE_URL
+
+logger = logging.getLogger(__name__)
+
+# Postgres channel shared by the workers (NOTIFY) and the API (LISTEN)
+EVENTS_CHANNEL = "network_events"
+# Events buffered per subscriber, a client that falls further behind gets a resync event
+EVENT_QUEUE_SIZE = int(os.getenv("EVENT_QUEUE_SIZE", "256"))
+LISTEN_RECONNECT_SECONDS = 5
+
+RESYNC_EVENT = {"type": "resync"}
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
+
+
+async def notify(db: AsyncSession, events: list[dict]):
+    """
+    Queue NOTIFY events in the current transaction, they are delivered on commit
+    (and dropped on rollback). All events are sent with a single statement.
+    """
+    if not events:
+        return
+    await db.execute(
+        text("SELECT pg_notify(:channel, payload) FROM unnest(CAST(:payloads AS text[])) AS payload"),
+        {
+            "channel": EVENTS_CHANNEL,
+            "payloads": [json.dumps(event, default=_json_default) for event in events],
+        },
+    )
+
+
+class Subscription:
+    """
+    Bounded event queue of one WebSocket/SSE client.
+    """
+
+    def __init__(self, maxsize: int):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=maxsize)
+        self.overflows = 0
+
+    def put(self, event: dict):
+        try:
+            self.queue.put_nowait(event)
+        except asyncio.QueueFull:
+            # Slow client - drop its backlog, it reloads the current state over REST instead
+            self.overflows += 1
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESYNC_EVENT)
+
+    async def get(self) -> dict:
+        return await self.queue.get()
+
+
+class EventBroker:
+    """
+    In-process pub/sub. One Postgres LISTEN connection feeds every subscriber,
+    a publish never waits for a client.
+    """
+
+    def __init__(self, queue_size: int = EVENT_QUEUE_SIZE):
+        self.queue_size = queue_size
+        self.subscribers: set[Subscription] = set()
+        self._listener: asyncio.Task | None = None
+
+    def subscribe(self) -> Subscription:
+        subscription = Subscription(self.queue_size)
+        self.subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription):
+        self.subscribers.discard(subscription)
+
+    def publish(self, event: dict):
+        for subscription in self.subscribers:
+            subscription.put(event)
+
+    def _on_notification(self, connection, pid, channel, payload):
+        try:
+            event = json.loads(payload)
+        except ValueError:
+            logger.warning(f"Ignoring malformed event payload: {payload[:200]}")
+            return
+        self.publish(event)
+
+    async def _listen(self):
+        connected_before = False
+        while True:
+            connection = None
+            try:
+                connection = await asyncpg.connect(SQLALCHEMY_DATABASE_URL)
+                await connection.add_listener(EVENTS_CHANNEL, self._on_notification)
+                logger.info(f"Listening for events on channel {EVENTS_CHANNEL}.")
+                if connected_before:
+                    # Notifications sent while disconnected are lost
+                    self.publish(RESYNC_EVENT)
+                connected_before = True
+                while not connection.is_closed():
+                    await asyncio.sleep(LISTEN_RECONNECT_SECONDS)
+                logger.warning("Event listener connection closed.")
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logger.error(f"Event listener failed: {e}")
+            finally:
+                if connection is not None and not connection.is_closed():
+                    await connection.close()
+            await asyncio.sleep(LISTEN_RECONNECT_SECONDS)
+
+    def start(self):
+        if self._listener is None:
+            self._listener = asyncio.create_task(self._listen())
+
+    async def stop(self):
+        if self._listener is not None:
+            self._listener.cancel()
+            try:
+                await self._listener
+            except asyncio.CancelledError:
+                pass
+            self._listener = None
+
+
+event_broker = EventBroker()
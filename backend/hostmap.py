@@ -0,0 +1,100 @@
+import ipaddress
+from typing import Iterator
+
+
+class HostRange:
+    """
+    Usable host addresses of an IPv4 network as an integer range.
+    Membership checks and index lookups cost O(1) and no per-host objects,
+    so a /8 takes as little memory as a /24.
+    """
+
+    __slots__ = ("network", "first", "last")
+
+    def __init__(self, network: ipaddress.IPv4Network):
+        self.network = network
+        first = int(network.network_address)
+        last = int(network.broadcast_address)
+        # Same hosts as network.hosts(): /31 and /32 have no network/broadcast address
+        if network.prefixlen < 31:
+            first += 1
+            last -= 1
+        self.first = first
+        self.last = last
+
+    def __len__(self):
+        return max(self.last - self.first + 1, 0)
+
+    def index(self, ip_address: str) -> int | None:
+        """
+        Position of the address inside the range, None for anything outside it.
+        """
+        try:
+            value = int(ipaddress.IPv4Address(ip_address))
+        except ValueError:
+            return None
+        if self.first <= value <= self.last:
+            return value - self.first
+        return None
+
+    def address(self, index: int) -> str:
+        return str(ipaddress.IPv4Address(self.first + index))
+
+    def chunks(self, chunk_prefix: int) -> Iterator[ipaddress.IPv4Network]:
+        """
+        Split the network into sub-networks of at most /chunk_prefix, lazily.
+        """
+        if self.network.prefixlen >= chunk_prefix:
+            yield self.network
+        else:
+            yield from self.network.subnets(new_prefix=chunk_prefix)
+
+
+def parse_address_range(value: str) -> tuple[int, int]:
+    """
+    Parse "10.0.4.0/22" or "10.0.4.10-10.0.4.99" into an inclusive integer range.
+    Raises ValueError for anything else.
+    """
+    if "-" in value:
+        first, last = (int(ipaddress.IPv4Address(part.strip())) for part in value.split("-", 1))
+        if first > last:
+            raise ValueError(f"Empty address range: {value}")
+        return first, last
+    network = ipaddress.IPv4Network(value.strip(), strict=False)
+    return int(network.network_address), int(network.broadcast_address)
+
+
+class LivenessBitmap:
+    """
+    One bit per host of a HostRange.
+    """
+
+    __slots__ = ("size", "bits")
+
+    def __init__(self, size: int, bits: bytearray | None = None):
+        self.size = size
+        self.bits = bits if bits is not None else bytearray((size + 7) // 8)
+
+    def add(self, index: int):
+        self.bits[index >> 3] |= 1 << (index & 7)
+
+    def __contains__(self, index: int) -> bool:
+        return bool(self.bits[index >> 3] & (1 << (index & 7)))
+
+    def __len__(self):
+        return int.from_bytes(self.bits, "little").bit_count()
+
+    def __iter__(self) -> Iterator[int]:
+        for byte_index, byte in enumerate(self.bits):
+            while byte:
+                low_bit = byte & -byte
+                yield (byte_index << 3) + low_bit.bit_length() - 1
+                byte ^= low_bit
+
+    def difference(self, other: "LivenessBitmap") -> "LivenessBitmap":
+        """
+        Hosts set in this bitmap and not in the other one.
+        """
+        mask = (1 << (len(self.bits) * 8)) - 1
+        value = int.from_bytes(self.bits, "little") & ~int.from_bytes(other.bits, "little") & mask
+        return LivenessBitmap(self.size, bytearray(value.to_bytes(len(self.bits), "little")))
@@ -0,0 +1,170 @@
+import asyncio
+import logging
+import os
+import socket
+import struct
+import time
+
+logger = logging.getLogger(__name__)
+
+ICMP_ECHO_REPLY = 0
+ICMP_ECHO_REQUEST = 8
+ICMP_PAYLOAD = b"network-admin-panel".ljust(56, b"\x00")
+
+
+def _checksum(data: bytes) -> int:
+    """
+    Internet checksum (RFC 1071) of an ICMP message.
+    """
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+
+def build_echo_request(identifier: int, sequence: int, payload: bytes = ICMP_PAYLOAD) -> bytes:
+    header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, identifier, sequence)
+    checksum = _checksum(header + payload)
+    return struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, checksum, identifier, sequence) + payload
+
+
+class IcmpEngine:
+    """
+    In-process ICMP echo engine driven by the asyncio event loop.
+
+    A single socket is shared by every probe. Requests for a whole batch are sent
+    back to back and replies are matched to them by (source ip, sequence number),
+    so probing thousands of hosts costs no processes and one file descriptor.
+
+    An unprivileged datagram ICMP socket is preferred (allowed by
+    net.ipv4.ping_group_range, which Docker enables by default). A raw socket
+    (root / CAP_NET_RAW) is used when datagram sockets are not permitted.
+    """
+
+    def __init__(self, timeout: float = 1.0, send_rate: int = 0):
+        self.timeout = timeout
+        # Maximum echo requests per second, 0 means send as fast as the socket accepts them
+        self.send_rate = send_rate
+        self.identifier = os.getpid() & 0xFFFF
+        self.is_raw = False
+        self._sock: socket.socket | None = None
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self._sequence = 0
+        # (ip, sequence) -> (future, perf_counter at send time)
+        self._pending: dict[tuple[str, int], tuple[asyncio.Future, float]] = {}
+
+    def open(self):
+        """
+        Open the ICMP socket and register it with the running event loop.
+        Raises OSError when neither a datagram nor a raw ICMP socket is permitted.
+        """
+        try:
+            sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP)
+        except OSError as dgram_error:
+            try:
+                sock = socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP)
+            except OSError:
+                raise dgram_error
+            self.is_raw = True
+
+        sock.setblocking(False)
+        self._sock = sock
+        self._loop = asyncio.get_running_loop()
+        self._loop.add_reader(sock.fileno(), self._on_readable)
+        logger.info(f"ICMP engine ready ({'raw' if self.is_raw else 'datagram'} socket).")
+
+    def close(self):
+        if self._sock is None:
+            return
+        self._loop.remove_reader(self._sock.fileno())
+        self._sock.close()
+        self._sock = None
+        for future, _ in self._pending.values():
+            if not future.done():
+                future.set_result(None)
+        self._pending.clear()
+
+    def _next_sequence(self) -> int:
+        self._sequence = (self._sequence + 1) & 0xFFFF
+        return self._sequence
+
+    def _on_readable(self):
+        while True:
+            try:
+                data, address = self._sock.recvfrom(65535)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError as exc:
+                logger.debug(f"ICMP receive error: {exc}")
+                return
+
+            received_at = time.perf_counter()
+            if self.is_raw:
+                # Raw sockets deliver the IPv4 header in front of the ICMP message
+                data = data[(data[0] & 0x0F) * 4:]
+            if len(data) < 8:
+                continue
+
+            icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", data[:8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            # Datagram sockets only see their own replies (the kernel rewrites the identifier)
+            if self.is_raw and identifier != self.identifier:
+                continue
+
+            entry = self._pending.pop((address[0], sequence), None)
+            if entry is None:
+                continue
+            future, sent_at = entry
+            if not future.done():
+                future.set_result((received_at - sent_at) * 1000)
+
+    def _expire(self, key: tuple[str, int]):
+        entry = self._pending.pop(key, None)
+        if entry and not entry[0].done():
+            entry[0].set_result(None)
+
+    async def probe_many(self, ip_addresses: list[str]) -> dict[str, float | None]:
+        """
+        Send one echo request to every address and wait for the replies.
+        Returns a mapping ip -> round-trip time in milliseconds (None when the host
+        did not answer within the timeout).
+        """
+        if self._sock is None:
+            raise RuntimeError("ICMP engine is not open")
+
+        futures: dict[str, asyncio.Future] = {}
+        started = time.perf_counter()
+
+        for index, ip in enumerate(dict.fromkeys(ip_addresses)):
+            if self.send_rate:
+                delay = started + index / self.send_rate - time.perf_counter()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+
+            sequence = self._next_sequence()
+            key = (ip, sequence)
+            future = self._loop.create_future()
+            futures[ip] = future
+
+            packet = build_echo_request(self.identifier, sequence)
+            self._pending[key] = (future, time.perf_counter())
+            try:
+                await self._loop.sock_sendto(self._sock, packet, (ip, 0))
+            except OSError as exc:
+                # e.g. no route to host - treat as unreachable without waiting for the timeout
+                logger.debug(f"ICMP send to {ip} failed: {exc}")
+                self._pending.pop(key, None)
+                future.set_result(None)
+                continue
+            if key in self._pending and not future.done():
+                # Restart the clock in case the send had to wait for socket buffer space
+                self._pending[key] = (future, time.perf_counter())
+
+            timer = self._loop.call_later(self.timeout, self._expire, key)
+            future.add_done_callback(lambda _, handle=timer: handle.cancel())
+
+        await asyncio.gather(*futures.values())
+        return {ip: future.result() for ip, future in futures.items()}
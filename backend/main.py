@@ -1,22 +1,52 @@
-from fastapi import FastAPI, Depends, HTTPException, status
+from fastapi import FastAPI, Depends, HTTPException, Query, Request, Response, WebSocket, status
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse, StreamingResponse
 from fastapi.security import OAuth2PasswordRequestForm
+from contextlib import asynccontextmanager
+from pydantic import ValidationError
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
-from typing import List
+from typing import List, Literal, Optional
+from datetime import datetime, timedelta, timezone
+import asyncio
 import ipaddress
-from database import engine
-from database import get_db
+import json
+import time
+from database import engine, async_engine
+from database import AsyncSessionLocal, get_db, get_async_db
+from migrations import upgrade_schema
 import models
 import schemas
 import crud
 import auth
+import rollups
+from pagination import InvalidCursor, decode_cursor
+from hostmap import parse_address_range
+from cache import cached_json_response, dictionary_cache
+from streaming import MEDIA_TYPES, encode_csv, encode_ndjson, format_from_content_type, iter_lines, iter_records
+import metrics
+from events import event_broker
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
 
 # Look at all classes in models.py and create tables if they don't exist
 models.Base.metadata.create_all(bind=engine)
+upgrade_schema(engine)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # one LISTEN connection per API process feeds every live client
+    event_broker.start()
+    yield
+    await event_broker.stop()
+
+
 app = FastAPI(
     title="Network Admin Panel API",
     description="API for LAN management and device monitoring.",
-    version="1.5.0"
+    version="1.5.0",
+    lifespan=lifespan,
 )
 
 # CORS Section ( MiddleWare )
@@ -30,16 +60,61 @@ app.add_middleware(
     allow_origins=origins,
     allow_credentials=True,
     allow_methods=["*"],
-    allow_headers=["*"]
+    allow_headers=["*"],
+    expose_headers=["X-Next-Cursor"],
 )
 
+metrics.instrument_engine(engine, "sync")
+metrics.instrument_engine(async_engine.sync_engine, "async")
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    started = time.perf_counter()
+    response = await call_next(request)
+    # Route template (/devices/{device_id}) keeps the label set small, unmatched paths share one label
+    route = request.scope.get("route")
+    metrics.HTTP_REQUEST_DURATION.labels(
+        request.method, route.path if route else "unmatched", response.status_code
+    ).observe(time.perf_counter() - started)
+    return response
+
+
+@app.get("/metrics", include_in_schema=False)
+def read_metrics():
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+
+def parse_cursor(cursor: str | None):
+    if cursor is None:
+        return None
+    try:
+        return decode_cursor(cursor)
+    except InvalidCursor:
+        raise HTTPException(status_code=400, detail="Invalid cursor.")
+
+
+# Pending host counts change outside the API (discovery worker), so this cache entry expires quickly
+DISCOVERY_NETWORKS_CACHE_TTL_SECONDS = 5
+
+# Shortest probe interval accepted for devices and device types
+MIN_PROBE_INTERVAL_SECONDS = 5
+
+
+def validate_probe_interval(probe_interval_seconds: int | None):
+    if probe_interval_seconds is not None and probe_interval_seconds < MIN_PROBE_INTERVAL_SECONDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Probe interval must be at least {MIN_PROBE_INTERVAL_SECONDS} seconds.",
+        )
+
 
 # Auth endpoint (login)
 @app.post("/token", tags=["Auth"])
 async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    # check if user exists and password match
-    user = crud.get_user_by_email(db, email=form_data.username)
-    if not user or not auth.verify_password(form_data.password, user.hashed_password):
+    # check if user exists and password match (bcrypt runs off the event loop)
+    user = await run_in_threadpool(crud.get_user_by_email, db, form_data.username)
+    if not user or not await auth.verify_password_async(form_data.password, user.hashed_password):
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Incorrect email or password",
@@ -53,29 +128,34 @@ async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(
 
 # Users endpoint (register)
 @app.post("/users/", response_model=schemas.User, status_code=status.HTTP_201_CREATED, tags=["Users"])
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def create_user(user: schemas.UserCreate, db: Session = Depends(get_db)):
     """Register a new user."""
-    db_user = crud.get_user_by_email(db, email=user.email)
+    db_user = await run_in_threadpool(crud.get_user_by_email, db, user.email)
     if db_user:
         raise HTTPException(status_code=400, detail="Email already registered")
-    return crud.create_user(db, user)
+    # bcrypt runs on its own pool, not on the request threadpool
+    hashed_password = await auth.get_password_hash_async(user.password)
+    return await run_in_threadpool(crud.create_user, db, user, hashed_password)
 
 
 # Device management Endpoints (Core CRUD)
 @app.get("/devices/", response_model=List[schemas.Device], tags=["Devices"])
-def read_devices(skip: int = 0, limit: int = 100, db: Session = Depends(get_db)):
+async def read_devices(skip: int = 0, limit: int = 100, db: AsyncSession = Depends(get_async_db)):
     """Retrieve a list of all devices with pagination."""
-    devices = crud.get_devices(db, skip=skip, limit=limit)
-    return devices
+    # Fast path: Core rows shaped into dicts and encoded by orjson, response_model only documents the shape
+    devices = await crud.get_devices(db, skip=skip, limit=limit)
+    return ORJSONResponse(devices)
 
 
 @app.post("/devices/", response_model=schemas.Device, status_code=status.HTTP_201_CREATED, tags=["Devices"])
 def create_device(
     device: schemas.DeviceCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
     """Add a new device (Requires Login)."""
+    validate_probe_interval(device.probe_interval_seconds)
+
     # check if IP already exists
     if crud.get_device_by_ip(db, ip_address=str(device.ip_address)):
         raise HTTPException(status_code=400, detail=f"IP address {device.ip_address} is already in use.")
@@ -85,7 +165,183 @@ def create_device(
         if crud.get_device_by_mac(db, mac_address=device.mac_address):
             raise HTTPException(status_code=400, detail=f"MAC address {device.mac_address} is already in use.")
 
-    return crud.create_device(db, device=device)
+    created = crud.create_device(db, device=device)
+    dictionary_cache.invalidate("locations")
+    return created
+
+
+# Rows validated and inserted per transaction by /devices/import
+DEVICE_IMPORT_BATCH_SIZE = 1000
+
+
+async def import_device_batch(
+    db: AsyncSession,
+    batch: list[tuple[int, dict]],
+    location_ids: set[int],
+    device_type_ids: set[int],
+    seen_ips: set[str],
+    seen_macs: set[str],
+    result: schemas.DeviceImportResult,
+):
+    """
+    Validate one batch of import records, check their IP/MAC against the inventory
+    with a single query and insert the valid ones in one transaction.
+    seen_ips / seen_macs collect the addresses of earlier rows of the same import.
+    """
+    def reject(line_number: int, ip_address, error: str):
+        result.errors.append(schemas.DeviceImportError(line=line_number, ip_address=ip_address, error=error))
+
+    valid = []
+    for line_number, record in batch:
+        try:
+            device = schemas.DeviceCreate.model_validate(record)
+        except ValidationError as exc:
+            ip_address = record.get("ip_address")
+            reject(line_number, str(ip_address) if ip_address is not None else None, "; ".join(
+                f"{'.'.join(str(part) for part in error['loc'])}: {error['msg']}" for error in exc.errors()
+            ))
+            continue
+        if device.probe_interval_seconds is not None and device.probe_interval_seconds < MIN_PROBE_INTERVAL_SECONDS:
+            reject(line_number, str(device.ip_address), f"Probe interval must be at least {MIN_PROBE_INTERVAL_SECONDS} seconds.")
+        elif device.location_id not in location_ids:
+            reject(line_number, str(device.ip_address), f"Location {device.location_id} does not exist.")
+        elif device.device_type_id not in device_type_ids:
+            reject(line_number, str(device.ip_address), f"Device type {device.device_type_id} does not exist.")
+        else:
+            valid.append((line_number, device))
+
+    if not valid:
+        return
+    taken_ips, taken_macs = await crud.get_taken_device_addresses(
+        db,
+        [str(device.ip_address) for _, device in valid],
+        [device.mac_address for _, device in valid if device.mac_address],
+    )
+
+    rows, row_lines = [], {}
+    for line_number, device in valid:
+        ip_address = str(device.ip_address)
+        mac_address = device.mac_address or None
+        if ip_address in taken_ips or ip_address in seen_ips:
+            reject(line_number, ip_address, f"IP address {ip_address} is already in use.")
+            continue
+        if mac_address and (mac_address in taken_macs or mac_address in seen_macs):
+            reject(line_number, ip_address, f"MAC address {mac_address} is already in use.")
+            continue
+        seen_ips.add(ip_address)
+        if mac_address:
+            seen_macs.add(mac_address)
+        rows.append({
+            "name": device.name,
+            "ip_address": ip_address,
+            "mac_address": mac_address,
+            "location_id": device.location_id,
+            "device_type_id": device.device_type_id,
+            "probe_interval_seconds": device.probe_interval_seconds,
+        })
+        row_lines[ip_address] = line_number
+
+    inserted = await db.run_sync(crud.bulk_insert_devices, rows)
+    await db.commit()
+    result.created += len(inserted)
+
+    # Rows skipped by ON CONFLICT were taken by a device created meanwhile
+    for ip_address in row_lines.keys() - inserted.keys():
+        reject(row_lines[ip_address], ip_address, "IP or MAC address is already in use.")
+
+
+@app.post("/devices/import", response_model=schemas.DeviceImportResult, tags=["Devices"])
+async def import_devices(
+    request: Request,
+    fmt: Optional[Literal["csv", "ndjson"]] = Query(None, alias="format"),
+    db: AsyncSession = Depends(get_async_db),
+    current_user: schemas.User = Depends(auth.get_current_user)
+):
+    """
+    Bulk device import (Requires Login).
+    The body is CSV with a header line or NDJSON (one object per line) with the fields of
+    `POST /devices/`. The format comes from `format` or the Content-Type header.
+    The body is read as a stream and saved in batches; rows that fail are reported with their line number.
+    """
+    location_ids = await crud.get_location_ids(db)
+    device_type_ids = await crud.get_device_type_ids(db)
+    records = iter_records(
+        iter_lines(request.stream()), fmt or format_from_content_type(request.headers.get("content-type"))
+    )
+
+    result = schemas.DeviceImportResult()
+    seen_ips: set[str] = set()
+    seen_macs: set[str] = set()
+    batch = []
+    async for line_number, record, error in records:
+        result.processed += 1
+        if error:
+            result.errors.append(schemas.DeviceImportError(line=line_number, error=error))
+            continue
+        batch.append((line_number, record))
+        if len(batch) >= DEVICE_IMPORT_BATCH_SIZE:
+            await import_device_batch(db, batch, location_ids, device_type_ids, seen_ips, seen_macs, result)
+            batch = []
+    if batch:
+        await import_device_batch(db, batch, location_ids, device_type_ids, seen_ips, seen_macs, result)
+
+    result.errors.sort(key=lambda error: error.line)
+    if result.created:
+        dictionary_cache.invalidate("locations")
+    return result
+
+
+@app.get("/devices/export", tags=["Devices"])
+async def export_devices(fmt: Literal["csv", "ndjson"] = Query("csv", alias="format")):
+    """
+    Stream the whole inventory as CSV or NDJSON (same columns as accepted by `/devices/import`).
+    """
+    async def export_rows():
+        # the session lives as long as the stream, rows are fetched in batches by a server-side cursor
+        async with AsyncSessionLocal() as db:
+            result = await crud.stream_devices(db)
+            if fmt == "csv":
+                yield encode_csv(crud.DEVICE_EXPORT_COLUMNS)
+            async for rows in result.partitions():
+                if fmt == "csv":
+                    yield "".join(encode_csv(row) for row in rows)
+                else:
+                    yield "".join(encode_ndjson(row._asdict()) for row in rows)
+
+    return StreamingResponse(
+        export_rows(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="devices.{fmt}"'},
+    )
+
+
+@app.get("/devices/search", response_model=List[schemas.Device], tags=["Devices"])
+async def search_devices(
+    cidr: Optional[str] = None,
+    location_id: Optional[int] = None,
+    device_type_id: Optional[int] = None,
+    is_online: Optional[bool] = None,
+    name: Optional[str] = Query(None, description="Case-insensitive name prefix"),
+    skip: int = 0,
+    limit: int = Query(100, le=1000),
+    db: AsyncSession = Depends(get_async_db),
+):
+    """Search devices by subnet (`cidr=10.0.4.0/22`), location, type, online state and name prefix."""
+    if cidr is not None:
+        try:
+            cidr = str(ipaddress.ip_network(cidr, strict=False))
+        except ValueError:
+            raise HTTPException(status_code=400, detail="cidr must be a network like 10.0.4.0/22.")
+    return await crud.search_devices(
+        db,
+        cidr=cidr,
+        location_id=location_id,
+        device_type_id=device_type_id,
+        is_online=is_online,
+        name_prefix=name,
+        skip=skip,
+        limit=limit,
+    )
 
 
 @app.get("/devices/{device_id}", response_model=schemas.Device, tags=["Devices"])
@@ -97,18 +353,78 @@ def read_device(device_id: int, db: Session = Depends(get_db)):
     return db_device
 
 
+@app.get("/devices/{device_id}/availability", response_model=schemas.DeviceAvailability, tags=["Devices"])
+def read_device_availability(
+    device_id: int,
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    bucket: Optional[Literal["minute", "hour", "day"]] = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Uptime and response time statistics of a device, read from the availability rollups.
+    Defaults to the last 24 hours. Without `bucket` the coarsest rollup that fits the range is used.
+    """
+    if crud.get_device(db, device_id) is None:
+        raise HTTPException(status_code=404, detail="Device not found")
+
+    now = datetime.now(timezone.utc)
+    end = (end or now).astimezone(timezone.utc)
+    start = (start or end - timedelta(days=1)).astimezone(timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'.")
+
+    granularity = bucket or rollups.pick_granularity(start, end, now)
+    rows = crud.get_availability_rollups(
+        db, rollups.ROLLUP_MODELS[granularity], device_id, rollups.truncate(start, granularity), end
+    )
+
+    samples = sum(row.samples for row in rows)
+    up_count = sum(row.up_count for row in rows)
+    rtt_count = sum(row.rtt_count for row in rows)
+    histogram = rollups.merge_histograms(row.rtt_histogram for row in rows)
+
+    return schemas.DeviceAvailability(
+        device_id=device_id,
+        bucket=granularity,
+        start=start,
+        end=end,
+        samples=samples,
+        up_count=up_count,
+        uptime_percent=round(100 * up_count / samples, 3) if samples else None,
+        rtt_avg=round(sum(row.rtt_sum for row in rows) / rtt_count, 2) if rtt_count else None,
+        rtt_p50=rollups.histogram_quantile(histogram, 0.50),
+        rtt_p95=rollups.histogram_quantile(histogram, 0.95),
+        rtt_p99=rollups.histogram_quantile(histogram, 0.99),
+        buckets=[
+            schemas.AvailabilityBucket(
+                bucket_start=row.bucket_start,
+                samples=row.samples,
+                up_count=row.up_count,
+                uptime_percent=round(100 * row.up_count / row.samples, 3) if row.samples else None,
+                rtt_min=row.rtt_min,
+                rtt_avg=round(row.rtt_sum / row.rtt_count, 2) if row.rtt_count else None,
+                rtt_max=row.rtt_max,
+            )
+            for row in rows
+        ],
+    )
+
+
 @app.put("/devices/{device_id}", response_model=schemas.Device, tags=["Devices"])
 def update_device(
     device_id: int,
     device: schemas.DeviceCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user)
+    current_user: schemas.User = Depends(auth.get_current_user)
 ):
     # check if device exists
     db_device = crud.get_device(db, device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
 
+    validate_probe_interval(device.probe_interval_seconds)
+
     # check IP (without ACTUAL device so it don't block)
     existing_ip = crud.get_device_by_ip(db, ip_address=str(device.ip_address))
     if existing_ip and existing_ip.id != device_id:
@@ -120,11 +436,13 @@ def update_device(
         if existing_mac and existing_mac.id != device_id:
             raise HTTPException(status_code=400, detail=f"MAC address {device.mac_address} duplicated.")
 
-    return crud.update_device(db, device_id=device_id, device_update=device)
+    updated = crud.update_device(db, device_id=device_id, device_update=device)
+    dictionary_cache.invalidate("locations")
+    return updated
 
 
 @app.delete("/devices/{device_id}", tags=["Devices"])
-def delete_device(device_id: int, db: Session = Depends(get_db),current_user: models.User = Depends(auth.get_current_user)):
+def delete_device(device_id: int, db: Session = Depends(get_db),current_user: schemas.User = Depends(auth.get_current_user)):
     """Remove a device from the database (Requires Admin Privileges)."""
     if current_user.role != "admin":
         raise HTTPException(
@@ -134,22 +452,18 @@ def delete_device(device_id: int, db: Session = Depends(get_db),current_user: mo
     db_device = crud.delete_device(db, device_id)
     if db_device is None:
         raise HTTPException(status_code=404, detail="Device not found")
+    dictionary_cache.invalidate("locations")
     return {"message": "Device deleted successfully"}
 
 
 # Dictionary Endpoints (for dropdowns in frontend)
 @app.get("/locations/", response_model=List[schemas.LocationWithCount], tags=["Dictionaries"])
-def read_locations(db: Session = Depends(get_db)):
-    """Retrieve a list of available locations (for dropdown menus)."""
-    locations = crud.get_locations(db)
-    return [
-        schemas.LocationWithCount(
-            id=location.id,
-            name=location.name,
-            devices_count=crud.count_devices_for_location(db, location.id),
-        )
-        for location in locations
-    ]
+def read_locations(request: Request, db: Session = Depends(get_db)):
+    """Retrieve a list of available locations (for dropdown menus). Cached, supports If-None-Match."""
+    return cached_json_response(request, "locations", lambda: [
+        schemas.LocationWithCount(id=location.id, name=location.name, devices_count=devices_count)
+        for location, devices_count in crud.get_locations_with_device_counts(db)
+    ])
 
 
 @app.post(
@@ -161,7 +475,7 @@ def read_locations(db: Session = Depends(get_db)):
 def create_location(
     location: schemas.LocationCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     """Add a new location (requires login)."""
     name = location.name.strip()
@@ -170,7 +484,9 @@ def create_location(
     if crud.get_location_by_name(db, name=name):
         raise HTTPException(status_code=400, detail="A location with this name already exists.")
     loc = schemas.LocationCreate(name=name)
-    return crud.create_location(db, loc)
+    created = crud.create_location(db, loc)
+    dictionary_cache.invalidate("locations")
+    return created
 
 
 @app.put("/locations/{location_id}", response_model=schemas.Location, tags=["Dictionaries"])
@@ -178,7 +494,7 @@ def update_location(
     location_id: int,
     location: schemas.LocationCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     """Update a location name (requires login)."""
     db_location = crud.get_location(db, location_id)
@@ -194,14 +510,16 @@ def update_location(
         raise HTTPException(status_code=400, detail="A location with this name already exists.")
 
     loc = schemas.LocationCreate(name=name)
-    return crud.update_location(db, location_id=location_id, location_update=loc)
+    updated = crud.update_location(db, location_id=location_id, location_update=loc)
+    dictionary_cache.invalidate("locations")
+    return updated
 
 
 @app.delete("/locations/{location_id}", tags=["Dictionaries"])
 def delete_location(
     location_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     """Remove a location (admin only; blocked if any device uses it)."""
     if current_user.role != "admin":
@@ -217,29 +535,48 @@ def delete_location(
     deleted = crud.delete_location(db, location_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Location not found")
+    dictionary_cache.invalidate("locations")
     return {"message": "Location deleted successfully"}
 
 
 @app.get("/device-types/", response_model=List[schemas.DeviceType], tags=["Dictionaries"])
-def read_device_types(db: Session = Depends(get_db)):
-    """Retrieve a list of device types (for dropdown menus)."""
-    return crud.get_device_types(db)
+def read_device_types(request: Request, db: Session = Depends(get_db)):
+    """Retrieve a list of device types (for dropdown menus). Cached, supports If-None-Match."""
+    return cached_json_response(request, "device-types", lambda: [
+        schemas.DeviceType.model_validate(device_type) for device_type in crud.get_device_types(db)
+    ])
+
+
+@app.put("/device-types/{device_type_id}", response_model=schemas.DeviceType, tags=["Dictionaries"])
+def update_device_type(
+    device_type_id: int,
+    device_type: schemas.DeviceTypeUpdate,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user),
+):
+    """Set the probe interval of a device type (requires login). Null restores the worker default."""
+    validate_probe_interval(device_type.probe_interval_seconds)
+    db_device_type = crud.update_device_type(db, device_type_id, device_type)
+    if db_device_type is None:
+        raise HTTPException(status_code=404, detail="Device type not found")
+    dictionary_cache.invalidate("device-types")
+    return db_device_type
 
 
 # Host discovery endpoints
 @app.get("/discovery-networks/", response_model=List[schemas.DiscoveryNetwork], tags=["Discovery"])
-def read_discovery_networks(db: Session = Depends(get_db)):
-    networks = crud.get_discovery_networks(db)
-    return [
+def read_discovery_networks(request: Request, db: Session = Depends(get_db)):
+    # Pending counts are also changed by the discovery worker, hence the short TTL
+    return cached_json_response(request, "discovery-networks", lambda: [
         schemas.DiscoveryNetwork(
             id=network.id,
             name=network.name,
             cidr=network.cidr,
             last_discovery=network.last_discovery,
-            new_hosts_count=crud.count_pending_discovered_hosts(db, network.id),
+            new_hosts_count=pending_count,
         )
-        for network in networks
-    ]
+        for network, pending_count in crud.get_discovery_networks_with_pending_counts(db)
+    ], ttl=DISCOVERY_NETWORKS_CACHE_TTL_SECONDS)
 
 
 @app.post(
@@ -251,7 +588,7 @@ def read_discovery_networks(db: Session = Depends(get_db)):
 def create_discovery_network(
     network: schemas.DiscoveryNetworkCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     name = network.name.strip()
     cidr = network.cidr.strip()
@@ -271,6 +608,7 @@ def create_discovery_network(
         raise HTTPException(status_code=400, detail="This network address is already configured.")
 
     created = crud.create_discovery_network(db, schemas.DiscoveryNetworkCreate(name=name, cidr=cidr))
+    dictionary_cache.invalidate("discovery-networks")
     return schemas.DiscoveryNetwork(
         id=created.id,
         name=created.name,
@@ -285,7 +623,7 @@ def update_discovery_network(
     network_id: int,
     network: schemas.DiscoveryNetworkCreate,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     db_network = crud.get_discovery_network(db, network_id)
     if db_network is None:
@@ -311,6 +649,7 @@ def update_discovery_network(
         raise HTTPException(status_code=400, detail="This network address is already configured.")
 
     updated = crud.update_discovery_network(db, network_id, schemas.DiscoveryNetworkCreate(name=name, cidr=cidr))
+    dictionary_cache.invalidate("discovery-networks")
     return schemas.DiscoveryNetwork(
         id=updated.id,
         name=updated.name,
@@ -324,7 +663,7 @@ def update_discovery_network(
 def delete_discovery_network(
     network_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     if current_user.role != "admin":
         raise HTTPException(
@@ -334,6 +673,7 @@ def delete_discovery_network(
     deleted = crud.delete_discovery_network(db, network_id)
     if deleted is None:
         raise HTTPException(status_code=404, detail="Discovery network not found")
+    dictionary_cache.invalidate("discovery-networks")
     return {"message": "Discovery network deleted successfully"}
 
 
@@ -347,7 +687,7 @@ def accept_discovered_host(
     host_id: int,
     payload: schemas.DiscoveredHostAccept,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     db_host = crud.get_discovered_host(db, host_id)
     if db_host is None:
@@ -363,6 +703,7 @@ def accept_discovered_host(
         db_host.status = "added"
         db_host.proposed_name = normalized_name
         db.commit()
+        dictionary_cache.invalidate("discovery-networks")
         raise HTTPException(status_code=409, detail="Host already exists in devices.")
 
     device_data = schemas.DeviceCreate(
@@ -377,6 +718,7 @@ def accept_discovered_host(
     db_host.proposed_name = normalized_name
     db.commit()
     db.refresh(created_device)
+    dictionary_cache.invalidate("locations", "discovery-networks")
     return created_device
 
 
@@ -384,7 +726,7 @@ def accept_discovered_host(
 def skip_discovered_host(
     host_id: int,
     db: Session = Depends(get_db),
-    current_user: models.User = Depends(auth.get_current_user),
+    current_user: schemas.User = Depends(auth.get_current_user),
 ):
     db_host = crud.get_discovered_host(db, host_id)
     if db_host is None:
@@ -394,27 +736,241 @@ def skip_discovered_host(
 
     db_host.status = "skipped"
     db.commit()
+    dictionary_cache.invalidate("discovery-networks")
     return {"message": "Discovered host skipped"}
 
 
+def select_hosts_for_triage(db: Session, selection: schemas.DiscoveredHostSelection):
+    """
+    Lock the hosts picked by a bulk request. Returns (hosts, outcomes of requested ids that do not exist).
+    """
+    if selection.host_ids is None and selection.network_id is None and selection.ip_range is None:
+        raise HTTPException(status_code=400, detail="Select hosts with host_ids, network_id or ip_range.")
+    address_range = None
+    if selection.ip_range:
+        try:
+            address_range = parse_address_range(selection.ip_range)
+        except ValueError:
+            raise HTTPException(status_code=400, detail="ip_range must be a CIDR or a 'first-last' address range.")
+
+    hosts = crud.get_discovered_hosts_for_update(db, selection.host_ids, selection.network_id, address_range)
+
+    missing = []
+    if selection.host_ids is not None:
+        found = {host.id for host in hosts}
+        missing = [
+            schemas.DiscoveredHostOutcome(host_id=host_id, outcome="not_found")
+            for host_id in dict.fromkeys(selection.host_ids) if host_id not in found
+        ]
+    return hosts, missing
+
+
+def already_processed(host: models.DiscoveredHost) -> schemas.DiscoveredHostOutcome:
+    return schemas.DiscoveredHostOutcome(host_id=host.id, ip_address=host.ip_address, outcome="already_processed")
+
+
+@app.post("/discovered-hosts/bulk-accept", response_model=schemas.DiscoveredHostBulkResult, tags=["Discovery"])
+def bulk_accept_discovered_hosts(
+    payload: schemas.DiscoveredHostBulkAccept,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user),
+):
+    """
+    Add many pending hosts as devices in one transaction (Requires Login).
+    Hosts whose IP already belongs to a device are marked as added and reported as duplicates.
+    """
+    if crud.get_location(db, payload.location_id) is None:
+        raise HTTPException(status_code=400, detail="Location not found.")
+    if crud.get_device_type(db, payload.device_type_id) is None:
+        raise HTTPException(status_code=400, detail="Device type not found.")
+
+    hosts, results = select_hosts_for_triage(db, payload)
+    pending = [host for host in hosts if host.status == "pending"]
+    results += [already_processed(host) for host in hosts if host.status != "pending"]
+
+    existing = crud.get_device_ids_by_ip(db, [host.ip_address for host in pending])
+    names = {host.id: (host.proposed_name or f"{payload.name_prefix}{host.ip_address}").strip() for host in pending}
+    new_hosts = {}
+    for host in pending:
+        # the same address can be pending only once, but keep the first if a selection repeats it
+        if host.ip_address not in existing:
+            new_hosts.setdefault(host.ip_address, host)
+    created = crud.bulk_insert_devices(db, [
+        {
+            "name": names[host.id],
+            "ip_address": host.ip_address,
+            "mac_address": None,
+            "location_id": payload.location_id,
+            "device_type_id": payload.device_type_id,
+        }
+        for host in new_hosts.values()
+    ])
+
+    for host in pending:
+        device_id = created.get(host.ip_address) if new_hosts.get(host.ip_address) is host else None
+        results.append(schemas.DiscoveredHostOutcome(
+            host_id=host.id,
+            ip_address=host.ip_address,
+            outcome="added" if device_id is not None else "duplicate",
+            device_id=device_id if device_id is not None else existing.get(host.ip_address),
+        ))
+    crud.bulk_update_discovered_hosts(db, [
+        {"id": host.id, "status": "added", "proposed_name": names[host.id]} for host in pending
+    ])
+    db.commit()
+
+    dictionary_cache.invalidate("locations", "discovery-networks")
+    return schemas.DiscoveredHostBulkResult(processed=len(results), results=results)
+
+
+@app.post("/discovered-hosts/bulk-skip", response_model=schemas.DiscoveredHostBulkResult, tags=["Discovery"])
+def bulk_skip_discovered_hosts(
+    payload: schemas.DiscoveredHostSelection,
+    db: Session = Depends(get_db),
+    current_user: schemas.User = Depends(auth.get_current_user),
+):
+    """
+    Skip many pending hosts in one transaction (Requires Login).
+    """
+    hosts, results = select_hosts_for_triage(db, payload)
+    pending = [host for host in hosts if host.status == "pending"]
+    results += [already_processed(host) for host in hosts if host.status != "pending"]
+    results += [
+        schemas.DiscoveredHostOutcome(host_id=host.id, ip_address=host.ip_address, outcome="skipped")
+        for host in pending
+    ]
+    crud.bulk_update_discovered_hosts(db, [{"id": host.id, "status": "skipped"} for host in pending])
+    db.commit()
+
+    dictionary_cache.invalidate("discovery-networks")
+    return schemas.DiscoveredHostBulkResult(processed=len(results), results=results)
+
+
 # Monitoring Endpoints (Logs)
 @app.get("/scan-results/", response_model=List[schemas.ScanResultWithDevice], tags=["Monitoring"])
-def read_scan_results(skip: int = 0, limit: int = 50, db: Session = Depends(get_db)):
-    """Retrieve network scan history with device details included."""
-    return crud.get_scan_results(db, skip=skip, limit=limit)
+async def read_scan_results(
+    skip: int = 0,
+    limit: int = 50,
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
+):
+    """
+    Retrieve network scan history with device details included.
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
+    """
+    scans, next_cursor = await crud.get_scan_results(db, skip=skip, limit=limit, cursor=parse_cursor(cursor))
+    return ORJSONResponse(scans, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+@app.get("/scan-results/export", tags=["Monitoring"])
+async def export_scan_results(
+    start: Optional[datetime] = Query(None, alias="from"),
+    end: Optional[datetime] = Query(None, alias="to"),
+    device_id: Optional[int] = None,
+    fmt: Literal["csv", "ndjson"] = Query("ndjson", alias="format"),
+):
+    """
+    Stream scan history (oldest first) as NDJSON or CSV. Defaults to the last 24 hours.
+    Rows are read in batches by a server-side cursor, so memory use does not depend on the range.
+    """
+    end = (end or datetime.now(timezone.utc)).astimezone(timezone.utc)
+    start = (start or end - timedelta(days=1)).astimezone(timezone.utc)
+    if start >= end:
+        raise HTTPException(status_code=400, detail="'from' must be earlier than 'to'.")
+
+    async def export_rows():
+        async with AsyncSessionLocal() as db:
+            result = await crud.stream_scan_results(db, start, end, device_id)
+            if fmt == "csv":
+                yield encode_csv(crud.SCAN_EXPORT_COLUMNS)
+            async for rows in result.partitions():
+                if fmt == "csv":
+                    yield "".join(encode_csv(row) for row in rows)
+                else:
+                    yield "".join(encode_ndjson(row._asdict()) for row in rows)
+
+    return StreamingResponse(
+        export_rows(),
+        media_type=MEDIA_TYPES[fmt],
+        headers={"Content-Disposition": f'attachment; filename="scan-results.{fmt}"'},
+    )
 
 
 @app.get("/logs/", response_model=List[schemas.LogEntry], tags=["Monitoring"])
-def read_logs(
+async def read_logs(
     skip: int = 0,
     limit: int = 50,
     event_type: str | None = None,
-    db: Session = Depends(get_db),
+    cursor: str | None = None,
+    db: AsyncSession = Depends(get_async_db),
 ):
     """
     Retrieve a unified log stream containing both monitoring scan results
     and host discovery events. Filter with `event_type=scan` or `event_type=discovery`.
+    Pass the `X-Next-Cursor` response header back as `cursor` to get the next page.
     """
     if event_type not in (None, "scan", "discovery"):
         raise HTTPException(status_code=400, detail="event_type must be 'scan' or 'discovery'.")
-    return crud.get_logs(db, skip=skip, limit=limit, event_type=event_type)
\ No newline at end of file
+    entries, next_cursor = await crud.get_logs(
+        db, skip=skip, limit=limit, event_type=event_type, cursor=parse_cursor(cursor)
+    )
+    return ORJSONResponse(entries, headers={"X-Next-Cursor": next_cursor} if next_cursor else None)
+
+
+# Live events (device state transitions, new discovered hosts)
+# Seconds without events after which the SSE stream sends a keep-alive comment
+EVENT_KEEPALIVE_SECONDS = 15
+
+
+@app.get("/events/stream", tags=["Monitoring"])
+async def stream_events(request: Request):
+    """
+    Server-Sent Events stream of device state transitions and new discovered hosts.
+    A `resync` event means events were missed and the client should reload over REST.
+    """
+    subscription = event_broker.subscribe()
+
+    async def event_source():
+        try:
+            while not await request.is_disconnected():
+                try:
+                    event = await asyncio.wait_for(subscription.get(), timeout=EVENT_KEEPALIVE_SECONDS)
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                yield f"data: {json.dumps(event)}\n\n"
+        finally:
+            event_broker.unsubscribe(subscription)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+@app.websocket("/ws/events")
+async def websocket_events(websocket: WebSocket):
+    """
+    The same event stream as /events/stream over a WebSocket (one JSON message per event).
+    """
+    await websocket.accept()
+    subscription = event_broker.subscribe()
+
+    async def send_events():
+        while True:
+            await websocket.send_json(await subscription.get())
+
+    async def wait_for_disconnect():
+        # incoming messages are ignored, receiving only notices a closed socket while no events arrive
+        while True:
+            await websocket.receive_text()
+
+    tasks = [asyncio.create_task(send_events()), asyncio.create_task(wait_for_disconnect())]
+    try:
+        await asyncio.wait(tasks, return_when=asyncio.FIRST_COMPLETED)
+    finally:
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        event_broker.unsubscribe(subscription)
@@ -0,0 +1,125 @@
+import logging
+import time
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from sqlalchemy import event
+
+logger = logging.getLogger(__name__)
+
+# Every process (API, monitor shard, discovery worker) keeps its own registry.
+# The API serves it on GET /metrics, the workers on their own METRICS_PORT.
+
+# API
+HTTP_REQUEST_DURATION = Histogram(
+    "http_request_duration_seconds",
+    "API request latency by route template.",
+    ["method", "route", "status"],
+)
+
+# Database
+DB_QUERY_DURATION = Histogram(
+    "db_query_duration_seconds",
+    "Database statement execution time.",
+    ["engine", "operation"],
+    buckets=(0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Connections of the SQLAlchemy pool (checked_out, idle, overflow).",
+    ["engine", "state"],
+)
+
+# Monitor worker
+PROBES = Counter("monitor_probes_total", "Probes completed by result.", ["result"])
+PROBE_BATCH_DURATION = Histogram(
+    "monitor_probe_batch_duration_seconds",
+    "Duration of one probe batch (probing and saving).",
+    buckets=(0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 30, 60, 120),
+)
+PROBE_BATCH_SIZE = Histogram(
+    "monitor_probe_batch_size",
+    "Devices probed in one batch.",
+    buckets=(1, 10, 50, 100, 500, 1000, 5000, 10000, 50000),
+)
+SCHEDULE_LAG = Histogram(
+    "monitor_schedule_lag_seconds",
+    "Delay between the due time of a batch and its start.",
+    buckets=(0.1, 0.5, 1, 2, 5, 10, 30, 60, 120, 300),
+)
+SCHEDULE_OVERRUNS = Counter(
+    "monitor_schedule_overruns_total",
+    "Batches started later than the default probe interval.",
+)
+PROBES_PER_SECOND = Gauge("monitor_probes_per_second", "Probe rate over the last stats window.")
+ROWS_WRITTEN = Counter("monitor_rows_written_total", "Scan result rows written.")
+ROWS_PER_BATCH = Histogram(
+    "monitor_rows_written_per_batch",
+    "Scan result rows written by one batch.",
+    buckets=(0, 1, 10, 100, 1000, 5000, 10000, 50000),
+)
+WRITE_DURATION = Histogram(
+    "monitor_write_duration_seconds",
+    "Time spent saving the results of one batch.",
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10),
+)
+MONITORED_DEVICES = Gauge("monitor_devices", "Devices scheduled by this worker.")
+ONLINE_DEVICES = Gauge("monitor_devices_online", "Scheduled devices that answered their last probe.")
+
+# Discovery worker
+DISCOVERY_NETWORK_DURATION = Histogram(
+    "discovery_network_duration_seconds",
+    "Duration of the discovery of one network.",
+    ["cidr"],
+    buckets=(1, 5, 10, 30, 60, 120, 300, 600, 1800),
+)
+DISCOVERY_CYCLE_DURATION = Gauge("discovery_cycle_duration_seconds", "Duration of the last discovery cycle.")
+DISCOVERY_OVERRUNS = Counter(
+    "discovery_cycle_overruns_total",
+    "Discovery cycles that took longer than the discovery interval.",
+)
+DISCOVERED_HOSTS = Counter("discovery_new_hosts_total", "New pending hosts found.", ["cidr"])
+
+
+def _operation(statement: str) -> str:
+    keyword = statement.lstrip().split(None, 1)[0].lower() if statement.strip() else "unknown"
+    return keyword if keyword in ("select", "insert", "update", "delete", "copy", "with") else "other"
+
+
+def instrument_engine(engine, name: str):
+    """
+    Time every statement executed through the engine and publish its pool usage.
+    For an AsyncEngine pass async_engine.sync_engine.
+    """
+    @event.listens_for(engine, "before_cursor_execute")
+    def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    @event.listens_for(engine, "after_cursor_execute")
+    def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        started = conn.info["query_started"].pop()
+        DB_QUERY_DURATION.labels(name, _operation(statement)).observe(time.perf_counter() - started)
+
+    @event.listens_for(engine, "handle_error")
+    def _handle_error(context):
+        # a failed statement never reaches after_cursor_execute
+        if context.connection is not None and context.connection.info.get("query_started"):
+            context.connection.info["query_started"].pop()
+
+    pool = engine.pool
+    if hasattr(pool, "checkedout"):
+        DB_POOL_CONNECTIONS.labels(name, "checked_out").set_function(pool.checkedout)
+        DB_POOL_CONNECTIONS.labels(name, "idle").set_function(pool.checkedin)
+        DB_POOL_CONNECTIONS.labels(name, "overflow").set_function(lambda: max(pool.overflow(), 0))
+
+
+def start_metrics_server(port: int):
+    """
+    Serve /metrics of a worker process on a background thread. Port 0 disables it.
+    """
+    if not port:
+        return
+    try:
+        start_http_server(port)
+    except OSError as e:
+        logger.warning(f"Metrics endpoint could not listen on port {port}: {e}")
+        return
+    logger.info(f"Metrics available on http://0.0.0.0:{port}/metrics")
@@ -0,0 +1,78 @@
+from sqlalchemy import text
+from sqlalchemy.engine import Engine
+import models
+import partitions
+
+# create_all() only creates missing tables. Columns added to existing tables
+# are applied here with idempotent DDL so older databases keep working.
+UPGRADE_STATEMENTS = [
+    "ALTER TABLE devices ADD COLUMN IF NOT EXISTS probe_interval_seconds INTEGER",
+    "ALTER TABLE device_types ADD COLUMN IF NOT EXISTS probe_interval_seconds INTEGER",
+    "ALTER TABLE scan_results ADD COLUMN IF NOT EXISTS record_type VARCHAR NOT NULL DEFAULT 'sample'",
+    "ALTER TABLE scan_results ADD COLUMN IF NOT EXISTS state_duration_seconds INTEGER",
+    "ALTER TABLE discovered_hosts ADD COLUMN IF NOT EXISTS last_seen TIMESTAMP WITH TIME ZONE",
+    # IP addresses move from VARCHAR to native inet (only while the column still has the old type)
+    """
+    DO $$
+    BEGIN
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'devices' AND column_name = 'ip_address') <> 'inet' THEN
+            ALTER TABLE devices ALTER COLUMN ip_address TYPE inet USING ip_address::inet;
+        END IF;
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'discovered_hosts' AND column_name = 'ip_address') <> 'inet' THEN
+            ALTER TABLE discovered_hosts ALTER COLUMN ip_address TYPE inet USING ip_address::inet;
+        END IF;
+        IF (SELECT data_type FROM information_schema.columns
+            WHERE table_name = 'discovery_events' AND column_name = 'ip_address') <> 'inet' THEN
+            ALTER TABLE discovery_events ALTER COLUMN ip_address TYPE inet USING ip_address::inet;
+        END IF;
+    END $$
+    """,
+]
+
+# Indexes added to existing tables, applied after scan_results has been partitioned
+INDEX_STATEMENTS = [
+    "DROP INDEX IF EXISTS ix_scan_results_timestamp",
+    "CREATE INDEX IF NOT EXISTS ix_scan_results_timestamp_id ON scan_results (timestamp, id)",
+    "CREATE INDEX IF NOT EXISTS ix_discovered_hosts_discovered_at_id ON discovered_hosts (discovered_at, id)",
+    # duplicates left by the old check-then-insert discovery are skipped (the oldest entry stays pending)
+    """
+    UPDATE discovered_hosts SET status = 'skipped'
+    WHERE status = 'pending'
+      AND id NOT IN (SELECT min(id) FROM discovered_hosts WHERE status = 'pending' GROUP BY ip_address)
+    """,
+    "CREATE UNIQUE INDEX IF NOT EXISTS uq_discovered_hosts_pending_ip_address ON discovered_hosts (ip_address) WHERE status = 'pending'",
+    "CREATE INDEX IF NOT EXISTS ix_discovered_hosts_ip_address_gist ON discovered_hosts USING gist (ip_address inet_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_ip_address_gist ON devices USING gist (ip_address inet_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_location_id ON devices (location_id)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_device_type_id ON devices (device_type_id)",
+    "CREATE INDEX IF NOT EXISTS ix_devices_name_lower ON devices (lower(name) text_pattern_ops)",
+    "CREATE INDEX IF NOT EXISTS ix_device_status_is_online ON device_status (is_online)",
+]
+
+# One-off backfill of device_status from scan history (only while the table is empty)
+BACKFILL_STATEMENTS = [
+    """
+    INSERT INTO device_status (device_id, is_online, last_change_at, last_checked_at, last_response_time_ms, consecutive_failures)
+    SELECT DISTINCT ON (device_id) device_id, coalesce(status, false), timestamp, timestamp, response_time_ms, 0
+    FROM scan_results
+    WHERE NOT EXISTS (SELECT 1 FROM device_status)
+    ORDER BY device_id, timestamp DESC
+    """,
+]
+
+
+def upgrade_schema(engine: Engine):
+    with engine.begin() as connection:
+        for statement in UPGRADE_STATEMENTS:
+            connection.execute(text(statement))
+
+        # scan_results created before partitioning is moved into daily partitions
+        if partitions.is_partitioned(connection) is False:
+            partitions.convert_to_partitioned(connection, models.ScanResult.__table__)
+
+        for statement in INDEX_STATEMENTS + BACKFILL_STATEMENTS:
+            connection.execute(text(statement))
+
+    partitions.run_partition_maintenance(engine)
@@ -1,9 +1,24 @@
-from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime
-from sqlalchemy.orm import relationship
+from sqlalchemy import Column, Integer, String, Boolean, ForeignKey, DateTime, Index, TypeDecorator, text
+from sqlalchemy.dialects.postgresql import ARRAY, INET
+from sqlalchemy.orm import relationship, declared_attr
 from sqlalchemy.sql import func
 from database import Base
 
 
+class IPAddress(TypeDecorator):
+    """
+    PostgreSQL inet column exposed as a plain string (asyncpg would return ipaddress objects).
+    """
+    impl = INET
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        return str(value) if value is not None else None
+
+    def process_result_value(self, value, dialect):
+        return str(getattr(value, "ip", value)) if value is not None else None
+
+
 class User(Base):
     __tablename__ = "users"
 
@@ -16,11 +31,19 @@ class User(Base):
 
 class Device(Base):
     __tablename__ = "devices"
+    __table_args__ = (
+        # /devices/search - CIDR containment (<<=), location, type
+        Index("ix_devices_ip_address_gist", "ip_address", postgresql_using="gist", postgresql_ops={"ip_address": "inet_ops"}),
+        Index("ix_devices_location_id", "location_id"),
+        Index("ix_devices_device_type_id", "device_type_id"),
+    )
 
     id = Column(Integer, primary_key=True)
     name = Column(String, nullable=False)
-    ip_address = Column(String, unique=True, nullable=False)
+    ip_address = Column(IPAddress, unique=True, nullable=False)
     mac_address = Column(String, unique=True)
+    # Probe interval override, NULL = interval of the device type
+    probe_interval_seconds = Column(Integer, nullable=True)
 
     # Foreign keys
     location_id = Column(Integer, ForeignKey("locations.id"))
@@ -32,6 +55,15 @@ class Device(Base):
 
     # Relationship (Children)
     scan_results = relationship("ScanResult", back_populates="device", cascade="all, delete")
+    status = relationship("DeviceStatus", back_populates="device", uselist=False, cascade="all, delete")
+
+
+# case-insensitive name prefix search (lower(name) LIKE 'abc%')
+Index(
+    "ix_devices_name_lower",
+    func.lower(Device.name).label("name_lower"),
+    postgresql_ops={"name_lower": "text_pattern_ops"},
+)
 
 
 class DeviceType(Base):
@@ -40,6 +72,8 @@ class DeviceType(Base):
     id = Column(Integer, primary_key=True, index=True)
     name = Column(String, unique=True, nullable=False)
     icon_name = Column(String, nullable=True)
+    # Probe interval of devices of this type, NULL = worker default
+    probe_interval_seconds = Column(Integer, nullable=True)
 
     # relationship: One Type -> Many Devices
     devices = relationship("Device", back_populates="device_type")
@@ -47,19 +81,52 @@ class DeviceType(Base):
 
 class ScanResult(Base):
     __tablename__ = "scan_results"
+    __table_args__ = (
+        # keyset pagination of /scan-results/ and /logs/
+        Index("ix_scan_results_timestamp_id", "timestamp", "id"),
+        # latest state per device (transition storage mode, per-device history)
+        Index("ix_scan_results_device_id_timestamp", "device_id", "timestamp"),
+        # Daily range partitions are created and dropped by partitions.py
+        {"postgresql_partition_by": "RANGE (timestamp)"},
+    )
 
-    id = Column(Integer, primary_key=True, index=True)
+    # The partition key has to be part of the primary key
+    id = Column(Integer, primary_key=True, autoincrement=True)
+    timestamp = Column(DateTime(timezone=True), primary_key=True, server_default=func.now())
     device_id = Column(Integer, ForeignKey("devices.id"), nullable=False)
 
     status = Column(Boolean, default=False)  # True = Online, False = Offline
     response_time_ms = Column(Integer, nullable=True)
     log_message = Column(String, nullable=True)
-    timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    # "sample" - regular probe, "transition" / "heartbeat" - rows of transition storage mode
+    record_type = Column(String, nullable=False, default="sample", server_default="sample")
+    # transition: how long the previous state lasted, heartbeat: how long the current state has lasted
+    state_duration_seconds = Column(Integer, nullable=True)
 
     # Relationship back to Device
     device = relationship("Device", back_populates="scan_results")
 
 
+class DeviceStatus(Base):
+    """
+    Latest known state of a device, upserted by the monitor worker on every probe.
+    """
+    __tablename__ = "device_status"
+    __table_args__ = (
+        # /devices/search?is_online=
+        Index("ix_device_status_is_online", "is_online"),
+    )
+
+    device_id = Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+    is_online = Column(Boolean, nullable=False)
+    last_change_at = Column(DateTime(timezone=True), nullable=False)
+    last_checked_at = Column(DateTime(timezone=True), nullable=False)
+    last_response_time_ms = Column(Integer, nullable=True)
+    consecutive_failures = Column(Integer, nullable=False, default=0)
+
+    device = relationship("Device", back_populates="status")
+
+
 class Location(Base):
     __tablename__ = "locations"
 
@@ -83,16 +150,89 @@ class DiscoveryNetwork(Base):
         back_populates="network",
         cascade="all, delete",
     )
+    discovery_events = relationship(
+        "DiscoveryEvent",
+        back_populates="network",
+        cascade="all, delete",
+    )
 
 
 class DiscoveredHost(Base):
     __tablename__ = "discovered_hosts"
+    __table_args__ = (
+        # keyset pagination of /logs/
+        Index("ix_discovered_hosts_discovered_at_id", "discovered_at", "id"),
+        # at most one pending entry per address, enforced for concurrent discovery workers
+        Index(
+            "uq_discovered_hosts_pending_ip_address",
+            "ip_address",
+            unique=True,
+            postgresql_where=text("status = 'pending'"),
+        ),
+        # bulk triage by address range
+        Index("ix_discovered_hosts_ip_address_gist", "ip_address", postgresql_using="gist", postgresql_ops={"ip_address": "inet_ops"}),
+    )
 
     id = Column(Integer, primary_key=True, index=True)
     network_id = Column(Integer, ForeignKey("discovery_networks.id"), nullable=False)
-    ip_address = Column(String, nullable=False)
+    ip_address = Column(IPAddress, nullable=False)
     status = Column(String, nullable=False, default="pending")
     proposed_name = Column(String, nullable=True)
     discovered_at = Column(DateTime(timezone=True), server_default=func.now())
+    # last sweep that found the host alive, written when it appears and when it disappears;
+    # the API adds the network's last_discovery for hosts still alive (crud.get_pending_discovered_hosts)
+    last_seen = Column(DateTime(timezone=True), nullable=True)
 
     network = relationship("DiscoveryNetwork", back_populates="discovered_hosts")
+
+
+class DiscoveryEvent(Base):
+    """
+    Liveness change of a host found by discovery (currently only "disappeared").
+    """
+    __tablename__ = "discovery_events"
+    __table_args__ = (
+        # keyset pagination of /logs/
+        Index("ix_discovery_events_occurred_at_id", "occurred_at", "id"),
+    )
+
+    id = Column(Integer, primary_key=True)
+    network_id = Column(Integer, ForeignKey("discovery_networks.id", ondelete="CASCADE"), nullable=False)
+    ip_address = Column(IPAddress, nullable=False)
+    event_type = Column(String, nullable=False, default="disappeared")
+    occurred_at = Column(DateTime(timezone=True), nullable=False, server_default=func.now())
+    last_seen = Column(DateTime(timezone=True), nullable=True)
+
+    network = relationship("DiscoveryNetwork", back_populates="discovery_events")
+
+
+class AvailabilityRollupMixin:
+    """
+    Per-device availability aggregate for one time bucket, updated incrementally by the monitor worker.
+    """
+
+    @declared_attr
+    def device_id(cls):
+        return Column(Integer, ForeignKey("devices.id", ondelete="CASCADE"), primary_key=True)
+
+    bucket_start = Column(DateTime(timezone=True), primary_key=True)
+    samples = Column(Integer, nullable=False, default=0)
+    up_count = Column(Integer, nullable=False, default=0)
+    rtt_count = Column(Integer, nullable=False, default=0)
+    rtt_sum = Column(Integer, nullable=False, default=0)
+    rtt_min = Column(Integer, nullable=True)
+    rtt_max = Column(Integer, nullable=True)
+    # Counts of RTT samples per bucket of rollups.RTT_BUCKET_BOUNDS (mergeable quantile sketch)
+    rtt_histogram = Column(ARRAY(Integer), nullable=False)
+
+
+class AvailabilityMinute(AvailabilityRollupMixin, Base):
+    __tablename__ = "availability_minute"
+
+
+class AvailabilityHour(AvailabilityRollupMixin, Base):
+    __tablename__ = "availability_hour"
+
+
+class AvailabilityDay(AvailabilityRollupMixin, Base):
+    __tablename__ = "availability_day"
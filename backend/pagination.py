@@ -0,0 +1,38 @@
+import base64
+import json
+from datetime import datetime
+from sqlalchemy import tuple_
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(timestamp: datetime, rank: int, row_id: int) -> str:
+    """
+    Opaque keyset cursor pointing at the last row of a page.
+    rank orders rows of different sources that share a timestamp.
+    """
+    payload = json.dumps({"t": timestamp.isoformat(), "r": rank, "id": row_id}, separators=(",", ":"))
+    return base64.urlsafe_b64encode(payload.encode()).decode().rstrip("=")
+
+
+def decode_cursor(token: str) -> tuple[datetime, int, int]:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(token + "=" * (-len(token) % 4)))
+        return datetime.fromisoformat(payload["t"]), int(payload["r"]), int(payload["id"])
+    except (ValueError, KeyError, TypeError) as exc:
+        raise InvalidCursor("Invalid cursor") from exc
+
+
+def seek_before(timestamp_column, id_column, rank: int, cursor: tuple[datetime, int, int]):
+    """
+    Filter selecting rows of a source with the given rank that come after the cursor
+    in (timestamp DESC, rank DESC, id DESC) order. Served by a (timestamp, id) index.
+    """
+    cursor_timestamp, cursor_rank, cursor_id = cursor
+    if rank < cursor_rank:
+        return timestamp_column <= cursor_timestamp
+    if rank > cursor_rank:
+        return timestamp_column < cursor_timestamp
+    return tuple_(timestamp_column, id_column) < tuple_(cursor_timestamp, cursor_id)
@@ -0,0 +1,212 @@
+import os
+import re
+import logging
+from datetime import date, datetime, time, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+# scan_results is range-partitioned by timestamp, one partition per UTC day
+SCAN_RESULTS_TABLE = "scan_results"
+# Days of history kept, older daily partitions are dropped (0 = keep everything)
+SCAN_RESULTS_RETENTION_DAYS = int(os.getenv("SCAN_RESULTS_RETENTION_DAYS", "0"))
+# How many future daily partitions are kept ready for inserts
+PARTITION_PRECREATE_DAYS = int(os.getenv("PARTITION_PRECREATE_DAYS", "7"))
+
+PARTITION_NAME_PATTERN = re.compile(rf"^{SCAN_RESULTS_TABLE}_p(\d{{8}})$")
+# Catches rows outside every daily partition (clock skew, maintenance not running) instead of failing the insert
+DEFAULT_PARTITION = f"{SCAN_RESULTS_TABLE}_default"
+
+
+def partition_name(day: date) -> str:
+    return f"{SCAN_RESULTS_TABLE}_p{day:%Y%m%d}"
+
+
+def _day_start(day: date) -> datetime:
+    return datetime.combine(day, time.min, tzinfo=timezone.utc)
+
+
+def utc_today() -> date:
+    return datetime.now(timezone.utc).date()
+
+
+def is_partitioned(connection: Connection) -> bool | None:
+    """
+    True/False for an existing scan_results table, None when the table does not exist.
+    """
+    relkind = connection.execute(
+        text("SELECT relkind FROM pg_class WHERE relname = :name AND relkind IN ('r', 'p')"),
+        {"name": SCAN_RESULTS_TABLE},
+    ).scalar()
+    if relkind is None:
+        return None
+    return relkind == "p"
+
+
+def list_partitions(connection: Connection) -> dict[date, str]:
+    rows = connection.execute(
+        text(
+            "SELECT child.relname FROM pg_inherits "
+            "JOIN pg_class parent ON parent.oid = pg_inherits.inhparent "
+            "JOIN pg_class child ON child.oid = pg_inherits.inhrelid "
+            "WHERE parent.relname = :name"
+        ),
+        {"name": SCAN_RESULTS_TABLE},
+    ).scalars()
+
+    partitions = {}
+    for name in rows:
+        match = PARTITION_NAME_PATTERN.match(name)
+        if match:
+            partitions[datetime.strptime(match.group(1), "%Y%m%d").date()] = name
+    return partitions
+
+
+def ensure_default_partition(connection: Connection):
+    connection.execute(text(f"CREATE TABLE IF NOT EXISTS {DEFAULT_PARTITION} PARTITION OF {SCAN_RESULTS_TABLE} DEFAULT"))
+
+
+def _create_partition(connection: Connection, day: date):
+    """
+    Create the partition of one day. Rows of that day already in the default partition
+    would make CREATE fail, they are moved into the new partition in the same transaction.
+    """
+    name = partition_name(day)
+    bounds = {"start": _day_start(day), "end": _day_start(day + timedelta(days=1))}
+    create = text(
+        f"CREATE TABLE IF NOT EXISTS {name} PARTITION OF {SCAN_RESULTS_TABLE} "
+        f"FOR VALUES FROM ('{bounds['start'].isoformat()}') TO ('{bounds['end'].isoformat()}')"
+    )
+    has_default = connection.execute(text("SELECT to_regclass(:name)"), {"name": DEFAULT_PARTITION}).scalar()
+    stray = has_default and connection.execute(
+        text(f"SELECT EXISTS (SELECT 1 FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end)"),
+        bounds,
+    ).scalar()
+    if not stray:
+        connection.execute(create)
+        return
+
+    moving = f"{SCAN_RESULTS_TABLE}_moving"
+    connection.execute(text(f"CREATE TEMPORARY TABLE {moving} (LIKE {SCAN_RESULTS_TABLE}) ON COMMIT DROP"))
+    moved = connection.execute(
+        text(
+            f"WITH moved AS (DELETE FROM {DEFAULT_PARTITION} WHERE timestamp >= :start AND timestamp < :end RETURNING *) "
+            f"INSERT INTO {moving} SELECT * FROM moved"
+        ),
+        bounds,
+    ).rowcount
+    connection.execute(create)
+    connection.execute(text(f"INSERT INTO {SCAN_RESULTS_TABLE} SELECT * FROM {moving}"))
+    connection.execute(text(f"DROP TABLE {moving}"))
+    logger.warning(f"Moved {moved} rows of {day} from {DEFAULT_PARTITION} into {name}.")
+
+
+def ensure_partitions(connection: Connection, first_day: date, last_day: date) -> list[str]:
+    """
+    Create the missing daily partitions for first_day..last_day (inclusive).
+    Returns the names of created partitions.
+    """
+    existing = list_partitions(connection)
+    created = []
+    day = first_day
+    while day <= last_day:
+        if day not in existing:
+            _create_partition(connection, day)
+            created.append(partition_name(day))
+        day += timedelta(days=1)
+    return created
+
+
+def drop_expired_partitions(connection: Connection, retention_days: int, today: date) -> list[str]:
+    """
+    Drop every partition whose whole day is older than the retention window.
+    Dropping a partition removes its rows without DELETE and without vacuum work.
+    """
+    cutoff = today - timedelta(days=retention_days)
+    dropped = []
+    for day, name in sorted(list_partitions(connection).items()):
+        if day < cutoff:
+            connection.execute(text(f"DROP TABLE IF EXISTS {name}"))
+            dropped.append(name)
+    connection.execute(
+        text(f"DELETE FROM {DEFAULT_PARTITION} WHERE timestamp < :cutoff"), {"cutoff": _day_start(cutoff)}
+    )
+    return dropped
+
+
+def maintain_partitions(connection: Connection):
+    """
+    Pre-create upcoming partitions and drop the expired ones on an open connection.
+    The async monitor worker runs it through AsyncConnection.run_sync.
+    """
+    if not is_partitioned(connection):
+        return
+    ensure_default_partition(connection)
+    today = utc_today()
+    created = ensure_partitions(
+        connection,
+        today - timedelta(days=1),
+        today + timedelta(days=PARTITION_PRECREATE_DAYS),
+    )
+    dropped = drop_expired_partitions(connection, SCAN_RESULTS_RETENTION_DAYS, today) if SCAN_RESULTS_RETENTION_DAYS else []
+
+    if created:
+        logger.info(f"Created scan_results partitions: {', '.join(created)}")
+    if dropped:
+        logger.info(f"Dropped expired scan_results partitions: {', '.join(dropped)}")
+    stray = connection.execute(text(f"SELECT count(*) FROM {DEFAULT_PARTITION}")).scalar()
+    if stray:
+        logger.warning(
+            f"{stray} scan_results rows are in {DEFAULT_PARTITION}, outside the daily partitions "
+            f"(PARTITION_PRECREATE_DAYS={PARTITION_PRECREATE_DAYS})."
+        )
+
+
+def run_partition_maintenance(engine):
+    """
+    Partition maintenance in its own transaction, called on API start-up.
+    """
+    with engine.begin() as connection:
+        maintain_partitions(connection)
+
+
+def convert_to_partitioned(connection: Connection, table):
+    """
+    One-off migration of a plain scan_results table (created before partitioning)
+    into the partitioned layout. Every row is copied, retention only applies afterwards
+    and only when SCAN_RESULTS_RETENTION_DAYS is set.
+    """
+    legacy = f"{SCAN_RESULTS_TABLE}_legacy"
+    logger.info("Converting scan_results into a partitioned table...")
+
+    connection.execute(text(f"ALTER TABLE {SCAN_RESULTS_TABLE} RENAME TO {legacy}"))
+    # Index, constraint and sequence names must be freed for the new table
+    index_names = connection.execute(
+        text("SELECT indexname FROM pg_indexes WHERE tablename = :name"),
+        {"name": legacy},
+    ).scalars().all()
+    for index_name in index_names:
+        connection.execute(text(f"ALTER INDEX {index_name} RENAME TO {index_name}_legacy"))
+    connection.execute(text(f"ALTER SEQUENCE IF EXISTS {SCAN_RESULTS_TABLE}_id_seq RENAME TO {legacy}_id_seq"))
+
+    table.create(connection)
+    ensure_default_partition(connection)
+
+    today = utc_today()
+    oldest = connection.execute(text(f"SELECT min(timestamp) FROM {legacy}")).scalar()
+    first_day = oldest.astimezone(timezone.utc).date() if oldest else today - timedelta(days=1)
+    ensure_partitions(connection, min(first_day, today - timedelta(days=1)), today + timedelta(days=PARTITION_PRECREATE_DAYS))
+
+    # rows past the pre-created days (or without a timestamp) land in the default partition
+    columns = ", ".join(column.name for column in table.columns)
+    copied = connection.execute(
+        text(f"INSERT INTO {SCAN_RESULTS_TABLE} ({columns}) SELECT {columns} FROM {legacy}")
+    ).rowcount
+    logger.info(f"Copied {copied} scan_results rows into daily partitions.")
+    connection.execute(text(
+        f"SELECT setval(pg_get_serial_sequence('{SCAN_RESULTS_TABLE}', 'id'), "
+        f"(SELECT coalesce(max(id), 0) + 1 FROM {legacy}), false)"
+    ))
+    connection.execute(text(f"DROP TABLE {legacy}"))
+    logger.info("scan_results converted to daily partitions.")
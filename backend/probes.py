@@ -0,0 +1,235 @@
+import os
+import json
+import math
+import time
+import random
+import asyncio
+import ipaddress
+import logging
+from abc import ABC, abstractmethod
+from typing import AsyncIterator
+
+from hostmap import HostRange
+
+logger = logging.getLogger(__name__)
+
+# "icmp" - in-process asyncio ICMP engine, "subprocess" - one `ping` process per device,
+# "simulated" - SimulatedNetwork below, no packet leaves the machine (offline throughput tests)
+PROBE_BACKEND = os.getenv("PROBE_BACKEND", "icmp").lower()
+# JSON description of the simulated network, the built-in DEFAULT_PROFILE applies when unset
+SIMULATED_NETWORK_FILE = os.getenv("SIMULATED_NETWORK_FILE")
+
+
+class ProbeBackend(ABC):
+    """
+    Network access of the workers. worker.ping_device/probe_devices and
+    discovery_worker.is_host_reachable/sweep_chunk hand their work to the installed
+    backend, without one they use the host network (ICMP engine, ping, nmap).
+    """
+
+    @abstractmethod
+    async def ping(self, ip_address: str) -> tuple[bool, int | None]:
+        """
+        One echo request. Returns (is_online, response_time_ms).
+        """
+
+    async def probe_many(self, ip_addresses: list[str]) -> list[tuple[str, bool, int | None]]:
+        results = await asyncio.gather(*(self.ping(ip_address) for ip_address in ip_addresses))
+        return [(ip_address, is_online, rtt) for ip_address, (is_online, rtt) in zip(ip_addresses, results)]
+
+    @abstractmethod
+    def sweep(self, network: ipaddress.IPv4Network) -> AsyncIterator[str]:
+        """
+        Addresses of the network answering a ping scan, as nmap -sn reports them.
+        """
+
+
+class SubnetProfile:
+    """
+    Behaviour of the hosts of one subnet in a SimulatedNetwork.
+
+    host_share      - share of addresses with a live host (what discovery finds)
+    latency_ms      - median round trip time, log-normally distributed with sigma `jitter`
+    loss            - probability that a single probe gets no answer
+    flapping_share  - share of hosts going down for flap_down_share of every flap_period_seconds
+    blackhole       - nothing in the subnet ever answers
+    """
+
+    __slots__ = (
+        "network", "host_share", "latency_ms", "jitter", "loss",
+        "flapping_share", "flap_period_seconds", "flap_down_share", "blackhole",
+    )
+
+    def __init__(
+        self,
+        cidr: str = "0.0.0.0/0",
+        host_share: float = 1.0,
+        latency_ms: float = 2.0,
+        jitter: float = 0.5,
+        loss: float = 0.0,
+        flapping_share: float = 0.0,
+        flap_period_seconds: float = 600,
+        flap_down_share: float = 0.5,
+        blackhole: bool = False,
+    ):
+        self.network = ipaddress.IPv4Network(cidr, strict=False)
+        self.host_share = host_share
+        self.latency_ms = latency_ms
+        self.jitter = jitter
+        self.loss = loss
+        self.flapping_share = flapping_share
+        self.flap_period_seconds = flap_period_seconds
+        self.flap_down_share = flap_down_share
+        self.blackhole = blackhole
+
+
+# Used for every address not covered by a configured subnet
+DEFAULT_PROFILE = {"host_share": 0.9, "latency_ms": 2.0, "jitter": 0.5, "loss": 0.005, "flapping_share": 0.01}
+
+
+def _unit(value: int, salt: int) -> float:
+    """
+    Stable pseudo-random number in [0, 1) for an address, different for every salt.
+    """
+    x = (value ^ (salt * 0x9E3779B1)) & 0xFFFFFFFF
+    x = ((x >> 16) ^ x) * 0x45D9F3B & 0xFFFFFFFF
+    x = ((x >> 16) ^ x) * 0x45D9F3B & 0xFFFFFFFF
+    return ((x >> 16) ^ x) / 0x100000000
+
+
+class SimulatedNetwork(ProbeBackend):
+    """
+    Configurable in-memory network. Whether an address hosts a device and whether it flaps
+    is derived from a hash of the address, so every run sees the same hosts; loss and
+    latency are drawn per probe.
+
+    Delays are real (asyncio.sleep) and scaled by time_scale: 1 waits for every simulated
+    round trip and timeout, 0 measures only the workers' own overhead.
+    """
+
+    def __init__(
+        self,
+        subnets: list[SubnetProfile] | None = None,
+        default: SubnetProfile | None = None,
+        seed: int = 0,
+        timeout: float = 1.0,
+        time_scale: float = 1.0,
+        sweep_seconds_per_address: float = 0.0002,
+    ):
+        # most specific subnet first
+        self.subnets = sorted(subnets or [], key=lambda subnet: subnet.network.prefixlen, reverse=True)
+        self._ranges = [
+            (int(subnet.network.network_address), int(subnet.network.broadcast_address), subnet)
+            for subnet in self.subnets
+        ]
+        self.default = default or SubnetProfile(**DEFAULT_PROFILE)
+        self.seed = seed
+        self.timeout = timeout
+        self.time_scale = time_scale
+        self.sweep_seconds_per_address = sweep_seconds_per_address
+        self._random = random.Random(seed)
+
+    @classmethod
+    def from_config(cls, config: dict) -> "SimulatedNetwork":
+        return cls(
+            subnets=[SubnetProfile(**subnet) for subnet in config.get("subnets", [])],
+            default=SubnetProfile(**{**DEFAULT_PROFILE, **config.get("default", {})}),
+            seed=config.get("seed", 0),
+            timeout=config.get("timeout", 1.0),
+            time_scale=config.get("time_scale", 1.0),
+            sweep_seconds_per_address=config.get("sweep_seconds_per_address", 0.0002),
+        )
+
+    @classmethod
+    def from_file(cls, path: str) -> "SimulatedNetwork":
+        with open(path) as config_file:
+            return cls.from_config(json.load(config_file))
+
+    def _profile(self, value: int) -> SubnetProfile:
+        for first, last, subnet in self._ranges:
+            if first <= value <= last:
+                return subnet
+        return self.default
+
+    def _has_host(self, value: int, profile: SubnetProfile, now: float) -> bool:
+        if profile.blackhole or _unit(value, self.seed) >= profile.host_share:
+            return False
+        if _unit(value, self.seed + 1) < profile.flapping_share:
+            period = profile.flap_period_seconds
+            phase = _unit(value, self.seed + 2) * period
+            if (now + phase) % period < period * profile.flap_down_share:
+                return False
+        return True
+
+    def _answer(self, ip_address: str, now: float) -> int | None:
+        """
+        Response time of one probe in ms, None when it gets no answer.
+        """
+        try:
+            value = int(ipaddress.IPv4Address(ip_address))
+        except ValueError:
+            return None
+        profile = self._profile(value)
+        if not self._has_host(value, profile, now) or self._random.random() < profile.loss:
+            return None
+        rtt = self._random.lognormvariate(math.log(max(profile.latency_ms, 0.01)), profile.jitter)
+        return round(rtt) if rtt < self.timeout * 1000 else None
+
+    async def _wait(self, seconds: float):
+        if self.time_scale > 0:
+            await asyncio.sleep(seconds * self.time_scale)
+
+    async def ping(self, ip_address: str) -> tuple[bool, int | None]:
+        rtt = self._answer(ip_address, time.time())
+        await self._wait(rtt / 1000 if rtt is not None else self.timeout)
+        return rtt is not None, rtt
+
+    async def probe_many(self, ip_addresses: list[str]) -> list[tuple[str, bool, int | None]]:
+        # like the ICMP engine: all requests go out at once, the batch ends with the slowest answer or timeout
+        now = time.time()
+        rtts = [self._answer(ip_address, now) for ip_address in ip_addresses]
+        if rtts:
+            await self._wait(self.timeout if None in rtts else max(rtts) / 1000)
+        return [(ip_address, rtt is not None, rtt) for ip_address, rtt in zip(ip_addresses, rtts)]
+
+    async def sweep(self, network: ipaddress.IPv4Network) -> AsyncIterator[str]:
+        host_range = HostRange(network)
+        await self._wait(len(host_range) * self.sweep_seconds_per_address)
+        now = time.time()
+        for value in range(host_range.first, host_range.last + 1):
+            if self._has_host(value, self._profile(value), now):
+                yield str(ipaddress.IPv4Address(value))
+            if value & 0xFFF == 0:
+                # let the confirmation pings run while a large network is swept
+                await asyncio.sleep(0)
+
+
+_backend: ProbeBackend | None = None
+_backend_loaded = False
+
+
+def install_backend(backend: ProbeBackend | None):
+    """
+    Route the workers' probes through the given backend (None = host network).
+    """
+    global _backend, _backend_loaded
+    _backend = backend
+    _backend_loaded = True
+
+
+def get_backend() -> ProbeBackend | None:
+    """
+    Installed backend. PROBE_BACKEND=simulated installs a SimulatedNetwork on first use.
+    """
+    global _backend_loaded
+    if not _backend_loaded:
+        _backend_loaded = True
+        if PROBE_BACKEND == "simulated":
+            network = (
+                SimulatedNetwork.from_file(SIMULATED_NETWORK_FILE) if SIMULATED_NETWORK_FILE else SimulatedNetwork()
+            )
+            logger.warning(
+                f"Probing a simulated network ({SIMULATED_NETWORK_FILE or 'built-in profile'}), no packets are sent."
+            )
+            install_backend(network)
+    return _backend
@@ -0,0 +1,164 @@
+import os
+from bisect import bisect_left
+from datetime import datetime, timedelta, timezone
+from sqlalchemy.ext.asyncio import AsyncSession
+import models
+import crud
+
+# Upper bounds (ms) of the RTT histogram buckets, the last bucket collects everything slower
+RTT_BUCKET_BOUNDS = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000]
+HISTOGRAM_SIZE = len(RTT_BUCKET_BOUNDS) + 1
+
+ROLLUP_MODELS = {
+    "minute": models.AvailabilityMinute,
+    "hour": models.AvailabilityHour,
+    "day": models.AvailabilityDay,
+}
+ROLLUP_STEPS = {
+    "minute": timedelta(minutes=1),
+    "hour": timedelta(hours=1),
+    "day": timedelta(days=1),
+}
+
+# Minute and hour rollups are pruned, day rollups are kept
+ROLLUP_RETENTION_DAYS = {
+    "minute": int(os.getenv("ROLLUP_MINUTE_RETENTION_DAYS", "7")),
+    "hour": int(os.getenv("ROLLUP_HOUR_RETENTION_DAYS", "90")),
+}
+
+
+def truncate(timestamp: datetime, granularity: str) -> datetime:
+    timestamp = timestamp.astimezone(timezone.utc)
+    if granularity == "minute":
+        return timestamp.replace(second=0, microsecond=0)
+    if granularity == "hour":
+        return timestamp.replace(minute=0, second=0, microsecond=0)
+    return timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+
+
+def histogram_index(rtt_ms: int) -> int:
+    return bisect_left(RTT_BUCKET_BOUNDS, rtt_ms)
+
+
+def histogram_quantile(histogram: list[int], quantile: float) -> int | None:
+    """
+    Estimate an RTT quantile from a histogram (upper bound of the bucket holding the quantile).
+    """
+    total = sum(histogram)
+    if not total:
+        return None
+    rank = quantile * total
+    cumulative = 0
+    for index, count in enumerate(histogram):
+        cumulative += count
+        if cumulative >= rank:
+            return RTT_BUCKET_BOUNDS[min(index, len(RTT_BUCKET_BOUNDS) - 1)]
+    return RTT_BUCKET_BOUNDS[-1]
+
+
+def merge_histograms(histograms) -> list[int]:
+    merged = [0] * HISTOGRAM_SIZE
+    for histogram in histograms:
+        for index, count in enumerate(histogram or ()):
+            if index < HISTOGRAM_SIZE:
+                merged[index] += count
+    return merged
+
+
+class RollupAccumulator:
+    """
+    Collects probe results in memory and flushes them as additive upserts into
+    the minute, hour and day rollup tables. Several workers (shards) can flush
+    into the same buckets because every update is a sum / min / max merge.
+    """
+
+    def __init__(self):
+        # granularity -> (device_id, bucket_start) -> aggregate row
+        self.pending: dict[str, dict[tuple[int, datetime], dict]] = {name: {} for name in ROLLUP_MODELS}
+
+    def __len__(self):
+        return len(self.pending["minute"])
+
+    def _row(self, granularity: str, device_id: int, bucket_start: datetime) -> dict:
+        buckets = self.pending[granularity]
+        row = buckets.get((device_id, bucket_start))
+        if row is None:
+            row = {
+                "device_id": device_id,
+                "bucket_start": bucket_start,
+                "samples": 0,
+                "up_count": 0,
+                "rtt_count": 0,
+                "rtt_sum": 0,
+                "rtt_min": None,
+                "rtt_max": None,
+                "rtt_histogram": [0] * HISTOGRAM_SIZE,
+            }
+            buckets[(device_id, bucket_start)] = row
+        return row
+
+    def add(self, device_id: int, timestamp: datetime, is_online: bool, rtt_ms: int | None):
+        for granularity in self.pending:
+            row = self._row(granularity, device_id, truncate(timestamp, granularity))
+            row["samples"] += 1
+            if is_online:
+                row["up_count"] += 1
+            if rtt_ms is not None:
+                row["rtt_count"] += 1
+                row["rtt_sum"] += rtt_ms
+                row["rtt_min"] = rtt_ms if row["rtt_min"] is None else min(row["rtt_min"], rtt_ms)
+                row["rtt_max"] = rtt_ms if row["rtt_max"] is None else max(row["rtt_max"], rtt_ms)
+                row["rtt_histogram"][histogram_index(rtt_ms)] += 1
+
+    def _merge_back(self, unwritten: dict[str, dict[tuple[int, datetime], dict]]):
+        # rows of a failed flush are added to whatever was collected meanwhile
+        for granularity, buckets in unwritten.items():
+            for (device_id, bucket_start), old in buckets.items():
+                row = self._row(granularity, device_id, bucket_start)
+                row["samples"] += old["samples"]
+                row["up_count"] += old["up_count"]
+                row["rtt_count"] += old["rtt_count"]
+                row["rtt_sum"] += old["rtt_sum"]
+                row["rtt_min"] = min(filter(lambda value: value is not None, (row["rtt_min"], old["rtt_min"])), default=None)
+                row["rtt_max"] = max(filter(lambda value: value is not None, (row["rtt_max"], old["rtt_max"])), default=None)
+                row["rtt_histogram"] = merge_histograms((row["rtt_histogram"], old["rtt_histogram"]))
+
+    async def flush(self, db: AsyncSession) -> int:
+        """
+        Upsert everything collected since the last flush. Returns the number of upserted rows.
+        Results added by concurrent batches while the flush awaits go into a fresh buffer,
+        a failed flush puts its rows back and re-raises.
+        """
+        pending = self.pending
+        self.pending = {name: {} for name in ROLLUP_MODELS}
+        written = 0
+        try:
+            for granularity, buckets in pending.items():
+                if buckets:
+                    written += await crud.upsert_availability_rollups(
+                        db, ROLLUP_MODELS[granularity], list(buckets.values())
+                    )
+            await db.commit()
+        except BaseException:
+            self._merge_back(pending)
+            raise
+        return written
+
+
+async def prune_rollups(db: AsyncSession, now: datetime):
+    for granularity, retention_days in ROLLUP_RETENTION_DAYS.items():
+        await crud.delete_availability_rollups_before(db, ROLLUP_MODELS[granularity], now - timedelta(days=retention_days))
+    await db.commit()
+
+
+def pick_granularity(start: datetime, end: datetime, now: datetime) -> str:
+    """
+    Coarsest rollup that still gives a useful number of points for the range
+    and whose retention covers its start.
+    """
+    span = end - start
+    if span > timedelta(days=7) or start < now - timedelta(days=ROLLUP_RETENTION_DAYS["hour"]):
+        return "day"
+    if span > timedelta(hours=6) or start < now - timedelta(days=ROLLUP_RETENTION_DAYS["minute"]):
+        return "hour"
+    return "minute"
@@ -0,0 +1,149 @@
+import heapq
+import itertools
+import random
+
+
+class DeviceSchedule:
+    """
+    Scheduling state of a single monitored device.
+    """
+
+    __slots__ = (
+        "device_id", "name", "ip_address", "interval", "due",
+        "is_online", "consecutive_failures", "queued", "generation",
+    )
+
+    def __init__(self, device_id: int, name: str, ip_address: str, interval: int):
+        self.device_id = device_id
+        self.name = name
+        self.ip_address = ip_address
+        self.interval = interval
+        self.due = 0.0
+        # None until the first probe result is known
+        self.is_online: bool | None = None
+        self.consecutive_failures = 0
+        # True while the device has an entry in the heap (False while its probe is in flight)
+        self.queued = False
+        self.generation = 0
+
+
+class ProbeScheduler:
+    """
+    Heap-based probe scheduler keeping a due time for every device.
+
+    - new devices get a random start offset within their interval, so probes are
+      spread evenly instead of firing in one burst,
+    - a state change (online <-> offline) triggers a fast re-check,
+    - hosts that stay offline are backed off exponentially up to max_backoff,
+    - every interval is jittered to keep devices from re-synchronising.
+    """
+
+    def __init__(
+        self,
+        recheck_interval: int = 10,
+        backoff_after: int = 5,
+        max_backoff: int = 900,
+        jitter: float = 0.1,
+    ):
+        self.recheck_interval = recheck_interval
+        self.backoff_after = backoff_after
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.devices: dict[int, DeviceSchedule] = {}
+        self._heap: list[tuple[float, int, int, int]] = []
+        self._counter = itertools.count()
+
+    def __len__(self):
+        return len(self.devices)
+
+    def _push(self, entry: DeviceSchedule, due: float):
+        entry.generation += 1
+        entry.due = due
+        entry.queued = True
+        heapq.heappush(self._heap, (due, next(self._counter), entry.device_id, entry.generation))
+
+    def _jittered(self, interval: float) -> float:
+        return interval * random.uniform(1 - self.jitter, 1 + self.jitter)
+
+    def sync(self, devices: list[tuple[int, str, str, int]], now: float):
+        """
+        Reconcile the schedule with the current inventory.
+        devices - list of tuples (device_id, name, ip_address, interval_seconds).
+        """
+        seen = set()
+        for device_id, name, ip_address, interval in devices:
+            seen.add(device_id)
+            entry = self.devices.get(device_id)
+            if entry is None:
+                entry = DeviceSchedule(device_id, name, ip_address, interval)
+                self.devices[device_id] = entry
+                self._push(entry, now + random.uniform(0, interval))
+                continue
+
+            entry.name = name
+            entry.ip_address = ip_address
+            if interval != entry.interval:
+                entry.interval = interval
+                # Pull the next probe in when the interval was shortened
+                if entry.queued and entry.due > now + interval:
+                    self._push(entry, now + random.uniform(0, interval))
+
+        # Heap entries of removed devices are skipped lazily in pop_due
+        for device_id in self.devices.keys() - seen:
+            del self.devices[device_id]
+
+    def next_due(self) -> float | None:
+        while self._heap:
+            _, _, device_id, generation = self._heap[0]
+            entry = self.devices.get(device_id)
+            if entry is not None and entry.generation == generation and entry.queued:
+                return self._heap[0][0]
+            heapq.heappop(self._heap)
+        return None
+
+    def pop_due(self, now: float) -> list[DeviceSchedule]:
+        """
+        Remove and return every device whose probe is due. The devices stay out of
+        the heap until their result is passed to record().
+        """
+        due = []
+        while self._heap and self._heap[0][0] <= now:
+            _, _, device_id, generation = heapq.heappop(self._heap)
+            entry = self.devices.get(device_id)
+            if entry is None or entry.generation != generation or not entry.queued:
+                continue
+            entry.queued = False
+            due.append(entry)
+        return due
+
+    def reschedule(self, device_id: int, now: float):
+        """
+        Put a device whose probe could not be completed back on its regular interval.
+        """
+        entry = self.devices.get(device_id)
+        if entry is not None and not entry.queued:
+            self._push(entry, now + self._jittered(entry.interval))
+
+    def record(self, device_id: int, is_online: bool, now: float) -> bool:
+        """
+        Store a probe result and schedule the next probe of the device.
+        Returns True when the device changed state.
+        """
+        entry = self.devices.get(device_id)
+        if entry is None:
+            return False
+
+        changed = entry.is_online is not None and entry.is_online != is_online
+        entry.is_online = is_online
+        entry.consecutive_failures = 0 if is_online else entry.consecutive_failures + 1
+
+        if changed:
+            interval = min(self.recheck_interval, entry.interval)
+        elif entry.consecutive_failures > self.backoff_after:
+            exponent = entry.consecutive_failures - self.backoff_after
+            interval = min(entry.interval * 2 ** min(exponent, 16), max(self.max_backoff, entry.interval))
+        else:
+            interval = entry.interval
+
+        self._push(entry, now + self._jittered(interval))
+        return changed
@@ -46,6 +46,7 @@ class DiscoveredHostBase(BaseModel):
     status: str
     proposed_name: Optional[str] = None
     discovered_at: datetime
+    last_seen: Optional[datetime] = None
 
 
 class DiscoveredHost(DiscoveredHostBase):
@@ -62,9 +63,40 @@ class DiscoveredHostAccept(BaseModel):
     device_type_id: int
 
 
+class DiscoveredHostSelection(BaseModel):
+    # explicit host ids, or a filter by network and/or address range ("10.0.4.0/22" or "10.0.4.10-10.0.4.99")
+    host_ids: Optional[List[int]] = None
+    network_id: Optional[int] = None
+    ip_range: Optional[str] = None
+
+
+class DiscoveredHostBulkAccept(DiscoveredHostSelection):
+    location_id: int
+    device_type_id: int
+    # device name of hosts without a proposed name: name_prefix + IP address
+    name_prefix: str = "host-"
+
+
+class DiscoveredHostOutcome(BaseModel):
+    host_id: int
+    ip_address: Optional[str] = None
+    outcome: Literal["added", "skipped", "duplicate", "already_processed", "not_found"]
+    device_id: Optional[int] = None
+
+
+class DiscoveredHostBulkResult(BaseModel):
+    processed: int
+    results: List[DiscoveredHostOutcome]
+
+
 class DeviceTypeBase(BaseModel):
     name: str
     icon_name: Optional[str] = None
+    probe_interval_seconds: Optional[int] = None
+
+
+class DeviceTypeUpdate(BaseModel):
+    probe_interval_seconds: Optional[int] = None
 
 
 class DeviceType(DeviceTypeBase):
@@ -84,6 +116,19 @@ class ScanResult(ScanResultBase):
     id: int
     timestamp: datetime
     device_id: int
+    record_type: str = "sample"
+    state_duration_seconds: Optional[int] = None
+
+    class Config:
+        from_attributes = True
+
+
+class DeviceStatus(BaseModel):
+    is_online: bool
+    last_change_at: datetime
+    last_checked_at: datetime
+    last_response_time_ms: Optional[int] = None
+    consecutive_failures: int = 0
 
     class Config:
         from_attributes = True
@@ -95,6 +140,7 @@ class DeviceCreate(BaseModel):
     mac_address: Optional[str] = None
     location_id: int
     device_type_id: int
+    probe_interval_seconds: Optional[int] = None
 
 
 class Device(BaseModel):
@@ -104,16 +150,54 @@ class Device(BaseModel):
     mac_address: Optional[str] = None
     location_id: int
     device_type_id: int
+    probe_interval_seconds: Optional[int] = None
 
     location: Optional[Location] = None
     device_type: Optional[DeviceType] = None
 
-    scan_results: List[ScanResult] = []
+    status: Optional[DeviceStatus] = None
 
     class Config:
         from_attributes = True
 
 
+class DeviceImportError(BaseModel):
+    line: int
+    ip_address: Optional[str] = None
+    error: str
+
+
+class DeviceImportResult(BaseModel):
+    processed: int = 0
+    created: int = 0
+    errors: List[DeviceImportError] = []
+
+
+class AvailabilityBucket(BaseModel):
+    bucket_start: datetime
+    samples: int
+    up_count: int
+    uptime_percent: Optional[float] = None
+    rtt_min: Optional[int] = None
+    rtt_avg: Optional[float] = None
+    rtt_max: Optional[int] = None
+
+
+class DeviceAvailability(BaseModel):
+    device_id: int
+    bucket: Literal["minute", "hour", "day"]
+    start: datetime
+    end: datetime
+    samples: int
+    up_count: int
+    uptime_percent: Optional[float] = None
+    rtt_avg: Optional[float] = None
+    rtt_p50: Optional[int] = None
+    rtt_p95: Optional[int] = None
+    rtt_p99: Optional[int] = None
+    buckets: List[AvailabilityBucket] = []
+
+
 class DevicePublic(BaseModel):
     name: str
     ip_address: str
@@ -73,6 +73,17 @@ def seed_data():
             )
             db.add(log)
 
+            # Latest scan (i == 0) becomes the current device status
+            if i == 0:
+                db.add(models.DeviceStatus(
+                    device_id=dev.id,
+                    is_online=is_online,
+                    last_change_at=log.timestamp,
+                    last_checked_at=log.timestamp,
+                    last_response_time_ms=log.response_time_ms,
+                    consecutive_failures=0 if is_online else 1,
+                ))
+
     db.commit()
     db.close()
     print("Success: Database seeded!")
@@ -0,0 +1,172 @@
+import csv
+import io
+import json
+from collections import deque
+from datetime import datetime
+from typing import AsyncIterator, Iterable
+
+# Formats accepted by the bulk import/export endpoints
+STREAM_FORMATS = ("csv", "ndjson")
+MEDIA_TYPES = {"csv": "text/csv", "ndjson": "application/x-ndjson"}
+
+
+def format_from_content_type(content_type: str | None, default: str = "csv") -> str:
+    content_type = (content_type or "").lower()
+    if "ndjson" in content_type or "jsonl" in content_type or "json" in content_type:
+        return "ndjson"
+    if "csv" in content_type:
+        return "csv"
+    return default
+
+
+async def iter_lines(chunks: AsyncIterator[bytes]) -> AsyncIterator[bytes]:
+    """
+    Split a streamed request body into lines, line break included, without buffering the whole body.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            yield line + b"\n"
+    if buffer:
+        yield buffer
+
+
+def _decode(line: bytes) -> tuple[str, str | None]:
+    """
+    Decode one line, returns (text, error). Invalid UTF-8 is replaced and reported.
+    """
+    try:
+        return line.decode("utf-8-sig"), None
+    except UnicodeDecodeError as exc:
+        return line.decode("utf-8-sig", errors="replace"), f"Invalid UTF-8: {exc}"
+
+
+class _LineFeed:
+    """
+    Lines handed to a csv.reader one record at a time; the reader keeps its line count across records.
+    """
+
+    def __init__(self):
+        self.lines = deque()
+
+    def __iter__(self):
+        return self
+
+    def __next__(self) -> str:
+        if not self.lines:
+            raise StopIteration
+        return self.lines.popleft()
+
+
+async def _iter_ndjson(lines: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    line_number = 0
+    async for raw_line in lines:
+        line_number += 1
+        line, error = _decode(raw_line)
+        if error:
+            yield line_number, None, error
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as exc:
+            yield line_number, None, f"Invalid JSON: {exc}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+class _CsvRecords:
+    """
+    One csv.reader over the whole body, so a quoted field may span lines and line numbers
+    come from reader.line_num. Lines are handed to the reader once the quote characters of
+    the pending record are balanced, so the reader never waits for input that has not arrived.
+    """
+
+    def __init__(self):
+        self.feed = _LineFeed()
+        self.reader = csv.reader(self.feed)
+        self.header = None
+        self.quotes = 0
+        self.size = 0
+        self.error = None
+
+    def add(self, raw_line: bytes) -> list[tuple[int, dict | None, str | None]]:
+        line, error = _decode(raw_line)
+        self.error = self.error or error
+        self.feed.lines.append(line)
+        self.quotes += line.count('"')
+        self.size += len(line)
+        # an unbalanced quote must not buffer the rest of the body, the reader reports the oversized field
+        if self.quotes % 2 and self.size <= csv.field_size_limit():
+            return []
+        return self.flush()
+
+    def flush(self) -> list[tuple[int, dict | None, str | None]]:
+        records = []
+        while self.feed.lines:
+            line_number = self.reader.line_num + 1
+            try:
+                values = next(self.reader)
+            except csv.Error as exc:
+                self.feed.lines.clear()
+                records.append((line_number, None, f"Invalid CSV: {exc}"))
+                break
+            if self.error:
+                records.append((line_number, None, self.error))
+                self.error = None
+            elif not "".join(values).strip():
+                continue
+            elif self.header is None:
+                self.header = [name.strip() for name in values]
+            elif len(values) != len(self.header):
+                records.append((line_number, None, f"Expected {len(self.header)} columns, got {len(values)}"))
+            else:
+                # Empty CSV fields mean "not set"
+                records.append((
+                    line_number, {name: (value if value != "" else None) for name, value in zip(self.header, values)}, None
+                ))
+        self.quotes = self.size = 0
+        return records
+
+
+async def _iter_csv(lines: AsyncIterator[bytes]) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    records = _CsvRecords()
+    async for raw_line in lines:
+        for record in records.add(raw_line):
+            yield record
+    # a quote left open at the end of the body
+    for record in records.flush():
+        yield record
+
+
+def iter_records(lines: AsyncIterator[bytes], fmt: str) -> AsyncIterator[tuple[int, dict | None, str | None]]:
+    """
+    Parse the records of a streamed body. Yields (line number, record, error) - record is None
+    when it could not be parsed. NDJSON has one record per line; CSV starts with a header line and
+    quoted fields may contain line breaks (the record is reported at its first line). Blank lines are skipped.
+    """
+    return _iter_ndjson(lines) if fmt == "ndjson" else _iter_csv(lines)
+
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def encode_ndjson(row: dict) -> str:
+    return json.dumps(row, default=_json_default) + "\n"
+
+
+def encode_csv(values: Iterable) -> str:
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(
+        value.isoformat() if isinstance(value, datetime) else value for value in values
+    )
+    return buffer.getvalue()
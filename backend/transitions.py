@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+
+
+def format_duration(seconds: int) -> str:
+    minutes, seconds = divmod(seconds, 60)
+    hours, minutes = divmod(minutes, 60)
+    days, hours = divmod(hours, 24)
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    if minutes:
+        return f"{minutes}m {seconds}s"
+    return f"{seconds}s"
+
+
+def _status_text(is_online: bool) -> str:
+    return "ONLINE" if is_online else "OFFLINE"
+
+
+class TransitionTracker:
+    """
+    Keeps the last known state of every device in memory and reduces a stream of
+    probe samples to the rows worth persisting in transition storage mode:
+
+    - "transition" - the device changed state (state_duration_seconds = how long the previous state lasted),
+    - "heartbeat" - the state did not change for heartbeat_interval
+      (state_duration_seconds = how long the current state has lasted so far).
+    """
+
+    def __init__(self, heartbeat_interval: timedelta):
+        self.heartbeat_interval = heartbeat_interval
+        # device_id -> [is_online, state started at, last persisted record at]
+        self.states: dict[int, list] = {}
+
+    def seed(self, latest_rows):
+        """
+        Restore state from the latest stored record of each device.
+        latest_rows - iterable of (device_id, status, timestamp, record_type, state_duration_seconds).
+        """
+        for device_id, status, timestamp, record_type, state_duration_seconds in latest_rows:
+            since = timestamp
+            if record_type == "heartbeat" and state_duration_seconds is not None:
+                since = timestamp - timedelta(seconds=state_duration_seconds)
+            self.states[device_id] = [status, since, timestamp]
+
+    def filter(self, rows: list[dict]) -> list[dict]:
+        """
+        Return the rows that have to be stored, annotated with record type,
+        state duration and a log message. Rows hold at most one sample per device.
+        The tracked states do not change until the stored rows are passed to commit(),
+        so a sample whose row could not be written is compared with the old state again.
+        """
+        persisted = []
+        for row in rows:
+            device_id = row["device_id"]
+            is_online = row["status"]
+            timestamp: datetime = row["timestamp"]
+            state = self.states.get(device_id)
+
+            if state is None:
+                persisted.append({
+                    **row,
+                    "record_type": "transition",
+                    "state_duration_seconds": None,
+                    "log_message": f"Monitoring started: {_status_text(is_online)}",
+                })
+                continue
+
+            was_online, since, last_persisted = state
+            duration = max(0, int((timestamp - since).total_seconds()))
+
+            if is_online != was_online:
+                persisted.append({
+                    **row,
+                    "record_type": "transition",
+                    "state_duration_seconds": duration,
+                    "log_message": (
+                        f"{_status_text(was_online)} -> {_status_text(is_online)} "
+                        f"after {format_duration(duration)}"
+                    ),
+                })
+            elif timestamp - last_persisted >= self.heartbeat_interval:
+                persisted.append({
+                    **row,
+                    "record_type": "heartbeat",
+                    "state_duration_seconds": duration,
+                    "log_message": f"Still {_status_text(is_online)} for {format_duration(duration)}",
+                })
+
+        return persisted
+
+    def commit(self, rows: list[dict]):
+        """
+        Advance the tracked states with rows returned by filter() once they are written.
+        """
+        for row in rows:
+            state = self.states.get(row["device_id"])
+            if row["record_type"] == "heartbeat" and state is not None:
+                state[2] = row["timestamp"]
+            else:
+                self.states[row["device_id"]] = [row["status"], row["timestamp"], row["timestamp"]]
+
+    def forget(self, device_ids):
+        for device_id in device_ids:
+            self.states.pop(device_id, None)
@@ -1,10 +1,22 @@
+import os
+import re
 import logging
 import platform
 import asyncio
-import subprocess
-from datetime import datetime
-from database import SessionLocal
-import models
+import time
+import queue
+import multiprocessing
+from datetime import datetime, timedelta
+from database import AsyncSessionLocal, async_engine
+from icmp import IcmpEngine
+from probes import PROBE_BACKEND, get_backend
+from scheduler import DeviceSchedule, ProbeScheduler
+from transitions import TransitionTracker
+from rollups import RollupAccumulator, prune_rollups
+import partitions
+import crud
+import metrics
+import events
 
 # Logging configuration - outputs logs to the console
 logging.basicConfig(
@@ -16,12 +28,51 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+PROBE_TIMEOUT_SECONDS = float(os.getenv("PROBE_TIMEOUT_SECONDS", "1"))
+# Echo requests per second sent by the ICMP engine (0 = unlimited)
+ICMP_SEND_RATE = int(os.getenv("ICMP_SEND_RATE", "0"))
+# Default probe interval, overridden per device type and per device
+SCAN_INTERVAL_SECONDS = int(os.getenv("SCAN_INTERVAL_SECONDS", "60"))
+# Re-check delay right after a device changed state
+RECHECK_INTERVAL_SECONDS = int(os.getenv("RECHECK_INTERVAL_SECONDS", "10"))
+# Consecutive failures after which the probe interval of an offline device starts doubling
+BACKOFF_AFTER_FAILURES = int(os.getenv("BACKOFF_AFTER_FAILURES", "5"))
+MAX_BACKOFF_SECONDS = int(os.getenv("MAX_BACKOFF_SECONDS", "900"))
+DEVICE_REFRESH_SECONDS = int(os.getenv("DEVICE_REFRESH_SECONDS", "30"))
+SCHEDULER_TICK_SECONDS = float(os.getenv("SCHEDULER_TICK_SECONDS", "1"))
+STATS_INTERVAL_SECONDS = int(os.getenv("STATS_INTERVAL_SECONDS", "60"))
+# Partition pre-creation and retention of scan_results (run by shard 0 only)
+PARTITION_MAINTENANCE_SECONDS = int(os.getenv("PARTITION_MAINTENANCE_SECONDS", "3600"))
+# How often collected probe results are merged into the availability rollups
+ROLLUP_FLUSH_SECONDS = int(os.getenv("ROLLUP_FLUSH_SECONDS", "10"))
+# Number of child processes (shards) started by the worker, 1 = single process mode
+WORKER_PROCESSES = int(os.getenv("WORKER_PROCESSES", "1"))
+# "copy" - PostgreSQL COPY, "insert" - chunked multi-row INSERT (chunks capped at crud.MAX_INSERT_CHUNK_SIZE rows)
+SCAN_WRITE_METHOD = os.getenv("SCAN_WRITE_METHOD", "copy").lower()
+SCAN_WRITE_CHUNK_SIZE = int(os.getenv("SCAN_WRITE_CHUNK_SIZE", "5000"))
+# "full" - store every probe, "transitions" - store only state changes and periodic heartbeats
+SCAN_STORAGE_MODE = os.getenv("SCAN_STORAGE_MODE", "full").lower()
+HEARTBEAT_INTERVAL_SECONDS = int(os.getenv("HEARTBEAT_INTERVAL_SECONDS", "3600"))
+# Prometheus metrics port, shard N listens on MONITOR_METRICS_PORT + N (0 = disabled)
+METRICS_PORT = int(os.getenv("MONITOR_METRICS_PORT", "9101"))
 
-async def ping_device(ip_address: str) -> tuple[str, bool]:
+PING_TIME_PATTERN = re.compile(r"time[=<]\s*([\d.]+)\s*ms")
+
+_icmp_engine: IcmpEngine | None = None
+_icmp_unavailable = False
+
+
+async def ping_device(ip_address: str) -> tuple[str, bool, int | None]:
     """
     Pings an IP address asynchronously using a system subprocess.
-    Returns a tuple (ip, status).
+    Fallback backend used when the ICMP engine cannot open its socket.
+    Returns a tuple (ip, status, response_time_ms).
     """
+    backend = get_backend()
+    if backend is not None:
+        is_online, response_time_ms = await backend.ping(ip_address)
+        return ip_address, is_online, response_time_ms
+
     # Parameter for the number of attempts (-n for Windows, -c for Linux)
     param = '-n' if platform.system().lower() == 'windows' else '-c'
 
@@ -29,79 +80,370 @@ async def ping_device(ip_address: str) -> tuple[str, bool]:
         # Creating a subprocess for asynchronous pinging
         proc = await asyncio.create_subprocess_exec(
             'ping', param, '1', ip_address,
-            stdout=asyncio.subprocess.DEVNULL,
+            stdout=asyncio.subprocess.PIPE,
             stderr=asyncio.subprocess.DEVNULL
         )
 
-        return_code = await proc.wait()
-        is_online = (return_code == 0)
-        return ip_address, is_online
+        stdout, _ = await proc.communicate()
+        is_online = (proc.returncode == 0)
+        match = PING_TIME_PATTERN.search(stdout.decode(errors="ignore")) if is_online else None
+        response_time_ms = round(float(match.group(1))) if match else None
+        return ip_address, is_online, response_time_ms
     except Exception as e:
         logger.error(f"Ping failed for {ip_address}: {e}")
-        return ip_address, False
+        return ip_address, False, None
 
 
-async def run_scan_cycle():
+def get_icmp_engine() -> IcmpEngine | None:
     """
-    Main function executing one full network scan cycle.
+    Lazily open the shared ICMP engine. Returns None (subprocess fallback) when
+    the ICMP backend is disabled or the socket cannot be opened.
     """
-    logger.info("--- STARTING ASYNC NETWORK SCAN ---")
+    global _icmp_engine, _icmp_unavailable
 
-    devices = []
-    device_map = {}
+    if PROBE_BACKEND != "icmp" or _icmp_unavailable:
+        return None
+    if _icmp_engine is None:
+        engine = IcmpEngine(timeout=PROBE_TIMEOUT_SECONDS, send_rate=ICMP_SEND_RATE)
+        try:
+            engine.open()
+        except OSError as e:
+            logger.warning(f"ICMP socket unavailable ({e}). Falling back to ping subprocesses.")
+            _icmp_unavailable = True
+            return None
+        _icmp_engine = engine
+    return _icmp_engine
 
-    # Fetch devices from the database
-    with SessionLocal() as db:
-        devices = db.query(models.Device).all()
-        # Mapping objects to a dictionary for easier access by IP
-        device_map = {d.ip_address: d for d in devices}
 
-    if not devices:
-        logger.warning("No devices found in the database. Waiting for devices...")
-        return
+async def probe_devices(ip_addresses: list[str]) -> list[tuple[str, bool, int | None]]:
+    """
+    Probe a batch of addresses with the configured backend.
+    Returns a list of tuples (ip, status, response_time_ms).
+    """
+    backend = get_backend()
+    if backend is not None:
+        return await backend.probe_many(ip_addresses)
 
-    # Concurrent execution of pings (async)
-    tasks = [ping_device(device.ip_address) for device in devices]
-    results = await asyncio.gather(*tasks)
+    engine = get_icmp_engine()
+    if engine is None:
+        return await asyncio.gather(*(ping_device(ip) for ip in ip_addresses))
+
+    rtts = await engine.probe_many(ip_addresses)
+    return [
+        (ip, rtts[ip] is not None, round(rtts[ip]) if rtts[ip] is not None else None)
+        for ip in ip_addresses
+    ]
+
+
+async def run_scan_cycle(
+    entries: list[DeviceSchedule],
+    tracker: TransitionTracker | None = None,
+    rollup: RollupAccumulator | None = None,
+) -> tuple[list[tuple[str, bool, int | None]], dict]:
+    """
+    Probe one batch of due devices and save the results.
+    With a tracker (transition storage mode) only state changes and heartbeats are saved.
+    Every result (stored or not) is added to the rollup accumulator.
+    Returns the probe results (in the order of entries) and statistics of the batch.
+    """
+    stats = {"probes": len(entries), "online": 0, "rows_written": 0, "write_seconds": 0.0}
+
+    # All due probes are sent as one batch
+    results = await probe_devices([entry.ip_address for entry in entries])
 
     # Saving results to the database
-    with SessionLocal() as db:
+    rows = []
+    timestamp = datetime.now().astimezone()
+    for entry, (ip, is_online, response_time_ms) in zip(entries, results):
+        if is_online:
+            stats["online"] += 1
+        if rollup is not None:
+            rollup.add(entry.device_id, timestamp, is_online, response_time_ms)
+        rows.append({
+            "device_id": entry.device_id,
+            "status": is_online,
+            "response_time_ms": response_time_ms,
+            "log_message": None,
+            "timestamp": timestamp,
+            "record_type": "sample",
+            "state_duration_seconds": None,
+        })
+    if tracker is not None:
+        rows = tracker.filter(rows)
+
+    status_rows = [
+        {"device_id": entry.device_id, "is_online": is_online, "checked_at": timestamp, "response_time_ms": response_time_ms}
+        for entry, (_, is_online, response_time_ms) in zip(entries, results)
+    ]
+
+    # entry.is_online still holds the previous result, the scheduler is updated after the batch
+    transition_events = [
+        {
+            "type": "device_status",
+            "device_id": entry.device_id,
+            "device_name": entry.name,
+            "ip_address": ip,
+            "is_online": is_online,
+            "response_time_ms": response_time_ms,
+            "timestamp": timestamp,
+        }
+        for entry, (ip, is_online, response_time_ms) in zip(entries, results)
+        if entry.is_online is not None and entry.is_online != is_online
+    ]
+
+    write_started = time.perf_counter()
+    async with AsyncSessionLocal() as db:
         try:
-            for ip, is_online in results:
-                device = device_map.get(ip)
-                status_text = "ONLINE" if is_online else "OFFLINE"
+            stats["rows_written"] = await crud.bulk_insert_scan_results(
+                db, rows, chunk_size=SCAN_WRITE_CHUNK_SIZE, method=SCAN_WRITE_METHOD
+            )
+            if tracker is not None:
+                tracker.commit(rows)
+        except crud.ScanWriteError as e:
+            await db.rollback()
+            stats["rows_written"] = e.written
+            if tracker is not None:
+                tracker.commit(rows[: e.written])
+            logger.error(f"Error saving scan results: {e}")
+        try:
+            await crud.upsert_device_statuses(db, status_rows)
+            await events.notify(db, transition_events)
+            await db.commit()
+        except Exception as e:
+            await db.rollback()
+            logger.error(f"Error saving device status: {e}")
+    stats["write_seconds"] = time.perf_counter() - write_started
 
+    metrics.PROBES.labels("online").inc(stats["online"])
+    metrics.PROBES.labels("offline").inc(stats["probes"] - stats["online"])
+    metrics.ROWS_WRITTEN.inc(stats["rows_written"])
+    metrics.ROWS_PER_BATCH.observe(stats["rows_written"])
+    metrics.WRITE_DURATION.observe(stats["write_seconds"])
+    return results, stats
 
-                if is_online:
-                    logger.info(f"Device {device.name} ({ip}) is {status_text}")
-                else:
-                    logger.warning(f"Device {device.name} ({ip}) is {status_text}")
 
-                scan_result = models.ScanResult(
-                    device_id=device.id,
-                    status=is_online,
-                    timestamp=datetime.now()
-                )
-                db.add(scan_result)
+def new_window_stats(shard_index: int) -> dict:
+    return {
+        "shard": shard_index,
+        "devices": 0,
+        "online": 0,
+        "probes": 0,
+        "rows_written": 0,
+        "write_seconds": 0.0,
+        "rows_per_second": 0.0,
+        "max_lag": 0.0,
+        "duration": 0.0,
+    }
 
-            db.commit()
-            logger.info("--- SCAN COMPLETED AND SAVED ---")
-        except Exception as e:
-            db.rollback()
-            logger.error(f"Error saving scan results: {e}")
 
+async def probe_batch(
+    batch: list[DeviceSchedule],
+    scheduler: ProbeScheduler,
+    window: dict,
+    tracker: TransitionTracker | None = None,
+    rollup: RollupAccumulator | None = None,
+):
+    """
+    Run one batch and feed its results back into the scheduler.
+    """
+    started = time.perf_counter()
+    try:
+        results, stats = await run_scan_cycle(batch, tracker, rollup)
+    except Exception as e:
+        logger.error(f"Probe batch of {len(batch)} devices failed: {e}")
+        now = time.monotonic()
+        for entry in batch:
+            scheduler.reschedule(entry.device_id, now)
+        return
+
+    now = time.monotonic()
+    for entry, (ip, is_online, _) in zip(batch, results):
+        if scheduler.record(entry.device_id, is_online, now):
+            if is_online:
+                logger.info(f"Device {entry.name} ({ip}) is ONLINE")
+            else:
+                logger.warning(f"Device {entry.name} ({ip}) is OFFLINE")
+
+    metrics.PROBE_BATCH_DURATION.observe(time.perf_counter() - started)
+    metrics.PROBE_BATCH_SIZE.observe(len(batch))
+    window["probes"] += stats["probes"]
+    window["rows_written"] += stats["rows_written"]
+    window["write_seconds"] += stats["write_seconds"]
 
-async def main():
-    logger.info("Worker started. Running scan every 60 seconds.")
+
+async def main(shard_index: int = 0, shard_count: int = 1, stats_queue=None):
+    logger.info(f"Worker started. Default probe interval {SCAN_INTERVAL_SECONDS} seconds.")
     logger.info("Press CTRL+C to stop the worker.")
+    metrics.instrument_engine(async_engine.sync_engine, "async")
+    metrics.start_metrics_server(METRICS_PORT + shard_index if METRICS_PORT else 0)
+
+    scheduler = ProbeScheduler(
+        recheck_interval=RECHECK_INTERVAL_SECONDS,
+        backoff_after=BACKOFF_AFTER_FAILURES,
+        max_backoff=MAX_BACKOFF_SECONDS,
+    )
+    tracker = None
+    if SCAN_STORAGE_MODE == "transitions":
+        tracker = TransitionTracker(timedelta(seconds=HEARTBEAT_INTERVAL_SECONDS))
+        async with AsyncSessionLocal() as db:
+            tracker.seed(await crud.get_latest_scan_states(db, shard_index, shard_count))
+        logger.info(f"Transition storage mode, heartbeat every {HEARTBEAT_INTERVAL_SECONDS} seconds.")
+
+    rollup = RollupAccumulator()
+    next_rollup_flush = time.monotonic() + ROLLUP_FLUSH_SECONDS
+
+    in_flight: set[asyncio.Task] = set()
+    window = new_window_stats(shard_index)
+    window_started = time.monotonic()
+    next_refresh = 0.0
+    next_maintenance = 0.0 if shard_index == 0 else None
+
     while True:
-        await run_scan_cycle()
-        logger.info("Sleeping for 60 seconds...")
-        await asyncio.sleep(60)
+        now = time.monotonic()
+
+        if next_maintenance is not None and now >= next_maintenance:
+            try:
+                async with async_engine.begin() as connection:
+                    await connection.run_sync(partitions.maintain_partitions)
+                async with AsyncSessionLocal() as db:
+                    await prune_rollups(db, datetime.now().astimezone())
+            except Exception as e:
+                logger.error(f"Partition maintenance failed: {e}")
+            next_maintenance = now + PARTITION_MAINTENANCE_SECONDS
+
+        # Reload the inventory periodically - picks up new devices and changed intervals
+        if now >= next_refresh:
+            async with AsyncSessionLocal() as db:
+                devices = await crud.get_monitored_devices(db, SCAN_INTERVAL_SECONDS, shard_index, shard_count)
+            if not devices:
+                logger.warning("No devices found in the database. Waiting for devices...")
+            scheduler.sync(devices, now)
+            if tracker is not None:
+                tracker.forget(tracker.states.keys() - scheduler.devices.keys())
+            next_refresh = now + DEVICE_REFRESH_SECONDS
+
+        batch = scheduler.pop_due(now)
+        if batch:
+            lag = now - min(entry.due for entry in batch)
+            window["max_lag"] = max(window["max_lag"], lag)
+            metrics.SCHEDULE_LAG.observe(lag)
+            if lag > SCAN_INTERVAL_SECONDS:
+                metrics.SCHEDULE_OVERRUNS.inc()
+            task = asyncio.create_task(probe_batch(batch, scheduler, window, tracker, rollup))
+            in_flight.add(task)
+            task.add_done_callback(in_flight.discard)
+
+        if now >= next_rollup_flush:
+            if len(rollup):
+                async with AsyncSessionLocal() as db:
+                    try:
+                        await rollup.flush(db)
+                    except Exception as e:
+                        await db.rollback()
+                        logger.error(f"Error saving availability rollups: {e}")
+            next_rollup_flush = now + ROLLUP_FLUSH_SECONDS
+
+        if now - window_started >= STATS_INTERVAL_SECONDS:
+            window["devices"] = len(scheduler)
+            window["online"] = sum(1 for entry in scheduler.devices.values() if entry.is_online)
+            window["duration"] = now - window_started
+            if window["write_seconds"] > 0:
+                window["rows_per_second"] = window["rows_written"] / window["write_seconds"]
+            metrics.MONITORED_DEVICES.set(window["devices"])
+            metrics.ONLINE_DEVICES.set(window["online"])
+            metrics.PROBES_PER_SECOND.set(window["probes"] / window["duration"] if window["duration"] else 0)
+            logger.info(
+                f"{window['probes']} probes in {window['duration']:.0f}s, {window['online']}/{window['devices']} online, "
+                f"{window['rows_per_second']:.0f} rows/s, max lag {window['max_lag']:.2f}s"
+            )
+            if window["max_lag"] > SCAN_INTERVAL_SECONDS:
+                logger.warning(f"Probes are running {window['max_lag']:.0f}s behind schedule.")
+            if stats_queue is not None:
+                stats_queue.put(window)
+            window = new_window_stats(shard_index)
+            window_started = now
+
+        wake_at = min(filter(None, (
+            scheduler.next_due(), next_refresh, next_rollup_flush, window_started + STATS_INTERVAL_SECONDS,
+        )))
+        await asyncio.sleep(max(SCHEDULER_TICK_SECONDS, wake_at - time.monotonic()))
+
+
+def run_shard(shard_index: int, shard_count: int, stats_queue):
+    """
+    Entry point of a shard child process - runs its own event loop, probe engine and DB writer.
+    """
+    try:
+        asyncio.run(main(shard_index, shard_count, stats_queue))
+    except KeyboardInterrupt:
+        pass
+
+
+def run_supervisor(shard_count: int):
+    """
+    Start one child process per shard, restart children that die and log
+    per-shard and fleet-wide cycle statistics reported by the children.
+    """
+    # spawn - children must not inherit the parent's DB connection pool
+    context = multiprocessing.get_context("spawn")
+    stats_queue = context.Queue()
+    processes: dict[int, multiprocessing.Process] = {}
+    latest_stats: dict[int, dict] = {}
+
+    def start_shard(shard_index: int):
+        process = context.Process(
+            target=run_shard,
+            args=(shard_index, shard_count, stats_queue),
+            name=f"monitor-shard-{shard_index}",
+            daemon=True,
+        )
+        process.start()
+        processes[shard_index] = process
+        logger.info(f"Started shard {shard_index + 1}/{shard_count} (pid {process.pid}).")
+
+    logger.info(f"Sharded worker started with {shard_count} processes.")
+    for shard_index in range(shard_count):
+        start_shard(shard_index)
+
+    try:
+        while True:
+            try:
+                stats = stats_queue.get(timeout=1)
+            except queue.Empty:
+                stats = None
+
+            if stats is not None:
+                latest_stats[stats["shard"]] = stats
+                logger.info(
+                    f"Shard {stats['shard'] + 1}/{shard_count}: {stats['devices']} devices, "
+                    f"{stats['online']} online, {stats['probes']} probes in {stats['duration']:.0f}s, "
+                    f"{stats['rows_per_second']:.0f} rows/s, max lag {stats['max_lag']:.2f}s"
+                )
+                if len(latest_stats) == shard_count:
+                    logger.info(
+                        f"Fleet: {sum(s['devices'] for s in latest_stats.values())} devices, "
+                        f"{sum(s['online'] for s in latest_stats.values())} online, "
+                        f"{sum(s['probes'] for s in latest_stats.values())} probes, "
+                        f"worst lag {max(s['max_lag'] for s in latest_stats.values()):.2f}s"
+                    )
+
+            for shard_index, process in list(processes.items()):
+                if not process.is_alive():
+                    logger.error(f"Shard {shard_index + 1}/{shard_count} exited with code {process.exitcode}. Restarting.")
+                    latest_stats.pop(shard_index, None)
+                    start_shard(shard_index)
+    finally:
+        for process in processes.values():
+            process.terminate()
+        for process in processes.values():
+            process.join(timeout=5)
 
 
 if __name__ == "__main__":
     try:
-        asyncio.run(main())
+        if WORKER_PROCESSES > 1:
+            run_supervisor(WORKER_PROCESSES)
+        else:
+            asyncio.run(main())
     except KeyboardInterrupt:
         logger.info("Worker stopped by user.")
\ No newline at end of file
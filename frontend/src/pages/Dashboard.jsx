@@ -1,5 +1,5 @@
 import { Activity, Wifi, WifiOff, AlertTriangle, Clock, CheckCircle, XCircle } from 'lucide-react'
-import { useEffect, useState } from 'react'
+import { useEffect, useRef, useState } from 'react'
 
 const Dashboard = () => {
     // Define start state
@@ -11,54 +11,48 @@ const Dashboard = () => {
   ]);
 
   const [activities, setActivities] = useState([]);
+  // device id -> is_online, kept current by live events
+  const deviceStates = useRef(new Map());
+  const pendingCount = useRef(0);
+
+  const updateCounters = () => {
+    const totalDevices = deviceStates.current.size;
+    const onlineCount = [...deviceStates.current.values()].filter(Boolean).length;
+
+    setStats(prev => {
+        const newStats = [...prev];
+        newStats[0] = { ...newStats[0], value: totalDevices.toString() };
+        newStats[1] = { ...newStats[1], value: onlineCount.toString() };
+        newStats[2] = { ...newStats[2], value: (totalDevices - onlineCount).toString() };
+        newStats[3] = { ...newStats[3], value: pendingCount.current.toString() };
+        return newStats;
+    });
+  };
 
   useEffect(() => {
     const fetchDashboardData = async () => {
       try {
-        const [devicesRes, pendingRes] = await Promise.all([
+        const [devicesRes, pendingRes, scansRes] = await Promise.all([
           fetch('http://127.0.0.1:8000/devices/'),
           fetch('http://127.0.0.1:8000/discovered-hosts/pending'),
+          fetch('http://127.0.0.1:8000/logs/?event_type=scan&limit=5'),
         ]);
 
         const devices = await devicesRes.json();
         const pendingHosts = pendingRes.ok ? await pendingRes.json() : [];
+        const recentScans = scansRes.ok ? await scansRes.json() : [];
 
-        const totalDevices = devices.length;
-        let onlineCount = 0;
-        const allScans = [];
-
-        devices.forEach(device => {
-            if (device.scan_results && device.scan_results.length > 0) {
-                const lastScan = device.scan_results[device.scan_results.length - 1];
-                if (lastScan.status === true) {
-                    onlineCount++;
-                }
-
-                device.scan_results.forEach(scan => {
-                    allScans.push({
-                        id: scan.id,
-                        device_name: device.name,
-                        status: scan.status,
-                        time: scan.timestamp
-                    });
-                });
-            }
-        });
-
-        allScans.sort((a, b) => new Date(b.time) - new Date(a.time));
-        setActivities(allScans.slice(0, 5));
+        deviceStates.current = new Map(devices.map(device => [device.id, device.status?.is_online === true]));
+        pendingCount.current = Array.isArray(pendingHosts) ? pendingHosts.length : 0;
 
-        const offlineCount = totalDevices - onlineCount;
-        const pendingCount = Array.isArray(pendingHosts) ? pendingHosts.length : 0;
+        setActivities(recentScans.map(scan => ({
+            id: scan.id,
+            device_name: scan.device_name,
+            status: scan.status,
+            time: scan.timestamp
+        })));
 
-        setStats(prev => {
-            const newStats = [...prev];
-            newStats[0] = { ...newStats[0], value: totalDevices.toString() };
-            newStats[1] = { ...newStats[1], value: onlineCount.toString() };
-            newStats[2] = { ...newStats[2], value: offlineCount.toString() };
-            newStats[3] = { ...newStats[3], value: pendingCount.toString() };
-            return newStats;
-        });
+        updateCounters();
       } catch (err) {
         console.error("Error connecting with API:", err);
         setStats(prev => {
@@ -69,9 +63,44 @@ const Dashboard = () => {
       }
     };
 
+    const handleEvent = (message) => {
+      const event = JSON.parse(message.data);
+
+      if (event.type === 'device_status') {
+        deviceStates.current.set(event.device_id, event.is_online);
+        setActivities(prev => [{
+            id: `event-${event.device_id}-${event.timestamp}`,
+            device_name: event.device_name,
+            status: event.is_online,
+            time: event.timestamp
+        }, ...prev].slice(0, 5));
+        updateCounters();
+      } else if (event.type === 'discovered_host') {
+        pendingCount.current += 1;
+        updateCounters();
+      } else if (event.type === 'resync') {
+        fetchDashboardData();
+      }
+    };
+
     fetchDashboardData();
-    const intervalId = setInterval(fetchDashboardData, 10000);
-    return () => clearInterval(intervalId);
+
+    // Live updates replace polling; after a reconnect the state is reloaded once
+    const source = new EventSource('http://127.0.0.1:8000/events/stream');
+    let connectedBefore = false;
+    source.onopen = () => {
+      if (connectedBefore) fetchDashboardData();
+      connectedBefore = true;
+    };
+    source.onmessage = handleEvent;
+
+    // Added/deleted devices and triaged hosts produce no events, a slow background refresh picks them up
+    const intervalId = setInterval(fetchDashboardData, 60000);
+
+    return () => {
+      source.close();
+      clearInterval(intervalId);
+    };
   }, []);
 
     const formatTime = (isoString) => {
@@ -114,12 +114,7 @@ const Devices = () => {
   };
 
   const getDeviceStatus = (device) => {
-    if (!device.scan_results || device.scan_results.length === 0) {
-        return false;
-    }
-
-    const lastScan = device.scan_results[device.scan_results.length - 1];
-    return lastScan.status; // true (online) lub false (offline)
+    return device.status?.is_online === true; // true (online) lub false (offline / not probed yet)
   };
 
   const getIcon = (typeName) => {
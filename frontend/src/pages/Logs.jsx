@@ -1,4 +1,4 @@
-import { useEffect, useState } from 'react';
+import { useEffect, useRef, useState } from 'react';
 import { Search, Clock, CheckCircle, XCircle, Radar } from 'lucide-react';
 
 const API_BASE = 'http://127.0.0.1:8000';
@@ -10,6 +10,15 @@ const FILTERS = [
 ];
 
 const EventBadge = ({ entry }) => {
+  if (entry.event_type === 'discovery' && entry.status === false) {
+    return (
+      <span className="inline-flex items-center gap-1.5 px-2.5 py-1 rounded-full text-xs font-medium border bg-slate-100 text-slate-600 border-slate-200">
+        <Radar size={12} />
+        Disappeared
+      </span>
+    );
+  }
+
   if (entry.event_type === 'discovery') {
     return (
       <span className="inline-flex items-center gap-1.5 px-2.5 py-1 rounded-full text-xs font-medium border bg-amber-50 text-amber-700 border-amber-100">
@@ -37,19 +46,29 @@ const Logs = () => {
   const [loading, setLoading] = useState(true);
   const [searchTerm, setSearchTerm] = useState('');
   const [activeFilter, setActiveFilter] = useState('all');
+  const [nextCursor, setNextCursor] = useState(null);
+  // Background refresh replaces the list with the newest page, so it pauses once older pages are loaded
+  const olderPagesLoaded = useRef(false);
+  const [loadingMore, setLoadingMore] = useState(false);
+
+  const buildLogsUrl = (filterId, cursor = null) => {
+    const url = new URL(`${API_BASE}/logs/`);
+    if (filterId !== 'all') url.searchParams.set('event_type', filterId);
+    if (cursor) url.searchParams.set('cursor', cursor);
+    return url;
+  };
 
   const fetchLogs = async (filterId, isBackground = false) => {
     if (!isBackground) setLoading(true);
 
     try {
-      const url = new URL(`${API_BASE}/logs/`);
-      if (filterId !== 'all') url.searchParams.set('event_type', filterId);
-
-      const res = await fetch(url);
+      const res = await fetch(buildLogsUrl(filterId));
       if (!res.ok) throw new Error('Failed to fetch logs');
 
       const data = await res.json();
       setLogs(Array.isArray(data) ? data : []);
+      setNextCursor(res.headers.get('X-Next-Cursor'));
+      olderPagesLoaded.current = false;
     } catch (err) {
       console.error('Error fetching logs:', err);
       if (!isBackground) setLogs([]);
@@ -58,14 +77,51 @@ const Logs = () => {
     }
   };
 
+  const loadMore = async () => {
+    if (!nextCursor) return;
+    setLoadingMore(true);
+
+    try {
+      const res = await fetch(buildLogsUrl(activeFilter, nextCursor));
+      if (!res.ok) throw new Error('Failed to fetch logs');
+
+      const data = await res.json();
+      setLogs((prev) => [...prev, ...(Array.isArray(data) ? data : [])]);
+      setNextCursor(res.headers.get('X-Next-Cursor'));
+      olderPagesLoaded.current = true;
+    } catch (err) {
+      console.error('Error fetching logs:', err);
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   useEffect(() => {
     fetchLogs(activeFilter, false);
 
-    const intervalId = setInterval(() => {
-      fetchLogs(activeFilter, true);
-    }, 5000);
-
-    return () => clearInterval(intervalId);
+    const refresh = () => {
+      if (!olderPagesLoaded.current) fetchLogs(activeFilter, true);
+    };
+
+    // State changes and new hosts arrive as live events; a burst of events triggers one reload
+    let refreshTimer = null;
+    const source = new EventSource(`${API_BASE}/events/stream`);
+    source.onmessage = () => {
+      if (refreshTimer) return;
+      refreshTimer = setTimeout(() => {
+        refreshTimer = null;
+        refresh();
+      }, 1000);
+    };
+
+    // Regular samples produce no events, they are picked up by a slow background refresh
+    const intervalId = setInterval(refresh, 60000);
+
+    return () => {
+      source.close();
+      clearTimeout(refreshTimer);
+      clearInterval(intervalId);
+    };
   }, [activeFilter]);
 
   const formatDate = (isoString) => {
@@ -179,6 +235,17 @@ const Logs = () => {
             </tbody>
           </table>
         </div>
+        {!loading && nextCursor && (
+          <div className="p-4 border-t border-slate-100 flex justify-center">
+            <button
+              onClick={loadMore}
+              disabled={loadingMore}
+              className="px-4 py-2 text-sm font-medium text-slate-600 bg-slate-100 rounded-lg hover:bg-slate-200 disabled:opacity-50"
+            >
+              {loadingMore ? 'Loading...' : 'Load older logs'}
+            </button>
+          </div>
+        )}
       </div>
     </div>
   );